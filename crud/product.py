@@ -3,11 +3,12 @@
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, or_
+from sqlalchemy import BIGINT, TEXT, column, func, or_, update, values
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import DBAPIError, IntegrityError
 import models
 import json
+from crud import bulk
 
 try:
     from shopify_service import gid_to_id
@@ -59,7 +60,7 @@ def get_products(
 
     # Now apply joinedload for the actual data query
     query = base_query.options(
-        joinedload(models.Product.variants).joinedload(models.ProductVariant.inventory_levels)
+        joinedload(models.Product.variants).joinedload(models.ProductVariant.inventory_levels).joinedload(models.InventoryLevel.location)
     )
     
     # Sorting
@@ -191,85 +192,99 @@ def _extract_variant_fields(v_data: Any, product_id: int, store_id: int, last_se
     }
 
 # --- Robust Upsert Logic ---
+def _extract_bundle_rows(p_data: Any, store_id: int, last_seen_at: datetime, now: datetime) -> Dict[str, List[Dict]]:
+    """Flatten one product bundle into the row sets written by _upsert_bundle_rows."""
+    p_row = _extract_product_fields(p_data, store_id, last_seen_at)
+
+    v_data_list = p_data.get("variants", [])
+    if isinstance(v_data_list, dict) and "edges" in v_data_list:
+         v_data_list = [edge['node'] for edge in v_data_list['edges']]
+
+    if not isinstance(v_data_list, list): v_data_list = []
+
+    v_rows = []
+    loc_rows_map = {}
+    inv_level_rows = []
+
+    for v_data in v_data_list:
+        v_row = _extract_variant_fields(v_data, p_row["id"], store_id, last_seen_at)
+        v_rows.append(v_row)
+
+        # (2026-07-14) The BUG-33 "clear sibling SKUs" workaround is gone with the
+        # UNIQUE(sku, store_id) constraint it served: duplicate same-store SKUs are
+        # legitimate here, and NULLing siblings corrupted the mirror on every sync.
+
+        inventory_levels = _get(v_data, "inventoryItem", "inventoryLevels", default=[])
+        if isinstance(inventory_levels, dict) and "edges" in inventory_levels:
+            inventory_levels = [edge['node'] for edge in inventory_levels['edges']]
+
+        if not isinstance(inventory_levels, list): inventory_levels = []
+
+        for lvl in inventory_levels:
+            loc_gid = _get(lvl, "location", "id")
+            loc_id = gid_to_id(loc_gid)
+            if not loc_id or not loc_gid: continue
+
+            loc_rows_map[loc_id] = { "id": loc_id, "shopify_gid": loc_gid, "store_id": store_id, "name": _get(lvl, "location", "name") }
+
+            qmap = {q["name"]: q["quantity"] for q in _get(lvl, "quantities", default=[])}
+            inv_level_rows.append({
+                "variant_id": v_row["id"], "location_id": loc_id,
+                "inventory_item_id": v_row["inventory_item_id"],
+                "available": qmap.get("available", 0), "on_hand": qmap.get("on_hand", qmap.get("available", 0)),
+                "last_fetched_at": now,
+            })
+
+    return {"products": [p_row], "variants": v_rows,
+            "locations": list(loc_rows_map.values()), "levels": inv_level_rows}
+
+def _upsert_bundle_rows(db: Session, bundles: List[Dict[str, List[Dict]]]):
+    """Write the extracted rows of one or more bundles: one set-based upsert per table
+    (COPY-staged for large pages, see crud/bulk.py), parents before children."""
+    p_rows = [r for b in bundles for r in b["products"]]
+    v_rows = [r for b in bundles for r in b["variants"]]
+    loc_rows = [r for b in bundles for r in b["locations"]]
+    inv_rows = [r for b in bundles for r in b["levels"]]
+
+    if p_rows:
+        bulk.bulk_upsert(db, models.Product, p_rows, ["id"],
+                         [k for k in p_rows[0] if k not in ("id", "store_id")])
+    if v_rows:
+        bulk.bulk_upsert(db, models.ProductVariant, v_rows, ["id"],
+                         [k for k in v_rows[0] if k != "id"])
+    if loc_rows:
+        bulk.bulk_upsert(db, models.Location, loc_rows, ["id"], ["name", "shopify_gid"])
+    if inv_rows:
+        # BUG-07 FIX: conflict updates read the incoming row (EXCLUDED), never a second statement.
+        bulk.bulk_upsert(db, models.InventoryLevel, inv_rows, ["variant_id", "location_id"],
+                         ["available", "on_hand", "last_fetched_at"])
+
 def create_or_update_products(db: Session, store_id: int, run_id: int, items: List[Any], last_seen_at: datetime):
     if not items:
         return
     now = datetime.now(timezone.utc)
 
+    extracted = []
     for bundle in items:
         try:
-            p_data = bundle
-            p_row = _extract_product_fields(p_data, store_id, last_seen_at)
-            
-            product_stmt = pg_insert(models.Product).values(p_row)
-            product_stmt = product_stmt.on_conflict_do_update(
-                index_elements=['id'],
-                set_={k: getattr(product_stmt.excluded, k) for k in p_row if k not in ['id', 'store_id']}
-            )
-            db.execute(product_stmt)
-            
-            v_data_list = p_data.get("variants", [])
-            if isinstance(v_data_list, dict) and "edges" in v_data_list:
-                 v_data_list = [edge['node'] for edge in v_data_list['edges']]
-            
-            if not isinstance(v_data_list, list): v_data_list = []
+            extracted.append((bundle, _extract_bundle_rows(bundle, store_id, last_seen_at, now)))
+        except Exception as e:
+            log_dead_letter(db, store_id, run_id, bundle, f"A general error occurred: {e}")
 
-            if v_data_list:
-                loc_rows_map = {}
-                inv_level_rows = []
-                
-                for v_data in v_data_list:
-                    v_row = _extract_variant_fields(v_data, p_row["id"], store_id, last_seen_at)
-
-                    # (2026-07-14) The BUG-33 "clear sibling SKUs" workaround is gone with the
-                    # UNIQUE(sku, store_id) constraint it served: duplicate same-store SKUs are
-                    # legitimate here, and NULLing siblings corrupted the mirror on every sync.
-
-                    variant_stmt = pg_insert(models.ProductVariant).values(v_row)
-                    variant_stmt = variant_stmt.on_conflict_do_update(
-                        index_elements=['id'],
-                        set_={k: getattr(variant_stmt.excluded, k) for k in v_row if k != 'id'}
-                    )
-                    db.execute(variant_stmt)
-                    
-                    inventory_levels = _get(v_data, "inventoryItem", "inventoryLevels", default=[])
-                    if isinstance(inventory_levels, dict) and "edges" in inventory_levels:
-                        inventory_levels = [edge['node'] for edge in inventory_levels['edges']]
-
-                    if not isinstance(inventory_levels, list): inventory_levels = []
-
-                    for lvl in inventory_levels:
-                        loc_gid = _get(lvl, "location", "id")
-                        loc_id = gid_to_id(loc_gid)
-                        if not loc_id or not loc_gid: continue
-                        
-                        loc_rows_map[loc_id] = { "id": loc_id, "shopify_gid": loc_gid, "store_id": store_id, "name": _get(lvl, "location", "name") }
-                        
-                        qmap = {q["name"]: q["quantity"] for q in _get(lvl, "quantities", default=[])}
-                        inv_level_rows.append({
-                            "variant_id": v_row["id"], "location_id": loc_id,
-                            "inventory_item_id": v_row["inventory_item_id"],
-                            "available": qmap.get("available", 0), "on_hand": qmap.get("on_hand", qmap.get("available", 0)),
-                            "last_fetched_at": now,
-                        })
-
-                if loc_rows_map:
-                    loc_rows = list(loc_rows_map.values())
-                    loc_stmt = pg_insert(models.Location).values(loc_rows)
-                    loc_stmt = loc_stmt.on_conflict_do_update(index_elements=['id'], set_={ "name": loc_stmt.excluded.name, "shopify_gid": loc_stmt.excluded.shopify_gid })
-                    db.execute(loc_stmt)
-                if inv_level_rows:
-                    # BUG-07 FIX: Use the same statement's .excluded, not a new pg_insert()
-                    inv_stmt = pg_insert(models.InventoryLevel).values(inv_level_rows)
-                    inv_stmt = inv_stmt.on_conflict_do_update(
-                        index_elements=['variant_id', 'location_id'],
-                        set_={
-                            "available": inv_stmt.excluded.available,
-                            "on_hand": inv_stmt.excluded.on_hand,
-                            "last_fetched_at": inv_stmt.excluded.last_fetched_at
-                        }
-                    )
-                    db.execute(inv_stmt)
+    # Whole page in one set-based write + one commit. A single bad bundle fails the whole
+    # statement, so on error we fall through and replay bundle-by-bundle below — only the
+    # offending bundle is dead-lettered, exactly as before.
+    if len(extracted) > 1:
+        try:
+            _upsert_bundle_rows(db, [rows for _, rows in extracted])
+            db.commit()
+            return
+        except Exception:
+            db.rollback()
+
+    for bundle, rows in extracted:
+        try:
+            _upsert_bundle_rows(db, [rows])
             db.commit()
         except IntegrityError as e:
             db.rollback()
@@ -356,7 +371,7 @@ def patch_product_from_webhook(db: Session, store_id: int, raw_payload: Dict[str
         print(f"[WEBHOOK] Ignoring product update - no valid ID in payload")
         return
 
-    db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    db_product = db.query(models.Product.id).filter(models.Product.id == product_id).first()
     if not db_product:
         # If the product doesn't exist, create it
         print(f"[WEBHOOK] Product {product_id} not found, creating from webhook")
@@ -409,14 +424,75 @@ def patch_product_from_webhook(db: Session, store_id: int, raw_payload: Dict[str
     if variants:
         _update_variants_incrementally(db, product_id, store_id, variants)
 
+# Webhook payload key -> ProductVariant column, for the fields a products/update patch may carry.
+_VARIANT_PATCH_FIELDS = {
+    "title": "title", "sku": "sku", "barcode": "barcode", "price": "price",
+    "compareAtPrice": "compare_at_price", "position": "position",
+    "inventoryQuantity": "inventory_quantity",
+}
+
 def _update_variants_incrementally(db: Session, product_id: int, store_id: int, variants: List[Dict[str, Any]]):
     """
     Update variants incrementally from webhook data.
     Only updates fields that are present in the payload, preserving existing data.
     Creates new variants if they don't exist.
-    
-    Each variant is processed in its own savepoint so one failure doesn't
-    block other variants from being updated.
+
+    All variants go out as one INSERT ... ON CONFLICT (id) DO UPDATE per distinct set of present
+    fields (normally exactly one), instead of a SELECT + UPDATE/INSERT per variant. If the batch
+    fails in the database (a constraint, or a malformed value such as a non-numeric price), it is
+    replayed per variant so one bad row doesn't block the others.
+    """
+    now = datetime.now(timezone.utc)
+
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for v_data in variants:
+        variant_id = gid_to_id(v_data.get("id"))
+        if not variant_id:
+            continue
+        sku = v_data.get("sku")
+        row = {
+            "id": variant_id,
+            "product_id": product_id,
+            "store_id": store_id,
+            "shopify_gid": v_data.get("admin_graphql_api_id", f"gid://shopify/ProductVariant/{variant_id}"),
+            "title": v_data.get("title"),
+            "sku": sku if sku and sku.strip() else None,
+            "barcode": v_data.get("barcode"),
+            "price": v_data.get("price"),
+            "compare_at_price": v_data.get("compareAtPrice"),
+            "position": v_data.get("position"),
+            # BUG-32 FIX: Check both original and normalized key names
+            "inventory_item_id": gid_to_id(v_data.get("inventory_item_id") or v_data.get("inventoryItemId")),
+            "inventory_quantity": v_data.get("inventoryQuantity"),
+            "last_seen_at": now,
+        }
+        present = tuple(col for key, col in _VARIANT_PATCH_FIELDS.items() if key in v_data)
+        groups.setdefault(present, []).append(row)
+
+    if not groups:
+        return
+
+    try:
+        with db.begin_nested():
+            for present, rows in groups.items():
+                stmt = pg_insert(models.ProductVariant).values(bulk.dedupe_rows(rows, ["id"]))
+                set_ = {col: getattr(stmt.excluded, col) for col in present}
+                # BUG-32 FIX: Backfill inventory_item_id only if missing.
+                set_["inventory_item_id"] = func.coalesce(models.ProductVariant.inventory_item_id,
+                                                          stmt.excluded.inventory_item_id)
+                if present:
+                    set_["last_seen_at"] = stmt.excluded.last_seen_at
+                db.execute(stmt.on_conflict_do_update(index_elements=["id"], set_=set_))
+        db.commit()
+        print(f"[DB-UPDATE] Upserted {sum(len(r) for r in groups.values())} variants of product {product_id} from webhook")
+    except DBAPIError as e:
+        print(f"[WEBHOOK-WARN] Batched variant upsert for product {product_id} failed ({e.orig}); retrying per variant")
+        _update_variants_one_by_one(db, product_id, store_id, variants)
+
+def _update_variants_one_by_one(db: Session, product_id: int, store_id: int, variants: List[Dict[str, Any]]):
+    """
+    Per-variant fallback for _update_variants_incrementally: each variant is processed in its
+    own savepoint so one failure doesn't block other variants from being updated.
     """
     now = datetime.now(timezone.utc)
     
@@ -545,6 +621,35 @@ def delete_product_from_webhook(db: Session, payload: Dict[str, Any]):
     db.commit()
     print(f"[DB-UPDATE] Deleted product ID {product_id} and its variants from webhook.")
 
+# inventory_item_ids per VALUES-join lookup statement.
+VALUES_JOIN_MAX = 10_000
+
+def fetch_variants_by_inventory_items(db: Session, inventory_item_ids) -> Dict[int, Any]:
+    """inventory_item_id -> (inventory_item_id, id, store_id) row for the given Shopify inventory
+    items. Joins against a VALUES list rather than a growing `IN (...)`: the planner sees a
+    relation it can hash-join, and every batch size shares one statement shape."""
+    ids = list(dict.fromkeys(i for i in inventory_item_ids if i))
+    found: Dict[int, Any] = {}
+    for i in range(0, len(ids), VALUES_JOIN_MAX):
+        wanted = values(column("iid", BIGINT), name="wanted").data([(x,) for x in ids[i:i + VALUES_JOIN_MAX]])
+        rows = (db.query(models.ProductVariant.inventory_item_id, models.ProductVariant.id,
+                         models.ProductVariant.store_id)
+                  .join(wanted, models.ProductVariant.inventory_item_id == wanted.c.iid))
+        found.update((r.inventory_item_id, r) for r in rows)
+    return found
+
+def update_variant_column_by_gid(db: Session, column_name: str, values_by_gid: Dict[str, Any]) -> None:
+    """Set one product_variants column per variant GID as a single UPDATE .. FROM (VALUES ...)
+    per VALUES_JOIN_MAX rows: one statement and one plan, not one UPDATE per variant."""
+    table = models.ProductVariant.__table__
+    items = list(values_by_gid.items())
+    for i in range(0, len(items), VALUES_JOIN_MAX):
+        incoming = values(column("gid", TEXT), column("val", table.c[column_name].type),
+                          name="incoming").data(items[i:i + VALUES_JOIN_MAX])
+        db.execute(update(table)
+                   .where(table.c.shopify_gid == incoming.c.gid)
+                   .values({column_name: incoming.c.val}))
+
 def update_variant_from_webhook(db: Session, payload: Dict[str, Any]):
     inventory_item_id = payload.get("id")
     variant = db.query(models.ProductVariant).filter(models.ProductVariant.inventory_item_id == inventory_item_id).first()
@@ -577,37 +682,45 @@ def delete_inventory_item_from_webhook(db: Session, payload: Dict[str, Any]):
 
 def update_inventory_levels_for_variants(db: Session, variant_ids: List[int], location_id: int, new_quantity: int):
     """BUG-08 FIX: Use upsert instead of UPDATE-only, so new levels are created if missing."""
+    set_inventory_levels(db, [(vid, location_id) for vid in variant_ids], new_quantity)
+
+
+def set_inventory_levels(db: Session, levels: List[tuple], new_quantity: int):
+    """Upsert `new_quantity` onto every (variant_id, location_id) pair — across any number of
+    stores — with one inventory_item_id lookup, one INSERT .. ON CONFLICT and one commit."""
+    if not levels:
+        return
     now = datetime.now(timezone.utc)
 
-    rows = []
-    for vid in variant_ids:
-        # Look up inventory_item_id for each variant
-        variant = db.query(models.ProductVariant).filter(models.ProductVariant.id == vid).first()
-        inv_item_id = variant.inventory_item_id if variant else None
-
-        rows.append({
-            "variant_id": vid,
-            "location_id": location_id,
-            "inventory_item_id": inv_item_id,
-            "available": new_quantity,
-            "on_hand": new_quantity,
-            "updated_at": now,
-            "last_fetched_at": now,
-        })
-
-    if rows:
-        stmt = pg_insert(models.InventoryLevel).values(rows)
-        stmt = stmt.on_conflict_do_update(
-            index_elements=['variant_id', 'location_id'],
-            set_={
-                "available": stmt.excluded.available,
-                "on_hand": stmt.excluded.on_hand,
-                "updated_at": stmt.excluded.updated_at,
-                "last_fetched_at": stmt.excluded.last_fetched_at,
-            }
-        )
-        db.execute(stmt)
-        db.commit()
+    # One lookup for all inventory_item_ids (was one SELECT per variant).
+    inv_by_variant = dict(
+        db.query(models.ProductVariant.id, models.ProductVariant.inventory_item_id)
+          .filter(models.ProductVariant.id.in_({vid for vid, _ in levels}))
+          .all()
+    )
+
+    rows = [{
+        "variant_id": vid,
+        "location_id": location_id,
+        "inventory_item_id": inv_by_variant.get(vid),
+        "available": new_quantity,
+        "on_hand": new_quantity,
+        "updated_at": now,
+        "last_fetched_at": now,
+    } for vid, location_id in levels]
+
+    stmt = pg_insert(models.InventoryLevel).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['variant_id', 'location_id'],
+        set_={
+            "available": stmt.excluded.available,
+            "on_hand": stmt.excluded.on_hand,
+            "updated_at": stmt.excluded.updated_at,
+            "last_fetched_at": stmt.excluded.last_fetched_at,
+        }
+    )
+    db.execute(stmt)
+    db.commit()
 
 
 def adjust_inventory_levels_for_variants(db: Session, variant_ids: List[int], location_id: int, delta: int):
@@ -5,87 +5,91 @@ from typing import Optional, Dict, Any, List
 
 from sqlalchemy import text, func
 from sqlalchemy.orm import Session
-from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 import models
 
+# ---------- Partitions ----------
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _next_month(d: date) -> date:
+    return (d.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def snapshot_partition_name(d: date) -> str:
+    return f"inventory_snapshots_{d.year:04d}_{d.month:02d}"
+
+
+def ensure_snapshot_partitions(db: Session, day: date) -> None:
+    """
+    Make sure the monthly partitions for `day` and the following month exist, so a write never
+    hits "no partition of relation found". The to_regclass probe keeps the common case lock-free
+    (CREATE ... PARTITION OF locks the parent even when the partition already exists).
+    """
+    for start in (_month_start(day), _next_month(day)):
+        name = snapshot_partition_name(start)
+        if db.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar() is not None:
+            continue
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF inventory_snapshots "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{_next_month(start).isoformat()}')"
+        ))
+    db.commit()
+
+
 # ---------- Writers ----------
 
 def create_snapshot_for_store(db: Session, store_id: int) -> None:
     """
     Upsert one inventory snapshot row per variant for the given store at normalized day.
     Allows negative inventory. Uses stores.sync_location_id if set, else sums across locations.
+
+    One INSERT ... SELECT ... ON CONFLICT statement: the catalog never travels to the app and
+    back, and there is no staging copy to WAL-log — the only write is the append to the
+    (partitioned) snapshot table itself.
     """
     now = datetime.now(timezone.utc)
     # normalize to midnight UTC to keep one row/day per variant+store
-    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    day = now.date()
 
-    # on_hand by variant
     sync_loc_id = db.query(models.Store.sync_location_id).filter(models.Store.id == store_id).scalar()
     if sync_loc_id:
-        onhand_rows = db.execute(
-            text("""
-                -- CHANGE 1: Use il.available instead of il.on_hand
-                SELECT pv.id AS variant_id, COALESCE(il.available, 0) AS on_hand
-                FROM product_variants pv
-                LEFT JOIN inventory_levels il
-                  ON il.variant_id = pv.id AND il.location_id = :loc_id
-                WHERE pv.store_id = :store_id
-            """),
-            {"loc_id": int(sync_loc_id), "store_id": int(store_id)},
-        ).fetchall()
+        # Use il.available (not il.on_hand) at the sync location.
+        source = """
+            SELECT :day, pv.id, pv.store_id, COALESCE(il.available, 0), pv.price, pv.cost_per_item
+            FROM product_variants pv
+            LEFT JOIN inventory_levels il
+              ON il.variant_id = pv.id AND il.location_id = :loc_id
+            WHERE pv.store_id = :store_id
+        """
+        params = {"day": day, "loc_id": int(sync_loc_id), "store_id": int(store_id)}
     else:
-        onhand_rows = db.execute(
-            text("""
-                -- CHANGE 2: Sum il.available instead of il.on_hand
-                SELECT pv.id AS variant_id, COALESCE(SUM(il.available), 0) AS on_hand
-                FROM product_variants pv
-                LEFT JOIN inventory_levels il
-                  ON il.variant_id = pv.id
-                WHERE pv.store_id = :store_id
-                GROUP BY pv.id
-            """),
-            {"store_id": int(store_id)},
-        ).fetchall()
-
-    onhand_by_variant = {int(r.variant_id): int(r.on_hand) for r in onhand_rows}
+        # Sum il.available across every location.
+        source = """
+            SELECT :day, pv.id, pv.store_id, COALESCE(SUM(il.available), 0), pv.price, pv.cost_per_item
+            FROM product_variants pv
+            LEFT JOIN inventory_levels il
+              ON il.variant_id = pv.id
+            WHERE pv.store_id = :store_id
+            GROUP BY pv.id
+        """
+        params = {"day": day, "store_id": int(store_id)}
 
-    # price/cost per variant
-    vrows = db.execute(
-        text("""
-            SELECT id AS variant_id, price, cost_per_item
-            FROM product_variants
-            WHERE store_id = :store_id
+    ensure_snapshot_partitions(db, day)
+    db.execute(
+        text(f"""
+            INSERT INTO inventory_snapshots
+                (date, product_variant_id, store_id, on_hand, price, cost_per_item)
+            {source}
+            ON CONFLICT (date, product_variant_id, store_id) DO UPDATE SET
+                on_hand = EXCLUDED.on_hand,
+                price = EXCLUDED.price,
+                cost_per_item = EXCLUDED.cost_per_item
         """),
-        {"store_id": int(store_id)},
-    ).fetchall()
-    pc_map = {int(r.variant_id): (r.price, r.cost_per_item) for r in vrows}
-
-    rows: List[Dict[str, Any]] = []
-    for vid, onh in onhand_by_variant.items():
-        price, cost = pc_map.get(vid, (None, None))
-        rows.append({
-            "date": day,
-            "product_variant_id": vid,
-            "store_id": int(store_id),
-            "on_hand": int(onh),
-            "price": price,
-            "cost_per_item": cost,
-        })
-
-    if not rows:
-        return
-
-    stmt = pg_insert(models.InventorySnapshot.__table__).values(rows)
-    stmt = stmt.on_conflict_do_update(
-        index_elements=["date", "product_variant_id", "store_id"],
-        set_={
-            "on_hand": stmt.excluded.on_hand,
-            "price": stmt.excluded.price,
-            "cost_per_item": stmt.excluded.cost_per_item,
-        },
+        params,
     )
-    db.execute(stmt)
     db.commit()
 
 
@@ -1,4 +1,5 @@
 from typing import List, Optional
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 import models
 import schemas
@@ -12,9 +13,14 @@ def get_all_stores(db: Session) -> List[models.Store]:
 def get_enabled_stores(db: Session) -> List[models.Store]:
     return db.query(models.Store).filter(models.Store.enabled == True).order_by(models.Store.id.asc()).all()
 
-def create_store(db: Session, store: schemas.StoreCreate) -> models.Store:
-    db_store = models.Store(**store.dict())
-    db.add(db_store)
+def create_store(db: Session, store: schemas.StoreCreate) -> Optional[models.Store]:
+    """Inserts the store, or returns None when its name or shopify_url is already taken.
+    One race-free statement: the unique indexes decide, not a prior SELECT."""
+    db_store = db.scalars(
+        pg_insert(models.Store)
+        .values(**store.model_dump())
+        .on_conflict_do_nothing()
+        .returning(models.Store)
+    ).first()
     db.commit()
-    db.refresh(db_store)
-    return db_store
\ No newline at end of file
+    return db_store
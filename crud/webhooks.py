@@ -24,4 +24,24 @@ def get_webhook_registrations_for_store(db: Session, store_id: int):
 def delete_webhook_registration(db: Session, shopify_webhook_id: int):
     """Deletes a webhook registration from the local database."""
     db.query(models.Webhook).filter(models.Webhook.shopify_webhook_id == shopify_webhook_id).delete()
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+def delete_webhook_registrations(db: Session, shopify_webhook_ids):
+    """Deletes many webhook registrations in one statement and one commit."""
+    if shopify_webhook_ids:
+        (db.query(models.Webhook)
+           .filter(models.Webhook.shopify_webhook_id.in_(list(shopify_webhook_ids)))
+           .delete(synchronize_session=False))
+        db.commit()
+
+def replace_webhook_registrations(db: Session, store_id: int, deleted_webhook_ids, created_webhooks):
+    """Drops the registrations of deleted webhooks and saves the created ones in one commit."""
+    if deleted_webhook_ids:
+        (db.query(models.Webhook)
+           .filter(models.Webhook.shopify_webhook_id.in_(list(deleted_webhook_ids)))
+           .delete(synchronize_session=False))
+    db.add_all([
+        models.Webhook(shopify_webhook_id=w['id'], store_id=store_id, topic=w['topic'], address=w['address'])
+        for w in created_webhooks
+    ])
+    db.commit()
@@ -22,12 +22,22 @@ DATABASE_URL = f"postgresql://{DB_USER}:{encoded_password}@{DB_HOST}/{DB_NAME}"
 
 # --- MODIFIED ENGINE CREATION WITH CONNECTION POOLING ---
 # Create the SQLAlchemy engine with specific pool settings.
+# The pool is a hard cap (no overflow): sync jobs, webhooks and the API share it, and overflow
+# connections are opened and torn down per checkout, paying TCP + auth each time under load.
+# 30 keeps the old 10 + 20 overflow ceiling; the store fan-out pools and FastAPI's sync threadpool
+# all draw from it. Connections are opened on demand, so an idle process holds few of them.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "30"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "0"))
+
 engine = create_engine(
     DATABASE_URL,
-    pool_size=10,  # The number of connections to keep open in the pool.
-    max_overflow=20, # The maximum number of connections to allow in addition to pool_size.
+    pool_size=DB_POOL_SIZE,  # The number of connections to keep open in the pool.
+    max_overflow=DB_MAX_OVERFLOW, # The maximum number of connections to allow in addition to pool_size.
     pool_recycle=3600, # Recycle connections after 1 hour to prevent timeout issues.
-    pool_pre_ping=True # Check if the connection is alive before using it.
+    pool_pre_ping=True, # Check if the connection is alive before using it.
+    # psycopg2: INSERT executemany becomes multi-row VALUES pages, and UPDATE/DELETE executemany
+    # (e.g. the bulk variant field updates) goes through execute_batch instead of one round trip per row.
+    executemany_mode="values_plus_batch",
 )
 # --- END OF MODIFICATION ---
 
@@ -41,8 +51,11 @@ Base = declarative_base()
 def get_db():
     """
     FastAPI dependency that provides a database session per request.
+    expire_on_commit=False: handlers commit and then build the response from the same objects;
+    expiring them would re-SELECT every row touched. Long-lived job sessions (SessionLocal())
+    keep the default, so their bulk UPDATEs never leave stale attributes behind.
     """
-    db = SessionLocal()
+    db = SessionLocal(expire_on_commit=False)
     try:
         yield db
     finally:
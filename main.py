@@ -1,12 +1,13 @@
 # main.py
+import logging
 import os
 import sys
 import time
 from pathlib import Path
-from fastapi import FastAPI, Request, Form, Depends
+from fastapi import FastAPI, Request, Form, Depends, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse
 from dotenv import load_dotenv
 from jose import jwt, JOSEError
 from datetime import datetime, timedelta, timezone
@@ -31,10 +32,18 @@ from services import pool_validation
 from services import pool_membership
 from services import pool_onboarding
 from services import trendyol_sync
+from services import trendyol_client
+import shopify_service
 
 load_dotenv()
 
-app = FastAPI(title="Inventory Suite")
+# Sync-engine diagnostics go through `logging`; production runs at WARNING so the per-webhook
+# debug/info lines are never even formatted. LOG_LEVEL=INFO (or DEBUG) brings them back.
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+# ORJSONResponse for every JSON route: the dump step runs in orjson's C encoder instead of stdlib json.
+app = FastAPI(title="Inventory Suite", default_response_class=ORJSONResponse)
 
 # --- DATABASE INIT (must be before scheduler) ---
 Base.metadata.create_all(bind=engine)
@@ -138,49 +147,24 @@ async def add_login_middleware(request: Request, call_next):
     return response
 
 
-@app.get("/login_page", response_class=HTMLResponse, include_in_schema=False)
-async def get_login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request, "title": "Login"})
-
 @app.get("/", response_class=RedirectResponse, include_in_schema=False)
 async def read_root():
     return RedirectResponse(url="/sync-control")
 
-@app.get("/sync-control", response_class=HTMLResponse, include_in_schema=False)
-async def get_sync_control_page(request: Request):
-    return templates.TemplateResponse("sync_control.html", {"request": request, "title": "Sync Control"})
-
-@app.get("/config", response_class=HTMLResponse, include_in_schema=False)
-async def get_config_page(request: Request):
-    return templates.TemplateResponse("config.html", {"request": request, "title": "Configuration"})
-
-@app.get("/products", response_class=HTMLResponse, include_in_schema=False)
-async def get_products_page(request: Request):
-    return templates.TemplateResponse("products.html", {"request": request, "title": "Products"})
-
-@app.get("/trendyol", response_class=HTMLResponse, include_in_schema=False)
-async def trendyol_page(request: Request):
-    return templates.TemplateResponse("trendyol.html", {"request": request, "title": "Trendyol Sync"})
-
-@app.get("/snapshots", response_class=HTMLResponse, include_in_schema=False)
-async def get_snapshots_page(request: Request):
-    return templates.TemplateResponse("snapshots.html", {"request": request, "title": "Snapshots"})
-
-@app.get("/mutations", response_class=HTMLResponse, include_in_schema=False)
-async def get_mutations_page(request: Request):
-    return templates.TemplateResponse("mutations.html", {"request": request, "title": "Mutations"})
-
-@app.get("/stock-by-barcode", response_class=HTMLResponse, include_in_schema=False)
-async def get_stock_by_barcode_page(request: Request):
-    return templates.TemplateResponse("stock_by_barcode.html", {"request": request, "title": "Stock by Barcode"})
-
-@app.get("/data-quality", response_class=HTMLResponse, include_in_schema=False)
-async def get_data_quality_page(request: Request):
-    return templates.TemplateResponse("data_quality.html", {"request": request, "title": "Data Quality"})
-
-@app.get("/system-monitor", response_class=HTMLResponse, include_in_schema=False)
-async def get_system_monitor_page(request: Request):
-    return templates.TemplateResponse("system_monitor.html", {"request": request, "title": "System Monitor"})
+# HTML pages: path segment -> (template, title). Served by the single `render_page` route registered
+# after the API routers, so it can never shadow an API path.
+_PAGES = {
+    "login_page": ("login.html", "Login"),
+    "sync-control": ("sync_control.html", "Sync Control"),
+    "config": ("config.html", "Configuration"),
+    "products": ("products.html", "Products"),
+    "trendyol": ("trendyol.html", "Trendyol Sync"),
+    "snapshots": ("snapshots.html", "Snapshots"),
+    "mutations": ("mutations.html", "Mutations"),
+    "stock-by-barcode": ("stock_by_barcode.html", "Stock by Barcode"),
+    "data-quality": ("data_quality.html", "Data Quality"),
+    "system-monitor": ("system_monitor.html", "System Monitor"),
+}
 
 # Routers
 app.include_router(sync_control.router)
@@ -196,8 +180,18 @@ app.include_router(diagnostics.router)
 app.include_router(classification.router)
 app.include_router(trendyol_routes.router)
 
+@app.get("/{page}", response_class=HTMLResponse, include_in_schema=False)
+async def render_page(page: str, request: Request):
+    entry = _PAGES.get(page)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    template, title = entry
+    return templates.TemplateResponse(template, {"request": request, "title": title})
+
 @app.on_event("shutdown")
 def shutdown_event():
     audit_logger.log(category="SYSTEM", action="shutdown",
                      message="Inventory Intelligence Platform shutting down")
-    scheduler.shutdown()
\ No newline at end of file
+    scheduler.shutdown()
+    shopify_service.close_sessions()
+    trendyol_client.close_sessions()
@@ -0,0 +1,38 @@
+# migrate_barcode_store_index.py
+"""
+Migration: product_variants (barcode, store_id) replaces the single-column barcode index.
+Idempotent.
+
+Every barcode-group read (live_truth, diagnostics, reconciliation_engine, pool_engine, stock) is
+`WHERE pv.barcode = :b` and most pick one row per store via
+`DISTINCT ON (pv.barcode, pv.store_id) ... ORDER BY pv.barcode, pv.store_id, ...`. The composite
+serves the equality AND hands rows back already grouped by store; as its leading column it also
+makes ix_product_variants_barcode redundant, which is then dropped (one less index per write).
+Build first, drop second, both CONCURRENTLY (AUTOCOMMIT).
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_barcode_store ON product_variants (barcode, store_id)",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_product_variants_barcode",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+                if i == 1:
+                    print("[MIGRATION] ABORT: composite not built — keeping the barcode index.")
+                    return
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
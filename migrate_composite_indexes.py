@@ -0,0 +1,35 @@
+# migrate_composite_indexes.py
+"""
+Migration: composite indexes for the variant/level read paths. Idempotent + additive.
+
+  - ix_pv_product_store (product_id, store_id): product_variants.product_id had no index, yet the
+    Product.variants selectin load (`WHERE product_id IN (...)`) and the products -> variants
+    ON DELETE CASCADE both filter on it — each was a seq scan of the whole variant table.
+  - ix_il_location_updated (location_id, updated_at): the inventory_levels PK leads with
+    variant_id, so per-location scans and the locations FK check had nothing to seek on.
+No (store_id, updated_at) variant index: no query filters variants that way, and store_id-only
+lookups are served by ix_product_variants_store_lastseen. Built CONCURRENTLY (AUTOCOMMIT).
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_product_store ON product_variants (product_id, store_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_il_location_updated ON inventory_levels (location_id, updated_at)",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
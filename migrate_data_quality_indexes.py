@@ -0,0 +1,42 @@
+# migrate_data_quality_indexes.py
+"""
+Migration: partial indexes for the data-quality issue scans (routes/data_quality.py). Idempotent + additive.
+
+  - ix_pv_missing_barcode / ix_pv_missing_sku (store_id, product_id) WHERE <col> IS NULL OR <col> = ''
+    — the no_barcode / no_sku counts and pages. Only the offending variants are indexed, so the
+    per-store probe reads a handful of entries instead of scanning product_variants.
+  - ix_pv_sku_barcode (sku) INCLUDE (barcode, store_id) WHERE sku IS NOT NULL AND sku <> ''
+    and its mirror ix_pv_barcode_sku — the sku/barcode mismatch GROUP BYs walk the key in order
+    and read the other column from the index instead of the heap.
+The product_id join is already served by ix_pv_product_store (migrate_composite_indexes.py).
+Built CONCURRENTLY (AUTOCOMMIT). Requires PostgreSQL 11+.
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_missing_barcode ON product_variants (store_id, product_id) "
+    "WHERE barcode IS NULL OR barcode = ''",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_missing_sku ON product_variants (store_id, product_id) "
+    "WHERE sku IS NULL OR sku = ''",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_sku_barcode ON product_variants (sku) "
+    "INCLUDE (barcode, store_id) WHERE sku IS NOT NULL AND sku <> ''",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_barcode_sku ON product_variants (barcode) "
+    "INCLUDE (sku, store_id) WHERE barcode IS NOT NULL AND barcode <> ''",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
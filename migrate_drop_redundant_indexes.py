@@ -0,0 +1,42 @@
+# migrate_drop_redundant_indexes.py
+"""
+Migration: drop single-column indexes that no query needs. Idempotent; rerunnable.
+
+Every index is maintained on every INSERT/UPDATE of these hot sync tables (each full sync
+rewrites every variant and level row), so an index that is never chosen is pure WAL + page cost:
+  - ix_product_variants_store_id: redundant; ix_product_variants_store_lastseen (store_id,
+    last_seen_at) — see migrate_sweep_indexes.py — serves every store_id-only predicate.
+  - ix_inventory_levels_inventory_item_id: nothing filters inventory_levels by inventory_item_id;
+    item lookups resolve through product_variants.inventory_item_id (UNIQUE).
+Kept on purpose: product_variants.sku (the UNIQUE(sku, store_id) that would have covered it was
+dropped by migrate_p0_cascade_kill.py) and product_variants.barcode (the pool-engine key).
+Run migrate_sweep_indexes.py FIRST. DROP INDEX CONCURRENTLY requires AUTOCOMMIT.
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_product_variants_store_id",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_inventory_levels_inventory_item_id",
+]
+
+COVERING_INDEX = "SELECT 1 FROM pg_indexes WHERE indexname = 'ix_product_variants_store_lastseen'"
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if not conn.execute(text(COVERING_INDEX)).first():
+            print("[MIGRATION] ABORT: ix_product_variants_store_lastseen missing — run migrate_sweep_indexes.py first.")
+            return
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
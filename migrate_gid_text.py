@@ -0,0 +1,29 @@
+# migrate_gid_text.py
+"""
+Migration: shopify_gid VARCHAR(255) -> TEXT on products, product_variants, locations. Idempotent.
+
+A gid is a short `gid://shopify/<Type>/<id>` URI; the 255 cap only bought a length check on
+every write. varchar(n) -> text is binary-coercible, so Postgres changes only the catalog entry:
+no table rewrite and no rebuild of the *_shopify_gid_key unique indexes.
+"""
+from database import engine
+from sqlalchemy import text
+
+STATEMENTS = [
+    "ALTER TABLE products ALTER COLUMN shopify_gid TYPE TEXT",
+    "ALTER TABLE product_variants ALTER COLUMN shopify_gid TYPE TEXT",
+    "ALTER TABLE locations ALTER COLUMN shopify_gid TYPE TEXT",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting to database...")
+    with engine.begin() as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            conn.execute(text(stmt))
+            print(f"  [{i}/{len(STATEMENTS)}] OK")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
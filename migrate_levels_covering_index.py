@@ -0,0 +1,34 @@
+# migrate_levels_covering_index.py
+"""
+Migration: covering index on inventory_levels. Idempotent + additive.
+
+Almost every stock read (live_truth, classification, reconciliation_engine, pool_engine,
+diagnostics, snapshots) is `JOIN inventory_levels il ON il.variant_id = pv.id AND
+il.location_id = s.sync_location_id` reading il.available / il.on_hand. The PK finds the row but
+still visits the heap for the quantities; with them INCLUDEd the read can be index-only.
+location_id is a key column (not only the PK's) so the join predicate is fully covered too.
+Built CONCURRENTLY (AUTOCOMMIT). Requires PostgreSQL 11+.
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_il_var_cover "
+    "ON inventory_levels (variant_id, location_id) INCLUDE (available, on_hand)",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,35 @@
+# migrate_partial_hot_indexes.py
+"""
+Migration: partial indexes over the "hot" subsets two scans actually read. Idempotent + additive.
+
+  - ix_il_negative (available) WHERE available < 0 — the diagnostics negative-inventory scan.
+    Negative levels are clamped and alerted on write, so the index is near-empty, versus a
+    sequential scan of every inventory level.
+  - ix_tol_unapplied (trendyol_barcode, order_date_ms) WHERE NOT applied — the inbound-fold
+    order corroboration (services/trendyol_sync._inbound_fold). Applied lines are never read
+    again and dominate the table over time.
+Built CONCURRENTLY (AUTOCOMMIT).
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_il_negative ON inventory_levels (available) WHERE available < 0",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tol_unapplied ON trendyol_order_lines (trendyol_barcode, order_date_ms) WHERE NOT applied",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
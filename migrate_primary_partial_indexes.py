@@ -0,0 +1,34 @@
+# migrate_primary_partial_indexes.py
+"""
+Migration: partial indexes for the primary-variant flags. Idempotent + additive.
+
+is_primary_variant / is_barcode_primary are true on a small fraction of product_variants; an
+index restricted to those rows is a fraction of a full index's size and cost:
+  - ix_pv_primary (product_id) WHERE is_primary_variant
+  - ix_pv_barcode_primary (barcode) WHERE is_barcode_primary — also lets /stock/set-primary find
+    the barcode's current primary without touching its siblings.
+Built CONCURRENTLY (AUTOCOMMIT).
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_primary ON product_variants (product_id) WHERE is_primary_variant",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_barcode_primary ON product_variants (barcode) WHERE is_barcode_primary",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,35 @@
+# migrate_search_trgm_indexes.py
+"""
+Migration: trigram GIN indexes for product search. Idempotent + additive.
+
+crud.product.get_products matches every search word as `lower(col) LIKE '%word%'` against
+products.title, product_variants.sku and product_variants.barcode. An infix LIKE can't use a
+b-tree, so each search was a sequential scan of both tables; pg_trgm GIN indexes on the same
+lower(...) expressions serve it directly (no query change, substring semantics preserved).
+Built CONCURRENTLY (AUTOCOMMIT).
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_title_trgm ON products USING gin (lower(title) gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_sku_trgm ON product_variants USING gin (lower(sku) gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_barcode_trgm ON product_variants USING gin (lower(barcode) gin_trgm_ops)",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
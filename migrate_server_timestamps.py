@@ -0,0 +1,71 @@
+# migrate_server_timestamps.py
+"""
+Migration: move last_fetched_at / last_updated_at bookkeeping into the database. Idempotent.
+
+These columns used Python-side `default=func.now(), onupdate=func.now()`: the ORM had to render
+or fetch the value per row, and the bulk ON CONFLICT / COPY paths bypassed onupdate entirely.
+Now the column DEFAULT is set server-side and a BEFORE UPDATE trigger stamps now() — unless the
+writer set the column itself, which is exactly the old onupdate contract.
+
+Tables: products, product_variants, inventory_levels (last_fetched_at); barcode_versions
+(last_updated_at). Run once against the live database BEFORE restarting.
+Revert: DROP TRIGGER trg_<table>_touch ON <table>; DROP FUNCTION fn_touch_last_fetched_at(),
+        fn_touch_last_updated_at();
+"""
+from database import engine
+from sqlalchemy import text
+
+TOUCHED = [
+    ("products", "last_fetched_at"),
+    ("product_variants", "last_fetched_at"),
+    ("inventory_levels", "last_fetched_at"),
+    ("barcode_versions", "last_updated_at"),
+]
+
+STATEMENTS = []
+for _col in sorted({c for _, c in TOUCHED}):
+    STATEMENTS.append(f"""
+    CREATE OR REPLACE FUNCTION fn_touch_{_col}() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.{_col} IS NOT DISTINCT FROM OLD.{_col} THEN
+            NEW.{_col} := now();
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+for _table, _col in TOUCHED:
+    STATEMENTS += [
+        f"ALTER TABLE {_table} ALTER COLUMN {_col} SET DEFAULT now()",
+        f"DROP TRIGGER IF EXISTS trg_{_table}_touch ON {_table}",
+        f"""
+        CREATE TRIGGER trg_{_table}_touch
+        BEFORE UPDATE ON {_table}
+        FOR EACH ROW EXECUTE FUNCTION fn_touch_{_col}()
+        """,
+    ]
+
+VERIFY_QUERY = """
+    SELECT count(*) FROM pg_trigger
+    WHERE tgname IN ('trg_products_touch', 'trg_product_variants_touch',
+                     'trg_inventory_levels_touch', 'trg_barcode_versions_touch')
+"""
+
+
+def run_migration():
+    print("[MIGRATION] Connecting to database...")
+    with engine.connect() as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+        conn.commit()
+        n = conn.execute(text(VERIFY_QUERY)).scalar()
+        print(f"[MIGRATION] touch triggers present: {n}/{len(TOUCHED)}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,32 @@
+# migrate_sku_functional_index.py
+"""
+Migration: replace the sku_normalized generated column with a functional index. Idempotent.
+
+product_variants.sku_normalized (STORED `NULLIF(BTRIM(LOWER(sku)), '')`) was never read by any
+query, yet every variant INSERT/UPDATE recomputed and stored it. The exact-SKU lookups that do
+exist match on `btrim(pv.sku) = :sku`, so the index is built on that expression instead.
+Index first (CONCURRENTLY, AUTOCOMMIT), then drop the column (brief ACCESS EXCLUSIVE lock).
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pv_sku_btrim ON product_variants (btrim(sku))",
+    "ALTER TABLE product_variants DROP COLUMN IF EXISTS sku_normalized",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
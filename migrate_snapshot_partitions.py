@@ -0,0 +1,99 @@
+# migrate_snapshot_partitions.py
+"""
+Migration: convert inventory_snapshots to a RANGE (date) partitioned table, one partition per
+month. Idempotent — a no-op once the table is partitioned.
+
+inventory_snapshots is an append-only daily series of the whole catalog. As one heap, every
+insert descends ever-deeper unique/FK indexes and retention is a table-wide DELETE + VACUUM.
+Partitioned, indexes are per month and retention becomes `DROP TABLE inventory_snapshots_YYYY_MM`.
+The (date, product_variant_id, store_id) unique key already contains the partition key, so the
+snapshot upsert's ON CONFLICT is unchanged; the PK becomes (id, date) for the same reason.
+
+Runs in ONE transaction (ACCESS EXCLUSIVE on the table for the copy) — run it outside the 23:55
+snapshot window, BEFORE restarting. Future months are created by
+crud.snapshots.ensure_snapshot_partitions at write time.
+"""
+from datetime import date, timedelta
+
+from database import engine
+from sqlalchemy import text
+
+IS_PARTITIONED = """
+    SELECT 1 FROM pg_partitioned_table pt
+    JOIN pg_class c ON c.oid = pt.partrelid
+    WHERE c.relname = 'inventory_snapshots'
+"""
+
+DETACH_LEGACY = [
+    "ALTER TABLE inventory_snapshots RENAME TO inventory_snapshots_legacy",
+    "ALTER SEQUENCE inventory_snapshots_id_seq OWNED BY NONE",
+    "ALTER TABLE inventory_snapshots_legacy DROP CONSTRAINT IF EXISTS inventory_snapshots_pkey",
+    "ALTER TABLE inventory_snapshots_legacy DROP CONSTRAINT IF EXISTS "
+    "inventory_snapshots_date_product_variant_id_store_id_key",
+    "DROP INDEX IF EXISTS ix_inventory_snapshots_product_variant_id",
+    "DROP INDEX IF EXISTS ix_inventory_snapshots_store_id",
+]
+
+CREATE_PARENT = [
+    """
+    CREATE TABLE inventory_snapshots (
+        id INTEGER NOT NULL DEFAULT nextval('inventory_snapshots_id_seq'),
+        date DATE NOT NULL,
+        product_variant_id BIGINT NOT NULL REFERENCES product_variants (id) ON DELETE CASCADE,
+        store_id INTEGER NOT NULL REFERENCES stores (id) ON DELETE CASCADE,
+        on_hand INTEGER NOT NULL,
+        price NUMERIC(10, 2),
+        cost_per_item NUMERIC(18, 6),
+        PRIMARY KEY (id, date),
+        CONSTRAINT inventory_snapshots_date_product_variant_id_store_id_key
+            UNIQUE (date, product_variant_id, store_id)
+    ) PARTITION BY RANGE (date)
+    """,
+    "CREATE INDEX ix_inventory_snapshots_product_variant_id ON inventory_snapshots (product_variant_id)",
+    "CREATE INDEX ix_inventory_snapshots_store_id ON inventory_snapshots (store_id)",
+]
+
+COPY_BACK = [
+    "INSERT INTO inventory_snapshots (id, date, product_variant_id, store_id, on_hand, price, cost_per_item) "
+    "SELECT id, date, product_variant_id, store_id, on_hand, price, cost_per_item FROM inventory_snapshots_legacy",
+    "DROP TABLE inventory_snapshots_legacy",
+    "ALTER SEQUENCE inventory_snapshots_id_seq OWNED BY inventory_snapshots.id",
+]
+
+
+def _next_month(d: date) -> date:
+    return (d.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _partition_ddl(lo: date, hi: date):
+    """One CREATE per month covering [lo's month, hi's following month]."""
+    start, stop = lo.replace(day=1), _next_month(hi)
+    while start <= stop:
+        end = _next_month(start)
+        yield (f"CREATE TABLE IF NOT EXISTS inventory_snapshots_{start.year:04d}_{start.month:02d} "
+               f"PARTITION OF inventory_snapshots FOR VALUES FROM ('{start}') TO ('{end}')")
+        start = end
+
+
+def run_migration():
+    print("[MIGRATION] Connecting to database...")
+    with engine.begin() as conn:
+        if conn.execute(text(IS_PARTITIONED)).first():
+            print("[MIGRATION] inventory_snapshots is already partitioned — nothing to do.")
+            return
+        conn.execute(text("LOCK TABLE inventory_snapshots IN ACCESS EXCLUSIVE MODE"))
+        lo, hi = conn.execute(text("SELECT min(date), max(date) FROM inventory_snapshots")).one()
+        today = date.today()
+        lo, hi = min(lo or today, today), max(hi or today, today)
+
+        statements = DETACH_LEGACY + CREATE_PARENT + list(_partition_ddl(lo, hi)) + COPY_BACK
+        for i, stmt in enumerate(statements, 1):
+            conn.execute(text(stmt))
+            print(f"  [{i}/{len(statements)}] OK")
+        n = conn.execute(text("SELECT count(*) FROM inventory_snapshots")).scalar()
+        print(f"[MIGRATION] {n} snapshot rows now partitioned by month ({lo:%Y-%m} .. {_next_month(hi):%Y-%m}).")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
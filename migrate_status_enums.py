@@ -0,0 +1,55 @@
+# migrate_status_enums.py
+"""
+Migration: free-text status columns -> native PostgreSQL ENUMs. Idempotent.
+
+  - sync_runs.status        TEXT        -> sync_run_status     (running, ok, partial, failed)
+  - trendyol_pushes.status  VARCHAR(30) -> trendyol_push_status (submitted, success, failed,
+                                                                 rejected, error)
+Both sets are written only by this app (product_sync_runner / trendyol_sync). trendyol_pushes is
+one row per pushed item and is filtered by status on every poll/retry pass; an enum is 4 bytes
+and an integer compare instead of a varlena string compare. The ALTER rewrites each table once,
+so run it outside the Trendyol push window, BEFORE restarting. A value outside the set aborts
+that table's conversion (reported as WARN) and leaves it untouched.
+"""
+from database import engine
+from sqlalchemy import text
+
+from models import SYNC_RUN_STATUSES, TRENDYOL_PUSH_STATUSES
+
+CONVERSIONS = [
+    ("sync_runs", "sync_run_status", SYNC_RUN_STATUSES, None),
+    ("trendyol_pushes", "trendyol_push_status", TRENDYOL_PUSH_STATUSES, "submitted"),
+]
+
+TYPE_EXISTS = "SELECT 1 FROM pg_type WHERE typname = :t"
+COLUMN_TYPE = """
+    SELECT udt_name FROM information_schema.columns
+    WHERE table_name = :tbl AND column_name = 'status'
+"""
+
+
+def run_migration():
+    print("[MIGRATION] Connecting to database...")
+    for i, (table, enum, values, default) in enumerate(CONVERSIONS, 1):
+        try:
+            with engine.begin() as conn:
+                if not conn.execute(text(TYPE_EXISTS), {"t": enum}).first():
+                    labels = ", ".join(f"'{v}'" for v in values)
+                    conn.execute(text(f"CREATE TYPE {enum} AS ENUM ({labels})"))
+                if conn.execute(text(COLUMN_TYPE), {"tbl": table}).scalar() == enum:
+                    print(f"  [{i}/{len(CONVERSIONS)}] {table}.status already {enum}")
+                    continue
+                if default:
+                    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN status DROP DEFAULT"))
+                conn.execute(text(
+                    f"ALTER TABLE {table} ALTER COLUMN status TYPE {enum} USING status::{enum}"))
+                if default:
+                    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN status SET DEFAULT '{default}'"))
+                print(f"  [{i}/{len(CONVERSIONS)}] {table}.status -> {enum} OK")
+        except Exception as e:
+            print(f"  [{i}/{len(CONVERSIONS)}] {table}.status WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
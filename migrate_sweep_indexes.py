@@ -0,0 +1,32 @@
+# migrate_sweep_indexes.py
+"""
+Migration: (store_id, last_seen_at) indexes for the product-sync sweeps. Idempotent + additive.
+
+The end-of-run soft-delete (full sync) and resurrect (incremental sync) passes in
+product_sync_runner filter products by store_id + last_seen_at range; without an index they
+seq-scan the whole catalog while webhook writes are landing. Built CONCURRENTLY so the live
+tables are never write-locked — which requires AUTOCOMMIT (no surrounding transaction).
+"""
+from sqlalchemy import text
+from database import engine
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_store_lastseen ON products (store_id, last_seen_at)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_variants_store_lastseen ON product_variants (store_id, last_seen_at)",
+]
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for i, stmt in enumerate(STATEMENTS, 1):
+            try:
+                conn.execute(text(stmt))
+                print(f"  [{i}/{len(STATEMENTS)}] OK")
+            except Exception as e:
+                print(f"  [{i}/{len(STATEMENTS)}] WARN: {e}")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
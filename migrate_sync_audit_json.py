@@ -0,0 +1,38 @@
+# migrate_sync_audit_json.py
+"""
+Migration: sync_runs.notes / sync_dead_letters.payload JSONB -> JSON. Idempotent.
+
+Both tables are append-only sync audit rows (one per run/page, one per dead-lettered bundle) that
+are never filtered with JSONB operators (@>, ?, ->> in WHERE), so paying JSONB's parse-to-binary
+cost on every insert buys nothing. ALTER ... TYPE rewrites the table under an ACCESS EXCLUSIVE
+lock — run it in a quiet window (no product sync running); sync_dead_letters can be large.
+"""
+from sqlalchemy import text
+from database import engine
+
+COLUMNS = [
+    ("sync_runs", "notes"),
+    ("sync_dead_letters", "payload"),
+]
+
+TYPE_QUERY = """
+    SELECT data_type FROM information_schema.columns
+    WHERE table_name = :t AND column_name = :c
+"""
+
+
+def run_migration():
+    print("[MIGRATION] Connecting...")
+    with engine.begin() as conn:
+        for i, (table, col) in enumerate(COLUMNS, 1):
+            current = conn.execute(text(TYPE_QUERY), {"t": table, "c": col}).scalar()
+            if current != "jsonb":
+                print(f"  [{i}/{len(COLUMNS)}] SKIP {table}.{col}: already {current}")
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {col} TYPE json USING {col}::json"))
+            print(f"  [{i}/{len(COLUMNS)}] OK: {table}.{col} -> json")
+    print("[MIGRATION] Done.")
+
+
+if __name__ == "__main__":
+    run_migration()
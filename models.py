@@ -1,14 +1,40 @@
 # models.py
 from sqlalchemy import (Column, Integer, String, DateTime, Text,
-                        ForeignKey, BIGINT, NUMERIC, BOOLEAN, Index, Computed, UniqueConstraint, Date)
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-from passlib.context import CryptContext
+                        ForeignKey, BIGINT, NUMERIC, BOOLEAN, Index, UniqueConstraint, Date, JSON, Enum,
+                        DDL, event)
+from sqlalchemy.orm import relationship, configure_mappers
+from sqlalchemy.sql import func, text
 from database import Base
 from sqlalchemy.dialects.postgresql import JSONB
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib + the bcrypt C extension are loaded on first use (only /login needs them), not at
+# import time — every worker and scheduler process imports models but never verifies a password.
+_pwd_context = None
+
+
+def _get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+def __getattr__(name):
+    # Keeps `models.pwd_context` working for ad-hoc scripts without paying the cost at import.
+    if name == "pwd_context":
+        return _get_pwd_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Foreign keys and child->parent relationships reference the already-defined class directly
+# (`ForeignKey(Store.id)`, `relationship(Product, ...)`); only forward references to classes
+# defined further down stay strings for the registry to resolve.
+
+# Closed, app-controlled status sets stored as native PG ENUMs (4 bytes, integer compare) rather
+# than free text. Adding a value needs `ALTER TYPE ... ADD VALUE` before the code that writes it.
+SYNC_RUN_STATUSES = ("running", "ok", "partial", "failed")
+TRENDYOL_PUSH_STATUSES = ("submitted", "success", "failed", "rejected", "error")
 
 class User(Base):
     __tablename__ = "users"
@@ -18,7 +44,7 @@ class User(Base):
     email = Column(String(255), unique=True, index=True, nullable=True)
 
     def verify_password(self, password: str) -> bool:
-        return pwd_context.verify(password, self.hashed_password)
+        return _get_pwd_context().verify(password, self.hashed_password)
 
 class Store(Base):
     __tablename__ = "stores"
@@ -36,14 +62,21 @@ class Store(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_synced_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    inventory_snapshots = relationship("InventorySnapshot", back_populates="store")
-    products = relationship("Product", back_populates="store")
+    @property
+    def sync_location_gid(self):
+        """Admin-API GID of the sync location (None when not configured)."""
+        return f"gid://shopify/Location/{self.sync_location_id}" if self.sync_location_id else None
+
+    # Reverse collections are never walked on a request path; fail loudly rather than lazy-load
+    # every product/snapshot of a store.
+    inventory_snapshots = relationship("InventorySnapshot", back_populates="store", lazy="raise_on_sql")
+    products = relationship("Product", back_populates="store", lazy="raise_on_sql")
 
 class Product(Base):
     __tablename__ = "products"
     id = Column(BIGINT, primary_key=True, index=False)
-    shopify_gid = Column(String(255), unique=True, nullable=False)
-    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    shopify_gid = Column(Text, unique=True, nullable=False)
+    store_id = Column(Integer, ForeignKey(Store.id), nullable=False)
     title = Column(String(255))
     body_html = Column(Text)
     vendor = Column(String(255))
@@ -56,23 +89,43 @@ class Product(Base):
     status = Column(String(50))  # Shopify status: ACTIVE, DRAFT, ARCHIVED — all participate in sync
     tags = Column(Text)
     image_url = Column(String(2048))
-    last_fetched_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    last_fetched_at = Column(DateTime(timezone=True), server_default=func.now())  # touched by trigger on UPDATE
     last_seen_at = Column(DateTime(timezone=True))
     # Option B: Soft-delete with timestamp. NULL = active, set = deleted.
     # Products with any status (ACTIVE/DRAFT/ARCHIVED) can participate in barcode sync.
     # Only products soft-deleted by the sync runner (disappeared from Shopify) are excluded.
     deleted_at = Column(DateTime(timezone=True), nullable=True, index=True)
-    variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan")
+    # lazy="raise_on_sql": Product/ProductVariant relationships never lazy-load (an accidental N+1 on
+    # a list endpoint raises instead of silently firing one SELECT per row). Query sites opt in with
+    # joinedload/selectinload; identity-map hits (no SQL) still resolve. The one exception is
+    # `variants`, which is almost always read with its product: selectin loads it for a whole result
+    # set in one `WHERE product_id IN (...)` query. Paths that only need a product column query
+    # that column rather than the entity.
+    variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan",
+                            lazy="selectin")
     
-    store = relationship("Store", back_populates="products")
+    store = relationship(Store, back_populates="products", lazy="raise_on_sql")
+
+    # The full-sync soft-delete / incremental resurrect sweeps filter on (store_id, last_seen_at).
+    __table_args__ = (
+        Index('ix_products_store_lastseen', 'store_id', 'last_seen_at'),
+    )
+
+# Product search (crud.product.get_products) is `lower(col) LIKE '%word%'` on title / sku / barcode;
+# a b-tree can't serve an infix pattern, trigram GIN indexes can (needs the pg_trgm extension).
+event.listen(Base.metadata, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+Index('ix_products_title_trgm', func.lower(Product.title).label('title_lower'),
+      postgresql_using='gin', postgresql_ops={'title_lower': 'gin_trgm_ops'})
 
 
 class ProductVariant(Base):
     __tablename__ = "product_variants"
     id = Column(BIGINT, primary_key=True, index=False)
-    shopify_gid = Column(String(255), unique=True, nullable=False)
-    product_id = Column(BIGINT, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
-    store_id = Column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), nullable=False, index=True)
+    shopify_gid = Column(Text, unique=True, nullable=False)
+    product_id = Column(BIGINT, ForeignKey(Product.id, ondelete="CASCADE"), nullable=False)
+    # No standalone store_id index: ix_product_variants_store_lastseen leads with store_id.
+    store_id = Column(Integer, ForeignKey(Store.id, ondelete="CASCADE"), nullable=False)
     title = Column(String(255))
     price = Column(NUMERIC(10, 2))
     sku = Column(String(255), index=True)
@@ -82,22 +135,23 @@ class ProductVariant(Base):
     cost_per_item = Column(NUMERIC(18, 6))
     tracked = Column(BOOLEAN, default=True, nullable=False)
     inventory_management = Column(String(255))
-    barcode = Column(String(255), index=True)
+    barcode = Column(String(255))  # indexed by ix_pv_barcode_store (barcode leads)
     inventory_item_id = Column(BIGINT, unique=True)
     inventory_quantity = Column(Integer)
     created_at = Column(DateTime(timezone=True))
     updated_at = Column(DateTime(timezone=True))
-    last_fetched_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    last_fetched_at = Column(DateTime(timezone=True), server_default=func.now())  # touched by trigger on UPDATE
     
     is_primary_variant = Column(BOOLEAN, default=False, nullable=False)
     is_barcode_primary = Column(BOOLEAN, default=False, nullable=False)
     
-    sku_normalized = Column(Text, Computed("NULLIF(BTRIM(LOWER(sku)), '')", persisted=True))
     last_seen_at = Column(DateTime(timezone=True))
 
-    product = relationship("Product", back_populates="variants")
-    inventory_levels = relationship("InventoryLevel", back_populates="variant", cascade="all, delete-orphan")
-    inventory_snapshots = relationship("InventorySnapshot", back_populates="product_variant", cascade="all, delete-orphan")
+    product = relationship(Product, back_populates="variants", lazy="raise_on_sql")
+    inventory_levels = relationship("InventoryLevel", back_populates="variant", cascade="all, delete-orphan",
+                                    lazy="raise_on_sql")
+    inventory_snapshots = relationship("InventorySnapshot", back_populates="product_variant",
+                                       cascade="all, delete-orphan", lazy="raise_on_sql")
 
     # 2026-07-14: the UNIQUE(sku, store_id) constraint (added 2025-10-03) was WRONG — Shopify allows
     # duplicate SKUs per store and this business deliberately runs same-store duplicate listings.
@@ -105,44 +159,103 @@ class ProductVariant(Base):
     # BUG-33 clear-before-upsert workaround corrupted sibling SKUs on every sync. Dropped by
     # migrate_p0_cascade_kill.py; row identity is the Shopify variant id.
 
+    @property
+    def inventory_item_gid(self):
+        """Admin-API GID of the variant's inventory item (None when not yet backfilled)."""
+        return f"gid://shopify/InventoryItem/{self.inventory_item_id}" if self.inventory_item_id else None
+
+    __table_args__ = (
+        Index('ix_product_variants_store_lastseen', 'store_id', 'last_seen_at'),
+        # product_id had no index at all: the Product.variants selectin load and the products ->
+        # variants ON DELETE CASCADE both probe it.
+        Index('ix_pv_product_store', 'product_id', 'store_id'),
+        # Barcode-group reads are `WHERE pv.barcode = :b ... DISTINCT ON (pv.barcode, pv.store_id)`;
+        # barcode leads (the selective key), store_id follows in the DISTINCT ON / ORDER BY order.
+        Index('ix_pv_barcode_store', 'barcode', 'store_id'),
+        # Partial: only a few % of rows carry either flag, so these stay tiny.
+        Index('ix_pv_primary', 'product_id', postgresql_where=text('is_primary_variant')),
+        Index('ix_pv_barcode_primary', 'barcode', postgresql_where=text('is_barcode_primary')),
+        # Data-quality scans (routes/data_quality.py): only the offending rows are indexed for the
+        # missing-value checks; the mismatch GROUP BYs read the other column from the index.
+        Index('ix_pv_missing_barcode', 'store_id', 'product_id',
+              postgresql_where=text("barcode IS NULL OR barcode = ''")),
+        Index('ix_pv_missing_sku', 'store_id', 'product_id',
+              postgresql_where=text("sku IS NULL OR sku = ''")),
+        Index('ix_pv_sku_barcode', 'sku', postgresql_include=['barcode', 'store_id'],
+              postgresql_where=text("sku IS NOT NULL AND sku <> ''")),
+        Index('ix_pv_barcode_sku', 'barcode', postgresql_include=['sku', 'store_id'],
+              postgresql_where=text("barcode IS NOT NULL AND barcode <> ''")),
+    )
+    # Rows in a product-delete cascade may already be gone via the FK's ON DELETE CASCADE or a
+    # concurrent webhook; a rowcount mismatch there is expected, not stale data.
+    __mapper_args__ = {"confirm_deleted_rows": False}
+
+# Exact-SKU lookups (trendyol import/mapping) match on btrim(pv.sku); a functional index serves
+# them without storing a normalized copy of every SKU (the old sku_normalized generated column).
+Index('ix_pv_sku_btrim', func.btrim(ProductVariant.sku))
+Index('ix_pv_sku_trgm', func.lower(ProductVariant.sku).label('sku_lower'),
+      postgresql_using='gin', postgresql_ops={'sku_lower': 'gin_trgm_ops'})
+Index('ix_pv_barcode_trgm', func.lower(ProductVariant.barcode).label('barcode_lower'),
+      postgresql_using='gin', postgresql_ops={'barcode_lower': 'gin_trgm_ops'})
+
 class Location(Base):
     __tablename__ = "locations"
     id = Column(BIGINT, primary_key=True, index=False)
-    shopify_gid = Column(String(255)) # This is the critical field
-    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    shopify_gid = Column(Text) # This is the critical field
+    store_id = Column(Integer, ForeignKey(Store.id), nullable=False)
     name = Column(String(255))
-    inventory_levels = relationship("InventoryLevel", back_populates="location")
+    inventory_levels = relationship("InventoryLevel", back_populates="location", lazy="raise_on_sql")
 
 class InventoryLevel(Base):
     __tablename__ = "inventory_levels"
-    variant_id = Column(BIGINT, ForeignKey("product_variants.id", ondelete="CASCADE"), primary_key=True)
-    location_id = Column(BIGINT, ForeignKey("locations.id"), primary_key=True)
-    inventory_item_id = Column(BIGINT, index=True)
+    variant_id = Column(BIGINT, ForeignKey(ProductVariant.id, ondelete="CASCADE"), primary_key=True)
+    location_id = Column(BIGINT, ForeignKey(Location.id), primary_key=True)
+    # Not indexed: nothing looks levels up by inventory_item_id (lookups go through
+    # product_variants.inventory_item_id, which is UNIQUE), so an index here is pure write cost.
+    inventory_item_id = Column(BIGINT)
     available = Column(Integer)
     on_hand = Column(Integer)
     updated_at = Column(DateTime(timezone=True))
-    last_fetched_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
-    variant = relationship("ProductVariant", back_populates="inventory_levels")
-    location = relationship("Location", back_populates="inventory_levels")
+    last_fetched_at = Column(DateTime(timezone=True), server_default=func.now())  # touched by trigger on UPDATE
+    variant = relationship(ProductVariant, back_populates="inventory_levels", lazy="raise_on_sql")
+    # Every serialized level carries its location (a handful of rows per store): join it in.
+    location = relationship(Location, back_populates="inventory_levels", lazy="joined")
+
+    # The PK leads with variant_id; per-location scans (and the locations FK check) need this.
+    __table_args__ = (
+        Index('ix_il_location_updated', 'location_id', 'updated_at'),
+        # Covering: the hot read joins on (variant_id, location_id = sync_location_id) and only wants
+        # the quantities — answerable from the index alone, no heap visit.
+        Index('ix_il_var_cover', 'variant_id', 'location_id', postgresql_include=['available', 'on_hand']),
+        # Partial: negative levels are a corruption signal (clamped + alerted), so this is ~empty;
+        # the diagnostics negative-inventory scan reads it instead of the whole table.
+        Index('ix_il_negative', 'available', postgresql_where=text('available < 0')),
+    )
+    __mapper_args__ = {"confirm_deleted_rows": False}
 
 class InventorySnapshot(Base):
+    """Append-only daily time series, RANGE-partitioned by month on `date` (see
+    migrate_snapshot_partitions.py). The partition key must be part of every unique key, hence
+    the (id, date) PK; crud.snapshots.ensure_snapshot_partitions creates months ahead of writes."""
     __tablename__ = "inventory_snapshots"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    date = Column(Date, nullable=False)
-    product_variant_id = Column(BIGINT, ForeignKey("product_variants.id", ondelete="CASCADE"), nullable=False, index=True)
-    store_id = Column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), nullable=False, index=True)
+    date = Column(Date, primary_key=True, nullable=False)
+    product_variant_id = Column(BIGINT, ForeignKey(ProductVariant.id, ondelete="CASCADE"), nullable=False, index=True)
+    store_id = Column(Integer, ForeignKey(Store.id, ondelete="CASCADE"), nullable=False, index=True)
     on_hand = Column(Integer, nullable=False)
 
     # --- NEW FIELDS FOR METRICS ---
     price = Column(NUMERIC(10, 2), nullable=True)
     cost_per_item = Column(NUMERIC(18, 6), nullable=True)
 
-    product_variant = relationship("ProductVariant", back_populates="inventory_snapshots")
-    store = relationship("Store", back_populates="inventory_snapshots")
+    product_variant = relationship(ProductVariant, back_populates="inventory_snapshots", lazy="raise_on_sql")
+    store = relationship(Store, back_populates="inventory_snapshots", lazy="raise_on_sql")
     
     __table_args__ = (
         UniqueConstraint('date', 'product_variant_id', 'store_id', name='inventory_snapshots_date_product_variant_id_store_id_key'),
+        {'postgresql_partition_by': 'RANGE (date)'},
     )
+    __mapper_args__ = {"confirm_deleted_rows": False}
 
 class SyncRun(Base):
     __tablename__ = "sync_runs"
@@ -151,18 +264,20 @@ class SyncRun(Base):
     started_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     t0 = Column(DateTime(timezone=True), nullable=False)
     finished_at = Column(DateTime(timezone=True))
-    status = Column(Text)
+    status = Column(Enum(*SYNC_RUN_STATUSES, name="sync_run_status"))
     last_cursor = Column(Text)
     pages_ok = Column(Integer, default=0)
     pages_failed = Column(Integer, default=0)
-    notes = Column(JSONB, default={})
+    # Plain JSON (not JSONB) on the two insert-heavy sync audit tables: written once per page /
+    # dead letter, never queried by JSON path, so JSONB's binary conversion on insert is pure cost.
+    notes = Column(JSON, default={})
 
 class SyncDeadLetter(Base):
     __tablename__ = "sync_dead_letters"
     id = Column(BIGINT, primary_key=True, autoincrement=True)
     store_id = Column(BIGINT, nullable=False)
-    run_id = Column(BIGINT, ForeignKey("sync_runs.id"))
-    payload = Column(JSONB, nullable=False)
+    run_id = Column(BIGINT, ForeignKey(SyncRun.id))
+    payload = Column(JSON, nullable=False)
     reason = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
@@ -170,7 +285,7 @@ class Webhook(Base):
     __tablename__ = 'webhooks'
     id = Column(Integer, primary_key=True)
     shopify_webhook_id = Column(BIGINT, unique=True, nullable=False)
-    store_id = Column(Integer, ForeignKey('stores.id'), nullable=False)
+    store_id = Column(Integer, ForeignKey(Store.id), nullable=False)
     topic = Column(String(255), nullable=False)
     address = Column(String(2048), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -178,17 +293,43 @@ class Webhook(Base):
 class BarcodeVersion(Base):
     __tablename__ = "barcode_versions"
     barcode = Column(String(255), primary_key=True)
-    authoritative_store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    authoritative_store_id = Column(Integer, ForeignKey(Store.id), nullable=False)
     quantity = Column(Integer, nullable=False)
     source_timestamp = Column(DateTime(timezone=True), nullable=False)
     version = Column(BIGINT, nullable=False, default=1)
-    last_updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    last_updated_at = Column(DateTime(timezone=True), server_default=func.now())  # touched by trigger on UPDATE
+
+
+# The "touched by trigger" columns above: a BEFORE UPDATE trigger stamps now() unless the writer
+# set the column itself (the old Python onupdate contract, but also honoured by bulk ON CONFLICT
+# paths). Registered on create so a fresh create_all schema gets them; migrate_server_timestamps.py
+# installs the same objects on an existing database.
+def _touch_trigger(table, col):
+    event.listen(table, "after_create", DDL(f"""
+        CREATE OR REPLACE FUNCTION fn_touch_{col}() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.{col} IS NOT DISTINCT FROM OLD.{col} THEN
+                NEW.{col} := now();
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql""").execute_if(dialect="postgresql"))
+    event.listen(table, "after_create", DDL(f"""
+        CREATE TRIGGER trg_{table.name}_touch
+        BEFORE UPDATE ON {table.name}
+        FOR EACH ROW EXECUTE FUNCTION fn_touch_{col}()""").execute_if(dialect="postgresql"))
+
+
+for _model, _col in ((Product, "last_fetched_at"), (ProductVariant, "last_fetched_at"),
+                     (InventoryLevel, "last_fetched_at"), (BarcodeVersion, "last_updated_at")):
+    _touch_trigger(_model.__table__, _col)
+
 
 class WriteIntent(Base):
     __tablename__ = "write_intents"
     id = Column(BIGINT, primary_key=True, autoincrement=True)
     barcode = Column(String(255), nullable=False, index=True)
-    target_store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    target_store_id = Column(Integer, ForeignKey(Store.id), nullable=False)
     # The specific inventory item we wrote to. Lets the echo guard match precisely
     # (per-item) instead of by barcode alone, so multi-listing within a store can't
     # cross-suppress a genuine change. NULL = store-level intent (legacy/absolute).
@@ -238,7 +379,7 @@ class SyncGroupMember(Base):
     SKU-less orphan duplicate) without deleting anything."""
     __tablename__ = "sync_group_members"
     variant_id = Column(BIGINT, primary_key=True)
-    sync_group_id = Column(BIGINT, ForeignKey("sync_groups.id"), nullable=False, index=True)
+    sync_group_id = Column(BIGINT, ForeignKey(SyncGroup.id), nullable=False, index=True)
     store_id = Column(Integer, nullable=False, index=True)
     excluded = Column(BOOLEAN, nullable=False, server_default="false")
     added_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -397,7 +538,8 @@ class TrendyolPush(Base):
     ean_barcode = Column(String(255), nullable=True, index=True)
     quantity = Column(Integer, nullable=False)
     batch_request_id = Column(String(80), nullable=True, index=True)
-    status = Column(String(30), nullable=False, server_default="submitted")  # submitted|success|failed|error
+    status = Column(Enum(*TRENDYOL_PUSH_STATUSES, name="trendyol_push_status"),
+                    nullable=False, server_default="submitted")
     failure_reasons = Column(JSONB, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -421,6 +563,8 @@ class TrendyolOrderLine(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     __table_args__ = (
         Index('ux_trendyol_order_line', 'order_id', 'line_id', unique=True),
+        # Partial: inbound-fold corroboration only ever reads the not-yet-applied lines of a barcode.
+        Index('ix_tol_unapplied', 'trendyol_barcode', 'order_date_ms', postgresql_where=text('NOT applied')),
     )
 
 
@@ -470,4 +614,8 @@ class SystemEvent(Base):
 
     __table_args__ = (
         Index('ix_system_events_level_timestamp', 'level', 'timestamp'),
-    )
\ No newline at end of file
+    )
+
+
+# Resolve every mapper once at import (worker boot), not lazily inside the first request.
+configure_mappers()
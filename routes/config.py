@@ -1,16 +1,19 @@
 # routes/config.py
+import os
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from sqlalchemy.orm import Session
 from typing import List
 
 import schemas
-import models
 from database import get_db
 from crud import store as crud_store, webhooks as crud_webhook
 from shopify_service import ShopifyService
 from services import audit_logger
+from services.webhook_maintenance import ESSENTIAL_WEBHOOK_TOPICS
+from routes.http_cache import etag_response
 
 router = APIRouter(
     prefix="/api/config",
@@ -18,22 +21,21 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# --- Full list of necessary webhooks ---
-ESSENTIAL_WEBHOOK_TOPICS = [
-    # For real-time inventory sync
-    "inventory_levels/update",
-    
-    # For keeping product catalog and barcode mappings up-to-date
-    "products/create",
-    "products/update",
-    "products/delete",
-    "inventory_items/update",
-    "inventory_items/delete"
-]
+# Concurrent Shopify REST calls for the all-stores webhook sweep. Each store has its own rate
+# bucket, so this bounds total sockets/threads rather than any one store's quota.
+WEBHOOK_FANOUT = int(os.getenv("WEBHOOK_FANOUT", "10"))
+
+
+# List responses are validated from the ORM rows (from_attributes, so every schema field is read —
+# dump_json alone would walk __dict__ and drop unloaded columns) and encoded to JSON bytes in
+# pydantic-core; returning the bytes skips FastAPI's response_model pass and its jsonable_encoder walk.
+_STORE_LIST = TypeAdapter(List[schemas.Store])
+_WEBHOOK_LIST = TypeAdapter(List[schemas.Webhook])
 
 @router.get("/stores", response_model=List[schemas.Store])
-def get_all_stores(db: Session = Depends(get_db)):
-    return crud_store.get_all_stores(db)
+def get_all_stores(request: Request, db: Session = Depends(get_db)):
+    stores = _STORE_LIST.validate_python(crud_store.get_all_stores(db), from_attributes=True)
+    return etag_response(request, _STORE_LIST.dump_json(stores))
 
 @router.get("/stores/{store_id}", response_model=schemas.Store)
 def get_single_store(store_id: int, db: Session = Depends(get_db)):
@@ -44,9 +46,9 @@ def get_single_store(store_id: int, db: Session = Depends(get_db)):
 
 @router.post("/stores", response_model=schemas.Store)
 def add_store(store: schemas.StoreCreate, db: Session = Depends(get_db)):
-    if db.query(models.Store).filter(models.Store.name == store.name).first():
-        raise HTTPException(status_code=400, detail="A store with this name already exists.")
     new_store = crud_store.create_store(db=db, store=store)
+    if new_store is None:
+        raise HTTPException(status_code=400, detail="A store with this name or Shopify URL already exists.")
     audit_logger.log_config_change("admin", "store_created",
                                     f"Store '{store.name}' created ({store.shopify_url})",
                                     store_id=new_store.id, store_name=store.name,
@@ -89,7 +91,9 @@ def update_store_settings(store_id: int, payload: StoreUpdatePayload, db: Sessio
 # --- Webhook Management Endpoints ---
 @router.get("/stores/{store_id}/webhooks", response_model=List[schemas.Webhook])
 def get_store_webhooks(store_id: int, db: Session = Depends(get_db)):
-    return crud_webhook.get_webhook_registrations_for_store(db, store_id=store_id)
+    hooks = _WEBHOOK_LIST.validate_python(crud_webhook.get_webhook_registrations_for_store(db, store_id=store_id),
+                                          from_attributes=True)
+    return Response(content=_WEBHOOK_LIST.dump_json(hooks), media_type="application/json")
 
 @router.post("/stores/{store_id}/webhooks/create-all", status_code=201)
 def create_all_necessary_webhooks(store_id: int, request: Request, db: Session = Depends(get_db)):
@@ -102,19 +106,19 @@ def create_all_necessary_webhooks(store_id: int, request: Request, db: Session =
         correct_address = f"{base_url.rstrip('/')}/api/webhooks/{store_id}"
         existing_webhooks = service.get_webhooks()
         existing_webhooks_map = {wh['topic']: {'id': wh['id'], 'address': wh['address']} for wh in existing_webhooks}
-        created_count, updated_count = 0, 0
-        for topic in ESSENTIAL_WEBHOOK_TOPICS:
-            existing = existing_webhooks_map.get(topic)
-            if not existing:
-                created_webhook = service.create_webhook(topic=topic, address=correct_address)
-                crud_webhook.create_webhook_registration(db, store_id=store.id, webhook_data=created_webhook)
-                created_count += 1
-            elif existing['address'] != correct_address:
-                service.delete_webhook(webhook_id=existing['id'])
-                crud_webhook.delete_webhook_registration(db, shopify_webhook_id=existing['id'])
-                created_webhook = service.create_webhook(topic=topic, address=correct_address)
-                crud_webhook.create_webhook_registration(db, store_id=store.id, webhook_data=created_webhook)
-                updated_count += 1
+        missing = [t for t in ESSENTIAL_WEBHOOK_TOPICS if t not in existing_webhooks_map]
+        misaddressed = [t for t in ESSENTIAL_WEBHOOK_TOPICS
+                        if t in existing_webhooks_map and existing_webhooks_map[t]['address'] != correct_address]
+        outcomes = _recreate_webhooks(service, missing + misaddressed, existing_webhooks_map, correct_address)
+        crud_webhook.replace_webhook_registrations(
+            db, store.id,
+            [deleted_id for _, _, deleted_id, _ in outcomes if deleted_id],
+            [w for _, w, _, _ in outcomes if w],
+        )
+        failures = [f"{t}: {err}" for t, _, _, err in outcomes if err is not None]
+        if failures:
+            raise Exception("; ".join(failures))
+        created_count, updated_count = len(missing), len(misaddressed)
         message = f"Webhook setup complete. Created: {created_count}, Updated: {updated_count}."
         if created_count == 0 and updated_count == 0:
             message = "All necessary webhooks are already correctly registered."
@@ -127,6 +131,26 @@ def create_all_necessary_webhooks(store_id: int, request: Request, db: Session =
                                f"Failed to create webhooks for store {store_id}", exc=e)
         raise HTTPException(status_code=500, detail=f"Failed to create/verify webhooks: {str(e)}")
 
+def _recreate_webhooks(service: ShopifyService, topics: List[str], existing_map: dict, address: str) -> List[tuple]:
+    """(topic, created webhook, deleted webhook id, error) for each topic: (re)created at `address`,
+    a misaddressed one deleted first. Topics are independent REST calls, so they go out
+    concurrently — max RTT for the whole set instead of one RTT per topic."""
+    def _one(topic):
+        deleted_id = None
+        try:
+            existing = existing_map.get(topic)
+            if existing:
+                service.delete_webhook(webhook_id=existing['id'])
+                deleted_id = existing['id']
+            return topic, service.create_webhook(topic=topic, address=address), deleted_id, None
+        except Exception as e:
+            return topic, None, deleted_id, e
+
+    if not topics:
+        return []
+    with ThreadPoolExecutor(max_workers=len(topics)) as pool:
+        return list(pool.map(_one, topics))
+
 @router.delete("/stores/{store_id}/webhooks/{shopify_webhook_id}", status_code=204)
 def delete_store_webhook(store_id: int, shopify_webhook_id: int, db: Session = Depends(get_db)):
     store = crud_store.get_store(db, store_id=store_id)
@@ -146,24 +170,39 @@ def delete_all_webhooks_for_all_stores(db: Session = Depends(get_db)):
     if not stores:
         return {"message": "No stores are configured."}
 
-    deleted_count = 0
     errors = []
+    deleted_ids = []
+    services = {store.id: ShopifyService(store_url=store.shopify_url, token=store.api_token) for store in stores}
 
-    for store in stores:
+    def _list(store):
         try:
-            service = ShopifyService(store_url=store.shopify_url, token=store.api_token)
-            existing_webhooks = service.get_webhooks()
-            
-            for webhook in existing_webhooks:
-                try:
-                    service.delete_webhook(webhook_id=webhook['id'])
-                    crud_webhook.delete_webhook_registration(db, shopify_webhook_id=webhook['id'])
-                    deleted_count += 1
-                except Exception as e:
-                    errors.append(f"Failed to delete webhook {webhook['id']} for store '{store.name}': {e}")
+            return store, services[store.id].get_webhooks(), None
+        except Exception as e:
+            return store, [], e
 
+    def _delete(job):
+        store, webhook = job
+        try:
+            services[store.id].delete_webhook(webhook_id=webhook['id'])
+            return store, webhook['id'], None
         except Exception as e:
-            errors.append(f"Could not process webhooks for store '{store.name}': {e}")
+            return store, webhook['id'], e
+
+    # Every list call, then every delete, goes out concurrently (bounded by WEBHOOK_FANOUT) instead
+    # of one blocking round trip per store and per webhook; registrations are dropped in one commit.
+    with ThreadPoolExecutor(max_workers=WEBHOOK_FANOUT) as pool:
+        jobs = []
+        for store, webhooks, err in pool.map(_list, stores):
+            if err is not None:
+                errors.append(f"Could not process webhooks for store '{store.name}': {err}")
+            jobs.extend((store, webhook) for webhook in webhooks)
+        for store, webhook_id, err in pool.map(_delete, jobs):
+            if err is not None:
+                errors.append(f"Failed to delete webhook {webhook_id} for store '{store.name}': {err}")
+            else:
+                deleted_ids.append(webhook_id)
+    crud_webhook.delete_webhook_registrations(db, deleted_ids)
+    deleted_count = len(deleted_ids)
 
     audit_logger.log_config_change("admin", "webhooks_bulk_deleted",
                                     f"Bulk webhook delete: {deleted_count} deleted, {len(errors)} errors",
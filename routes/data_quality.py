@@ -1,12 +1,16 @@
 # routes/data_quality.py
 
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, Depends, Query
+
+import orjson
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, text
 
 from database import get_db
 import models
+from routes.http_cache import etag_response
+from services import data_quality_cache
 
 router = APIRouter(prefix="/api/data-quality", tags=["Data Quality"])
 
@@ -44,17 +48,50 @@ def get_data_quality_issues(
                 params[param_name] = f"%{term}%"
             search_filter = "AND " + " AND ".join(search_conditions)
     
-    # Get issue counts for summary (always unfiltered by issue_type, so cards show totals)
-    summary_sql = text(f"""
-    WITH variants AS (
-        SELECT 
-            pv.id, pv.sku, pv.barcode, pv.store_id,
-            p.title, p.image_url, s.name as store_name
+    # Determine which single issue type to page through
+    # When issue_type is None, default to showing 'no_barcode' issues (most actionable)
+    # This prevents mixing LIMIT/OFFSET across different issue queries which breaks pagination
+    effective_type = issue_type or "no_barcode"
+    params["issue_type"] = effective_type
+    cache_key = (store_id or None, " ".join(search.split()).lower() if search else "")
+    cached = data_quality_cache.get_summary(cache_key)
+
+    # The page (and its total) for the selected issue type ride the SAME statement as the summary
+    # cards: one round-trip and one scan of `variants`, instead of summary + count + page queries.
+    # With the summary cached the statement carries only the page.
+    if effective_type in ("sku_mismatch", "barcode_mismatch"):
+        # Variants whose sku (barcode) maps to more than one distinct barcode (sku). The groups are
+        # judged store-wide (search does not narrow them); the listed variants honour the search.
+        key, other = ("sku", "barcode") if effective_type == "sku_mismatch" else ("barcode", "sku")
+        matches_sql = f"""
+    problem_keys AS (
+        SELECT pv.{key} AS k
         FROM product_variants pv
         JOIN products p ON p.id = pv.product_id
-        JOIN stores s ON s.id = pv.store_id
-        WHERE p.deleted_at IS NULL {store_filter} {search_filter}
+        WHERE pv.{key} IS NOT NULL AND pv.{key} != '' AND p.deleted_at IS NULL {store_filter}
+        GROUP BY pv.{key}
+        HAVING COUNT(DISTINCT NULLIF(pv.{other}, '')) > 1
     ),
+    matches AS (
+        SELECT * FROM variants WHERE {key} IN (SELECT k FROM problem_keys)
+    ),"""
+        order_by = f"{key}, store_name"
+    elif effective_type in ("no_barcode", "no_sku"):
+        col = "barcode" if effective_type == "no_barcode" else "sku"
+        matches_sql = f"""
+    matches AS (
+        SELECT * FROM variants WHERE {col} IS NULL OR {col} = ''
+    ),"""
+        order_by = "title, store_name"
+    else:
+        matches_sql = """
+    matches AS (
+        SELECT * FROM variants WHERE FALSE
+    ),"""
+        order_by = "title, store_name"
+
+    # Summary counts are always unfiltered by issue_type, so cards show totals
+    summary_ctes = "" if cached else """
     no_barcode AS (
         SELECT COUNT(*) as cnt FROM variants WHERE barcode IS NULL OR barcode = ''
     ),
@@ -74,147 +111,54 @@ def get_data_quality_issues(
         WHERE barcode IS NOT NULL AND barcode != ''
         GROUP BY barcode
         HAVING COUNT(DISTINCT NULLIF(sku, '')) > 1
-    )
-    SELECT 
+    ),"""
+    summary_cols = "" if cached else """
         (SELECT cnt FROM no_barcode) as no_barcode_count,
         (SELECT cnt FROM no_sku) as no_sku_count,
         (SELECT COUNT(*) FROM sku_groups) as sku_mismatch_count,
-        (SELECT COUNT(*) FROM barcode_groups) as barcode_mismatch_count
-    """)
-    
-    summary = db.execute(summary_sql, params).mappings().first()
-    
-    # Determine which single issue type to query
-    # When issue_type is None, default to showing 'no_barcode' issues (most actionable)
-    # This prevents mixing LIMIT/OFFSET across different issue queries which breaks pagination
-    effective_type = issue_type or "no_barcode"
-    
-    issues = []
-    total_count = 0
-    
-    if effective_type == "no_barcode":
-        total_count = int(summary["no_barcode_count"] or 0)
-        sql = text(f"""
-        SELECT 
-            pv.id as variant_id, pv.sku, pv.barcode,
-            p.title, p.image_url, s.name as store_name,
-            'no_barcode' as issue_type
-        FROM product_variants pv
-        JOIN products p ON p.id = pv.product_id
-        JOIN stores s ON s.id = pv.store_id
-        WHERE (pv.barcode IS NULL OR pv.barcode = '') AND p.deleted_at IS NULL {store_filter} {search_filter}
-        ORDER BY p.title, s.name
-        LIMIT :limit OFFSET :skip
-        """)
-        rows = db.execute(sql, params).mappings().all()
-        issues = [dict(r) for r in rows]
-    
-    elif effective_type == "no_sku":
-        total_count = int(summary["no_sku_count"] or 0)
-        sql = text(f"""
-        SELECT 
-            pv.id as variant_id, pv.sku, pv.barcode,
-            p.title, p.image_url, s.name as store_name,
-            'no_sku' as issue_type
-        FROM product_variants pv
-        JOIN products p ON p.id = pv.product_id
-        JOIN stores s ON s.id = pv.store_id
-        WHERE (pv.sku IS NULL OR pv.sku = '') AND p.deleted_at IS NULL {store_filter} {search_filter}
-        ORDER BY p.title, s.name
-        LIMIT :limit OFFSET :skip
-        """)
-        rows = db.execute(sql, params).mappings().all()
-        issues = [dict(r) for r in rows]
-    
-    elif effective_type == "sku_mismatch":
-        # Count: number of variants involved in mismatched SKU groups
-        count_sql = text(f"""
-        WITH problem_skus AS (
-            SELECT sku
-            FROM product_variants pv
-            JOIN products p ON p.id = pv.product_id
-            WHERE sku IS NOT NULL AND sku != '' AND p.deleted_at IS NULL {store_filter}
-            GROUP BY sku
-            HAVING COUNT(DISTINCT NULLIF(barcode, '')) > 1
-        )
-        SELECT COUNT(*) as cnt
-        FROM product_variants pv
-        JOIN products p ON p.id = pv.product_id
-        WHERE pv.sku IN (SELECT sku FROM problem_skus) AND p.deleted_at IS NULL {store_filter} {search_filter}
-        """)
-        total_count = db.execute(count_sql, params).scalar() or 0
-        
-        sql = text(f"""
-        WITH problem_skus AS (
-            SELECT sku
-            FROM product_variants pv
-            JOIN products p ON p.id = pv.product_id
-            WHERE sku IS NOT NULL AND sku != '' AND p.deleted_at IS NULL {store_filter}
-            GROUP BY sku
-            HAVING COUNT(DISTINCT NULLIF(barcode, '')) > 1
-        )
-        SELECT 
-            pv.id as variant_id, pv.sku, pv.barcode,
-            p.title, p.image_url, s.name as store_name,
-            'sku_mismatch' as issue_type
-        FROM product_variants pv
-        JOIN products p ON p.id = pv.product_id
-        JOIN stores s ON s.id = pv.store_id
-        WHERE pv.sku IN (SELECT sku FROM problem_skus) AND p.deleted_at IS NULL {store_filter} {search_filter}
-        ORDER BY pv.sku, s.name
-        LIMIT :limit OFFSET :skip
-        """)
-        rows = db.execute(sql, params).mappings().all()
-        issues = [dict(r) for r in rows]
-    
-    elif effective_type == "barcode_mismatch":
-        # Count: number of variants involved in mismatched barcode groups
-        count_sql = text(f"""
-        WITH problem_barcodes AS (
-            SELECT barcode
-            FROM product_variants pv
-            JOIN products p ON p.id = pv.product_id
-            WHERE barcode IS NOT NULL AND barcode != '' AND p.deleted_at IS NULL {store_filter}
-            GROUP BY barcode
-            HAVING COUNT(DISTINCT NULLIF(sku, '')) > 1
-        )
-        SELECT COUNT(*) as cnt
-        FROM product_variants pv
-        JOIN products p ON p.id = pv.product_id
-        WHERE pv.barcode IN (SELECT barcode FROM problem_barcodes) AND p.deleted_at IS NULL {store_filter} {search_filter}
-        """)
-        total_count = db.execute(count_sql, params).scalar() or 0
-        
-        sql = text(f"""
-        WITH problem_barcodes AS (
-            SELECT barcode
-            FROM product_variants pv
-            JOIN products p ON p.id = pv.product_id
-            WHERE barcode IS NOT NULL AND barcode != '' AND p.deleted_at IS NULL {store_filter}
-            GROUP BY barcode
-            HAVING COUNT(DISTINCT NULLIF(sku, '')) > 1
-        )
+        (SELECT COUNT(*) FROM barcode_groups) as barcode_mismatch_count,"""
+    sql = text(f"""
+    WITH variants AS (
         SELECT 
-            pv.id as variant_id, pv.sku, pv.barcode,
-            p.title, p.image_url, s.name as store_name,
-            'barcode_mismatch' as issue_type
+            pv.id, pv.sku, pv.barcode, pv.store_id,
+            p.title, p.image_url, s.name as store_name
         FROM product_variants pv
         JOIN products p ON p.id = pv.product_id
         JOIN stores s ON s.id = pv.store_id
-        WHERE pv.barcode IN (SELECT barcode FROM problem_barcodes) AND p.deleted_at IS NULL {store_filter} {search_filter}
-        ORDER BY pv.barcode, s.name
+        WHERE p.deleted_at IS NULL {store_filter} {search_filter}
+    ),{summary_ctes}{matches_sql}
+    page AS (
+        SELECT id, sku, barcode, title, image_url, store_name,
+               ROW_NUMBER() OVER (ORDER BY {order_by}) as ord
+        FROM matches
+        ORDER BY {order_by}
         LIMIT :limit OFFSET :skip
-        """)
-        rows = db.execute(sql, params).mappings().all()
-        issues = [dict(r) for r in rows]
-    
+    )
+    SELECT {summary_cols}
+        (SELECT COUNT(*) FROM matches) as total_count,
+        (SELECT COALESCE(json_agg(json_build_object(
+                    'variant_id', id, 'sku', sku, 'barcode', barcode, 'title', title,
+                    'image_url', image_url, 'store_name', store_name, 'issue_type', CAST(:issue_type AS TEXT)
+                ) ORDER BY ord), '[]'::json)
+         FROM page) as issues
+    """)
+
+    row = db.execute(sql, params).mappings().first()
+    issues = row["issues"] or []
+    total_count = int(row["total_count"] or 0)
+    if cached:
+        summary = cached
+    else:
+        summary = {
+            "no_barcode": int(row["no_barcode_count"] or 0),
+            "no_sku": int(row["no_sku_count"] or 0),
+            "sku_mismatch": int(row["sku_mismatch_count"] or 0),
+            "barcode_mismatch": int(row["barcode_mismatch_count"] or 0),
+        }
+        data_quality_cache.put_summary(cache_key, summary)
+
     return {
-        "summary": {
-            "no_barcode": int(summary["no_barcode_count"] or 0),
-            "no_sku": int(summary["no_sku_count"] or 0),
-            "sku_mismatch": int(summary["sku_mismatch_count"] or 0),
-            "barcode_mismatch": int(summary["barcode_mismatch_count"] or 0),
-        },
+        "summary": dict(summary),
         "issues": issues,
         "total_count": total_count,
         "issue_type_shown": effective_type,
@@ -222,6 +166,6 @@ def get_data_quality_issues(
 
 
 @router.get("/stores")
-def list_stores(db: Session = Depends(get_db)):
+def list_stores(request: Request, db: Session = Depends(get_db)):
     rows = db.execute(text("SELECT id, name FROM stores WHERE enabled = TRUE ORDER BY name")).mappings().all()
-    return [{"id": int(r["id"]), "name": r["name"]} for r in rows]
+    return etag_response(request, orjson.dumps([{"id": int(r["id"]), "name": r["name"]} for r in rows]))
@@ -0,0 +1,24 @@
+# routes/http_cache.py
+"""Conditional GET for small, rarely-changing lists (store pickers): a strong ETag over the encoded
+body, and a bodiless 304 when the client already holds it."""
+import hashlib
+
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, max-age=30"
+
+
+def _etag_matches(if_none_match: str, tag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in candidates or tag in candidates
+
+
+def etag_response(request: Request, body: bytes) -> Response:
+    """`body` (already-encoded JSON) with ETag + Cache-Control, or 304 on If-None-Match."""
+    tag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    headers = {"ETag": tag, "Cache-Control": CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match", ""), tag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
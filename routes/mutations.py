@@ -4,12 +4,15 @@ from decimal import Decimal
 from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from database import get_db
-from crud import store as crud_store
+from crud import bulk, product as crud_product, store as crud_store
 import models
 from shopify_service import ShopifyService, gid_to_id
+from services import data_quality_cache
 
 router = APIRouter(prefix="/api/mutations", tags=["Mutations"])
 
@@ -51,29 +54,61 @@ def _persist_product_update(db: Session, variables: Dict[str, Any], data: Dict[s
            .update(updates, synchronize_session=False))
         db.commit()
 
+# mutation -> (input key, nested input object or None, DB column, value coercion)
+_VARIANT_FIELDS = {
+    "updateVariantPrices": ("price", None, "price", lambda x: Decimal(str(x))),
+    "updateVariantCompareAt": ("compareAtPrice", None, "compare_at_price", lambda x: Decimal(str(x))),
+    "updateVariantBarcode": ("barcode", None, "barcode", lambda x: x),
+    "updateVariantCosts": ("cost", "inventoryItem", "cost_per_item", lambda x: Decimal(str(x))),
+}
+VARIANT_BULK_MUTATIONS = tuple(_VARIANT_FIELDS)
+
+def _variant_field_value(mutation_name: str, v: Dict[str, Any]):
+    """(column, new value) carried by one productVariantsBulkUpdate input, or None."""
+    spec = _VARIANT_FIELDS.get(mutation_name)
+    if spec is None:
+        return None
+    key, nested, column, coerce = spec
+    src = (v.get(nested) or {}) if nested else v
+    raw = src.get(key)
+    return None if raw is None else (column, coerce(raw))
+
+def _drop_unchanged_variants(db: Session, mutation_name: str, variants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The variant inputs whose value differs from the DB. Grid edits resubmit every cell, so
+    unchanged ones are dropped here (one lookup) instead of spending Shopify calls on no-ops."""
+    wanted = {}
+    for v in variants:
+        fv = _variant_field_value(mutation_name, v)
+        if v.get("id") and fv:
+            wanted[v["id"]] = fv
+    if not wanted:
+        return variants
+    column = next(iter(wanted.values()))[0]
+    current = dict(
+        db.query(models.ProductVariant.shopify_gid, getattr(models.ProductVariant, column))
+          .filter(models.ProductVariant.shopify_gid.in_(list(wanted)))
+          .all()
+    )
+    return [v for v in variants
+            if v.get("id") not in wanted or v["id"] not in current or current[v["id"]] != wanted[v["id"]][1]]
+
 def _persist_variants_bulk(db: Session, mutation_name: str, variables: Dict[str, Any]) -> None:
     incoming: List[Dict[str, Any]] = variables.get("variants") or []
+    column = None
+    values_by_gid: Dict[str, Any] = {}
     for v in incoming:
-        v_gid = v.get("id")
-        if not v_gid:
+        if not v.get("id"):
             continue
-        updates = {}
-        if mutation_name == "updateVariantPrices" and v.get("price") is not None:
-            updates[models.ProductVariant.price] = Decimal(str(v["price"]))
-        if mutation_name == "updateVariantCompareAt" and v.get("compareAtPrice") is not None:
-            updates[models.ProductVariant.compare_at_price] = Decimal(str(v["compareAtPrice"]))
-        if mutation_name == "updateVariantBarcode" and v.get("barcode") is not None:
-            updates[models.ProductVariant.barcode] = v["barcode"]
-        if mutation_name == "updateVariantCosts":
-            inv = v.get("inventoryItem") or {}
-            if inv.get("cost") is not None:
-                updates[models.ProductVariant.cost_per_item] = Decimal(str(inv["cost"]))
-        if updates:
-            (db.query(models.ProductVariant)
-               .filter(models.ProductVariant.shopify_gid == v_gid)
-               .update(updates, synchronize_session=False))
+        fv = _variant_field_value(mutation_name, v)
+        if fv:
+            column = fv[0]
+            values_by_gid[v["id"]] = fv[1]
+    if values_by_gid:
+        # One UPDATE .. FROM (VALUES ...) for every variant (was one UPDATE statement per variant).
+        crud_product.update_variant_column_by_gid(db, column, values_by_gid)
     if incoming:
         db.commit()
+        data_quality_cache.invalidate_summary_cache()
 
 def _persist_inventory_item_update(db: Session, variables: Dict[str, Any]) -> None:
     inv_gid = variables.get("id")
@@ -96,19 +131,16 @@ def _ensure_location(db: Session, loc_gid: str, store_id: int) -> Optional[int]:
     loc_id = gid_to_id(loc_gid)
     if not loc_id:
         return None
-    loc = db.query(models.Location).filter(models.Location.id == loc_id).first()
-    if not loc:
-        db.add(models.Location(id=loc_id, store_id=store_id, name="", shopify_gid=loc_gid))
-        try:
-            db.commit()
-        except Exception:
-            db.rollback()
-            return None
+    # One statement, race-free: an existing location is left untouched.
+    db.execute(pg_insert(models.Location)
+                 .values(id=loc_id, store_id=store_id, name="", shopify_gid=loc_gid)
+                 .on_conflict_do_nothing(index_elements=["id"]))
     return loc_id
 
 def _persist_set_quantities(db: Session, variables: Dict[str, Any]) -> None:
     input_ = variables.get("input") or {}
     items = input_.get("quantities") or []
+    parsed = []
     for item in items:
         inv_gid = item.get("inventoryItemId")
         loc_gid = item.get("locationId")
@@ -118,36 +150,47 @@ def _persist_set_quantities(db: Session, variables: Dict[str, Any]) -> None:
         inv_id = gid_to_id(inv_gid)
         if not inv_id:
             continue
-        variant = (db.query(models.ProductVariant)
-                     .filter(models.ProductVariant.inventory_item_id == inv_id)
-                     .first())
+        parsed.append((inv_id, loc_gid, int(qty)))
+    if not parsed:
+        return
+
+    # One lookup for every variant, one upsert for every level (was SELECT + INSERT/UPDATE per item).
+    variants = crud_product.fetch_variants_by_inventory_items(db, [p[0] for p in parsed])
+    now = _now_utc()
+    locations: Dict[tuple, Optional[int]] = {}
+    rows = []
+    for inv_id, loc_gid, qty in parsed:
+        variant = variants.get(inv_id)
         if not variant:
             continue
-        loc_id = _ensure_location(db, loc_gid, store_id=variant.store_id)
-        if not loc_id:
+        key = (loc_gid, variant.store_id)
+        if key not in locations:
+            locations[key] = _ensure_location(db, loc_gid, store_id=variant.store_id)
+        if not locations[key]:
             continue
-        lvl = (db.query(models.InventoryLevel)
-                 .filter(models.InventoryLevel.variant_id == variant.id,
-                         models.InventoryLevel.location_id == loc_id)
-                 .first())
-        if lvl:
-            lvl.available = int(qty)
-            if lvl.on_hand is None:
-                lvl.on_hand = int(qty)
-            lvl.updated_at = _now_utc()
-            lvl.last_fetched_at = _now_utc()
-        else:
-            db.add(models.InventoryLevel(
-                variant_id=variant.id,
-                location_id=loc_id,
-                inventory_item_id=inv_id,
-                available=int(qty),
-                on_hand=int(qty),
-                updated_at=_now_utc(),
-                last_fetched_at=_now_utc(),
-            ))
-    if items:
-        db.commit()
+        rows.append({
+            "variant_id": variant.id,
+            "location_id": locations[key],
+            "inventory_item_id": inv_id,
+            "available": qty,
+            "on_hand": qty,
+            "updated_at": now,
+            "last_fetched_at": now,
+        })
+    if rows:
+        stmt = pg_insert(models.InventoryLevel).values(bulk.dedupe_rows(rows, ["variant_id", "location_id"]))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["variant_id", "location_id"],
+            set_={
+                "available": stmt.excluded.available,
+                # on_hand is only seeded, never overwritten, by a set-quantities echo.
+                "on_hand": func.coalesce(models.InventoryLevel.on_hand, stmt.excluded.on_hand),
+                "updated_at": stmt.excluded.updated_at,
+                "last_fetched_at": stmt.excluded.last_fetched_at,
+            },
+        )
+        db.execute(stmt)
+    db.commit()
 
 # ---------- endpoints ----------
 
@@ -164,13 +207,21 @@ def execute_mutation(store_id: int, payload: Dict[str, Any], db: Session = Depen
 
     try:
         service = ShopifyService(store_url=store.shopify_url, token=store.api_token)
-        result = service.execute_mutation(mutation_name, variables)
+        if mutation_name in VARIANT_BULK_MUTATIONS:
+            variants = _drop_unchanged_variants(db, mutation_name, variables.get("variants") or [])
+            variables = {**variables, "variants": variants}
+            if variants:
+                result = service.update_variants_bulk(mutation_name, variables.get("productId"), variants)
+            else:
+                result = {"productVariantsBulkUpdate": {"productVariants": [], "userErrors": []}}
+        else:
+            result = service.execute_mutation(mutation_name, variables)
 
         _raise_if_user_errors(result)
 
         if mutation_name in ("setProductCategory", "updateProductType"):
             _persist_product_update(db, variables, result)
-        elif mutation_name in ("updateVariantPrices", "updateVariantCompareAt", "updateVariantBarcode", "updateVariantCosts"):
+        elif mutation_name in VARIANT_BULK_MUTATIONS:
             _persist_variants_bulk(db, mutation_name, variables)
         elif mutation_name == "updateInventoryCost":
             _persist_inventory_item_update(db, variables)
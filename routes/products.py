@@ -1,6 +1,6 @@
 # routes/products.py
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import Optional
 
@@ -30,7 +30,10 @@ def get_products(
         db, skip=skip, limit=limit, store_id=store_id, search=search,
         sort_col=sort_field, sort_order=sort_order
     )
-    return {"total_count": total_count, "products": products}
+    # Validate once and encode straight to JSON bytes in pydantic-core; returning a Response skips
+    # FastAPI's second validate + serialize pass over every product/variant/level.
+    out = schemas.ProductResponse(total_count=total_count, products=products)
+    return Response(content=out.model_dump_json(), media_type="application/json")
 
 @router.get("/{product_id}", response_model=schemas.Product)
 def get_product_details(product_id: int, db: Session = Depends(get_db)):
@@ -40,4 +43,5 @@ def get_product_details(product_id: int, db: Session = Depends(get_db)):
     db_product = crud_product.get_product(db, product_id=product_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return db_product
\ No newline at end of file
+    return Response(content=schemas.Product.model_validate(db_product).model_dump_json(),
+                    media_type="application/json")
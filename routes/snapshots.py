@@ -3,11 +3,13 @@ from __future__ import annotations
 from datetime import date, datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 
+import orjson
 from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from database import get_db
+from routes.http_cache import etag_response
 from crud.snapshots import (
     get_products_with_velocity,
     create_snapshot_for_store,
@@ -18,9 +20,9 @@ from crud.snapshots import (
 router = APIRouter(prefix="/api/snapshots", tags=["snapshots"])
 
 @router.get("/stores")
-def list_stores(db: Session = Depends(get_db)):
+def list_stores(request: Request, db: Session = Depends(get_db)):
     rows = db.execute(text("SELECT id, name FROM stores WHERE enabled = TRUE ORDER BY name")).mappings().all()
-    return [{"id": int(r["id"]), "name": r["name"]} for r in rows]
+    return etag_response(request, orjson.dumps([{"id": int(r["id"]), "name": r["name"]} for r in rows]))
 
 @router.post("/trigger")
 def trigger_snapshot(store_id: int = Query(..., ge=1), db: Session = Depends(get_db)):
@@ -3,11 +3,15 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, func
+from sqlalchemy import or_, func, select
 from unidecode import unidecode
+import orjson
+import os
 import requests
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from database import get_db
 import models
@@ -68,59 +72,62 @@ def get_stock_grouped_by_barcode(
     sort_order: str = Query("asc"),
     db: Session = Depends(get_db)
 ):
-    base_query = (
-        db.query(models.ProductVariant)
-        .join(models.Product, models.Product.id == models.ProductVariant.product_id)
-        .filter(
-            models.ProductVariant.barcode != None,
-            models.ProductVariant.barcode != '',
+    # Plain columns, not ORM objects: every variant used to hydrate a ProductVariant + Product +
+    # Store + its InventoryLevels just to read a dozen scalars. Stock is summed in SQL (served
+    # by ix_il_var_cover) and rows arrive in yield_per batches off a server-side cursor. The groups
+    # built from them (every matching variant, as dicts) are still held in full: the response is
+    # sorted and totalled before its first byte goes out.
+    PV, P, S, IL = models.ProductVariant, models.Product, models.Store, models.InventoryLevel
+    stock_sum = (select(func.coalesce(func.sum(IL.available), 0))
+                 .where(IL.variant_id == PV.id).correlate(PV).scalar_subquery())
+    stmt = (
+        select(PV.id, PV.barcode, PV.sku, PV.is_barcode_primary, PV.price, PV.cost_per_item,
+               P.title, P.image_url, S.name.label("store_name"), S.currency, stock_sum.label("stock"))
+        .join(P, P.id == PV.product_id)
+        .outerjoin(S, S.id == P.store_id)
+        .where(
+            PV.barcode != None,
+            PV.barcode != '',
             # BUG-24 FIX: Exclude soft-deleted products from stock view
-            models.Product.deleted_at.is_(None)
-        )
-        .options(
-            joinedload(models.ProductVariant.product).joinedload(models.Product.store),
-            joinedload(models.ProductVariant.inventory_levels)
+            P.deleted_at.is_(None),
         )
+        .order_by(PV.id)
+        .execution_options(yield_per=STOCK_YIELD_PER)
     )
-
     if store_id:
-        base_query = base_query.filter(models.ProductVariant.store_id == store_id)
-
-    all_variants = base_query.all()
-
-    if search:
-        search_terms = normalize_and_split(search)
-        matching_barcodes = set()
-        for v in all_variants:
-            # BUG-26 FIX: Guard against None values in title, sku, barcode
-            title = v.product.title if v.product else ""
-            full_text = f"{title or ''} {v.sku or ''} {v.barcode or ''}"
-            normalized_full_text = normalize_and_split(full_text)
-            if all(term in normalized_full_text for term in search_terms):
-                matching_barcodes.add(v.barcode)
-        all_variants = [v for v in all_variants if v.barcode in matching_barcodes]
+        stmt = stmt.where(PV.store_id == store_id)
 
+    search_terms = normalize_and_split(search) if search else None
+    matching_barcodes = set()
     exchange_rates = get_exchange_rates("RON")
 
     grouped_by_barcode: Dict[str, Dict[str, Any]] = {}
-    for variant in all_variants:
-        barcode = variant.barcode
+    for row in db.execute(stmt):
+        barcode = row.barcode
+        if search_terms is not None and barcode not in matching_barcodes:
+            # BUG-26 FIX: Guard against None values in title, sku, barcode
+            full_text = f"{row.title or ''} {row.sku or ''} {barcode or ''}"
+            if all(term in normalize_and_split(full_text) for term in search_terms):
+                matching_barcodes.add(barcode)
         if barcode not in grouped_by_barcode:
             grouped_by_barcode[barcode] = { "barcode": barcode, "variants": [] }
 
-        store_currency = variant.product.store.currency if variant.product and variant.product.store else "RON"
-        rate = exchange_rates.get(store_currency, 1.0)
-        variant_stock = sum(level.available for level in variant.inventory_levels if level.available is not None)
+        rate = exchange_rates.get(row.currency or "RON", 1.0)
+        variant_stock = int(row.stock)
 
         grouped_by_barcode[barcode]["variants"].append({
-            "variant_id": variant.id, "product_title": variant.product.title if variant.product else "Unknown",
-            "image_url": variant.product.image_url if variant.product else None,
-            "sku": variant.sku, "store_name": variant.product.store.name if variant.product and variant.product.store else "Unknown",
-            "is_barcode_primary": variant.is_barcode_primary,
-            "stock": variant_stock, "retail_value_ron": (variant_stock * float(variant.price or 0)) * rate,
-            "inventory_value_ron": (variant_stock * float(variant.cost_per_item or 0)) * rate,
+            "variant_id": row.id, "product_title": row.title,
+            "image_url": row.image_url,
+            "sku": row.sku, "store_name": row.store_name or "Unknown",
+            "is_barcode_primary": row.is_barcode_primary,
+            "stock": variant_stock, "retail_value_ron": (variant_stock * float(row.price or 0)) * rate,
+            "inventory_value_ron": (variant_stock * float(row.cost_per_item or 0)) * rate,
         })
 
+    if search_terms is not None:
+        # A barcode group is shown whole when any of its variants matches the search.
+        grouped_by_barcode = {b: g for b, g in grouped_by_barcode.items() if b in matching_barcodes}
+
     final_groups = []
     for barcode, group in grouped_by_barcode.items():
         if not group["variants"]: continue
@@ -158,13 +165,26 @@ def get_stock_grouped_by_barcode(
     grand_total_retail = sum(g['total_retail_value'] for g in final_groups)
     grand_total_inventory = sum(g['total_inventory_value'] for g in final_groups)
 
-    return {
-        "metrics": {
-            "total_stock": grand_total_stock, "total_retail_value": round(grand_total_retail, 2),
-            "total_inventory_value": round(grand_total_inventory, 2)
-        },
-        "results": final_groups
+    metrics = {
+        "total_stock": grand_total_stock, "total_retail_value": round(grand_total_retail, 2),
+        "total_inventory_value": round(grand_total_inventory, 2)
     }
+    return StreamingResponse(_stream_groups(metrics, final_groups), media_type="application/json")
+
+# Barcode groups encoded per streamed chunk of /by-barcode.
+STREAM_CHUNK_GROUPS = 500
+# Variant rows fetched per server-side cursor batch by /by-barcode.
+STOCK_YIELD_PER = int(os.getenv("STOCK_YIELD_PER", "1000"))
+
+def _stream_groups(metrics: Dict[str, Any], groups: List[Dict[str, Any]]):
+    """{"metrics": ..., "results": [...]} as orjson-encoded chunks. `groups` is already built,
+    filtered and sorted in memory; chunking only avoids a second, fully encoded copy of it, and
+    FastAPI's recursive jsonable_encoder pass is skipped entirely."""
+    yield b'{"metrics":' + orjson.dumps(metrics) + b',"results":['
+    for i in range(0, len(groups), STREAM_CHUNK_GROUPS):
+        body = orjson.dumps(groups[i:i + STREAM_CHUNK_GROUPS])[1:-1]
+        yield (b"," + body) if i else body
+    yield b"]}"
 
 class PrimaryVariantPayload(BaseModel):
     variant_id: int
@@ -174,13 +194,18 @@ def set_primary_variant(payload: PrimaryVariantPayload, db: Session = Depends(ge
     variant = db.query(models.ProductVariant).filter(models.ProductVariant.id == payload.variant_id).first()
     if not variant or not variant.barcode:
         raise HTTPException(status_code=404, detail="Variant with that barcode not found.")
+    # Only the current primary needs clearing; rewriting every sibling just churns dead tuples.
     db.query(models.ProductVariant).filter(
-        models.ProductVariant.barcode == variant.barcode
+        models.ProductVariant.barcode == variant.barcode,
+        models.ProductVariant.is_barcode_primary == True,
     ).update({"is_barcode_primary": False}, synchronize_session=False)
     variant.is_barcode_primary = True
     db.commit()
     return {"status": "ok", "message": "Primary variant updated successfully."}
 
+# Stores written concurrently by one bulk stock update.
+STORE_FANOUT = int(os.getenv("STOCK_STORE_FANOUT", "8"))
+
 class BulkStockUpdatePayload(BaseModel):
     barcode: str
     quantity: int
@@ -201,57 +226,54 @@ def bulk_update_stock(payload: BulkStockUpdatePayload, db: Session = Depends(get
     if not all_variants:
         raise HTTPException(status_code=404, detail="No variants found with that barcode")
 
+    # Resolve each variant's store once, from the product/store joined in above: the relationships
+    # are raise_on_sql, and the Shopify workers below get plain values, never ORM state.
     variants_by_store: Dict[int, List[models.ProductVariant]] = {}
+    stores_by_id: Dict[int, models.Store] = {}
     for v in all_variants:
-        store_id = v.product.store.id
-        if store_id not in variants_by_store: variants_by_store[store_id] = []
-        variants_by_store[store_id].append(v)
+        store = v.product.store
+        stores_by_id[store.id] = store
+        variants_by_store.setdefault(store.id, []).append(v)
 
     # BUG-25 FIX: Create WriteIntents BEFORE calling Shopify to suppress echo webhooks
     _create_bulk_update_write_intents(db, payload.barcode, payload.quantity, variants_by_store.keys())
 
     errors = []
     success_updates = []
+    jobs = []
 
     for store_id, variants in variants_by_store.items():
-        store = variants[0].product.store
+        store = stores_by_id[store_id]
         if not store.sync_location_id:
             errors.append(f"Store '{store.name}' has no sync location configured.")
             continue
 
-        location_gid = f"gid://shopify/Location/{store.sync_location_id}"
-        service = ShopifyService(store_url=store.shopify_url, token=store.api_token)
-
+        location_gid = store.sync_location_gid
         quantities_payload = [
-            {"inventoryItemId": f"gid://shopify/InventoryItem/{v.inventory_item_id}", "locationId": location_gid, "quantity": payload.quantity}
+            {"inventoryItemId": v.inventory_item_gid, "locationId": location_gid, "quantity": payload.quantity}
             for v in variants if v.inventory_item_id
         ]
 
         if not quantities_payload: continue
-
-        variables = {
-            "input": {
-                "name": "available", "reason": "correction", "ignoreCompareQuantity": True,
-                "quantities": quantities_payload
-            }
-        }
-
-        try:
-            result = service.execute_mutation("inventorySetQuantities", variables)
-            if result.get("inventorySetQuantities", {}).get("userErrors", []):
-                errors.append(f"Store {store.name}: {result['inventorySetQuantities']['userErrors'][0]['message']}")
+        jobs.append((store, variants, (store.shopify_url, store.api_token, quantities_payload)))
+
+    # Stores are independent Shopify shops (own host, own cost bucket): set them concurrently
+    # instead of paying every store's round-trip in sequence. Workers get plain values, never ORM state.
+    if jobs:
+        with ThreadPoolExecutor(max_workers=min(STORE_FANOUT, len(jobs))) as pool:
+            outcomes = list(pool.map(lambda job: _set_store_quantities(*job[2]), jobs))
+        for (store, variants, _), error in zip(jobs, outcomes):
+            if error:
+                errors.append(f"Store {store.name}: {error}")
             else:
-                variant_ids = [v.id for v in variants]
-                success_updates.append({"variant_ids": variant_ids, "location_id": store.sync_location_id, "quantity": payload.quantity})
-        except Exception as e:
-            errors.append(f"Store {store.name}: {str(e)}")
+                success_updates.append({"variant_ids": [v.id for v in variants], "location_id": store.sync_location_id})
 
-    # After all API calls, update the local database for the successful ones.
+    # After all API calls, update the local database for the successful ones: one upsert across
+    # every store (was one lookup + upsert + commit per store).
     if success_updates:
-        for update in success_updates:
-            crud_product.update_inventory_levels_for_variants(
-                db, variant_ids=update["variant_ids"], location_id=update["location_id"], new_quantity=update["quantity"]
-            )
+        crud_product.set_inventory_levels(
+            db, [(vid, u["location_id"]) for u in success_updates for vid in u["variant_ids"]], payload.quantity
+        )
 
     if errors:
         audit_logger.log_stock_change(payload.barcode, 0, "Manual", 0, payload.quantity,
@@ -265,6 +287,23 @@ def bulk_update_stock(payload: BulkStockUpdatePayload, db: Session = Depends(get
     return {"status": "ok", "message": "Stock updated successfully for all applicable stores."}
 
 
+def _set_store_quantities(shopify_url: str, api_token: str, quantities_payload: List[Dict[str, Any]]) -> Optional[str]:
+    """Set absolute quantities on one store; returns an error message, or None on success."""
+    variables = {
+        "input": {
+            "name": "available", "reason": "correction", "ignoreCompareQuantity": True,
+            "quantities": quantities_payload
+        }
+    }
+    try:
+        service = ShopifyService(store_url=shopify_url, token=api_token)
+        result = service.execute_mutation("inventorySetQuantities", variables)
+        user_errors = result.get("inventorySetQuantities", {}).get("userErrors", [])
+        return user_errors[0]["message"] if user_errors else None
+    except Exception as e:
+        return str(e)
+
+
 def _create_bulk_update_write_intents(db: Session, barcode: str, quantity: int, store_ids):
     """BUG-25 FIX: Create WriteIntents for all stores before bulk stock update."""
     now = datetime.now(timezone.utc)
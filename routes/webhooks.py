@@ -2,9 +2,12 @@
 import hmac
 import hashlib
 import base64
+import os
 import time
+from functools import lru_cache
 from typing import Dict, Any
 
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Request, Header, BackgroundTasks
 from sqlalchemy.orm import Session
 
@@ -15,11 +18,42 @@ from services import audit_logger
 
 router = APIRouter(prefix="/api/webhooks", tags=["Webhooks"])
 
+# Topics handled by inventory_sync_service.handle_catalog_webhook.
+CATALOG_TOPICS = frozenset({"products/create", "products/update", "products/delete",
+                            "inventory_items/update", "inventory_items/delete"})
+
+# Hard cap on a webhook body. The endpoint is public and the body is read before the HMAC check,
+# so an unbounded read would let any caller park arbitrary bytes in worker memory. Real Shopify
+# payloads (a product with its full variant list) stay far below this.
+WEBHOOK_MAX_BYTES = int(os.getenv("WEBHOOK_MAX_BYTES", str(10 * 1024 * 1024)))
+
+async def _read_capped_body(request: Request) -> bytes:
+    """The request body, or 413 as soon as it exceeds WEBHOOK_MAX_BYTES — judged from
+    Content-Length up front when declared, and from the bytes actually streamed either way."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > WEBHOOK_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Webhook body too large")
+    chunks = []
+    total = 0
+    async for chunk in request.stream():
+        total += len(chunk)
+        if total > WEBHOOK_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Webhook body too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+@lru_cache(maxsize=64)
+def _keyed_hmac(secret: str) -> "hmac.HMAC":
+    """Per-secret HMAC with the key schedule already applied; callers .copy() it. Keyed by the
+    secret itself, so a rotated api_secret simply gets a fresh entry."""
+    return hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+
 def verify_webhook(data: bytes, hmac_header: str, secret: str) -> bool:
     """Verify the HMAC signature of the webhook request."""
     if not secret: return False
-    digest = hmac.new(secret.encode('utf-8'), data, digestmod=hashlib.sha256).digest()
-    computed_hmac = base64.b64encode(digest)
+    mac = _keyed_hmac(secret).copy()
+    mac.update(data)
+    computed_hmac = base64.b64encode(mac.digest())
     return hmac.compare_digest(computed_hmac, hmac_header.encode('utf-8'))
 
 @router.post("/{store_id}")
@@ -50,7 +84,12 @@ async def receive_webhook(
                                   result="rejected", error="Store not found")
         raise HTTPException(status_code=404, detail="Store not found")
 
-    raw_body = await request.body()
+    try:
+        raw_body = await _read_capped_body(request)
+    except HTTPException:
+        audit_logger.log_webhook(store.id, store.name, x_shopify_topic or "unknown",
+                                  result="rejected", error="Body exceeds WEBHOOK_MAX_BYTES")
+        raise
     # Use api_secret for HMAC verification, as it's the standard for webhook secrets
     if not verify_webhook(raw_body, x_shopify_hmac_sha256, store.api_secret):
         audit_logger.log_webhook(store.id, store.name, x_shopify_topic or "unknown",
@@ -58,7 +97,7 @@ async def receive_webhook(
         raise HTTPException(status_code=401, detail="Invalid HMAC signature")
 
     try:
-        payload = await request.json()
+        payload = orjson.loads(raw_body)
     except Exception:
         audit_logger.log_webhook(store.id, store.name, x_shopify_topic or "unknown",
                                   result="rejected", error="Malformed JSON body")
@@ -88,7 +127,7 @@ async def receive_webhook(
             x_shopify_triggered_at,
             x_shopify_webhook_id,
         )
-    elif x_shopify_topic in ["products/create", "products/update", "products/delete", "inventory_items/update", "inventory_items/delete"]:
+    elif x_shopify_topic in CATALOG_TOPICS:
         background_tasks.add_task(
             inventory_sync_service.handle_catalog_webhook,
             store_id,
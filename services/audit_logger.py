@@ -31,7 +31,6 @@ Categories:
     RECONCILIATION — Stock reconciliation runs
 """
 import os
-import json
 import time
 import logging
 import traceback
@@ -40,6 +39,8 @@ from typing import Optional, Any, Dict
 from contextlib import contextmanager
 from logging.handlers import RotatingFileHandler
 
+import orjson
+
 from database import SessionLocal
 from models import AuditLog, SystemEvent
 
@@ -139,7 +140,11 @@ def _emit_to_file(
         if stack_trace:
             record["stack_trace"] = stack_trace
 
-        line = json.dumps(record, default=str, ensure_ascii=False)
+        # Every webhook/propagation writes a line here: orjson serializes ~5x faster than json.
+        # Datetimes are passed through to default=str like everything else non-JSON, so values keep
+        # json.dumps(default=str)'s "2026-01-02 10:00:00+00:00" form, not orjson's ISO "T" form.
+        line = orjson.dumps(record, default=str,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME).decode()
 
         # Write to combined log
         _all_logger.info(line)
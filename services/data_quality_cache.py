@@ -0,0 +1,49 @@
+# services/data_quality_cache.py
+"""
+In-process cache for the data-quality summary cards (routes/data_quality.py).
+
+The cards are four aggregate scans that only move when variant data does, yet every keystroke in
+the search box and every page click asks for them again. They are cached per (store_id, search)
+— correct for the single-uvicorn-worker deployment — and dropped once a catalog webhook, a variant
+mutation or a product sync run has committed its writes. The TTL is a backstop for any other path
+that touches variant sku/barcode.
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+SUMMARY_CACHE_TTL_S = int(os.getenv("DQ_SUMMARY_CACHE_TTL_S", "60"))
+SUMMARY_CACHE_MAX_KEYS = int(os.getenv("DQ_SUMMARY_CACHE_MAX_KEYS", "256"))
+
+SummaryKey = Tuple[Optional[int], str]
+
+_summary_lock = threading.Lock()
+_summary_cache: Dict[SummaryKey, Tuple[float, Dict[str, int]]] = {}
+
+
+def get_summary(key: SummaryKey) -> Optional[Dict[str, int]]:
+    """The cached summary for `key`, or None when absent or past its TTL."""
+    now = time.monotonic()
+    with _summary_lock:
+        hit = _summary_cache.get(key)
+        if hit is None or hit[0] <= now:
+            return None
+        return hit[1]
+
+
+def put_summary(key: SummaryKey, summary: Dict[str, int]) -> None:
+    """Cache `summary`, evicting expired keys and then the oldest beyond SUMMARY_CACHE_MAX_KEYS."""
+    now = time.monotonic()
+    with _summary_lock:
+        for k in [k for k, (exp, _) in _summary_cache.items() if exp <= now]:
+            del _summary_cache[k]
+        while len(_summary_cache) >= SUMMARY_CACHE_MAX_KEYS:
+            del _summary_cache[next(iter(_summary_cache))]
+        _summary_cache[key] = (now + SUMMARY_CACHE_TTL_S, summary)
+
+
+def invalidate_summary_cache() -> None:
+    """Forget every cached summary (variant sku/barcode data changed)."""
+    with _summary_lock:
+        _summary_cache.clear()
@@ -12,13 +12,17 @@ Key behaviors:
 import hmac
 import hashlib
 import base64
+import os
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List, Optional
+import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, text
+from sqlalchemy import func, or_, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 import models
 from database import SessionLocal
@@ -30,6 +34,9 @@ from services import alerting
 from services import dist_lock
 from services import pool_engine
 from services import pool_canary
+from services import data_quality_cache
+
+logger = logging.getLogger(__name__)
 
 # --- Configuration ---
 # 900s (was 60): Shopify webhook delivery routinely exceeds a minute under load; an expired intent
@@ -39,6 +46,9 @@ from services import pool_canary
 INTENT_TTL_SECONDS = 900
 DUPLICATE_TTL_SECONDS = 120
 LOCK_TIMEOUT_SECONDS = 30
+# Target stores whose Shopify writes one propagation sends concurrently (process-wide pool).
+PROPAGATION_STORE_FANOUT = int(os.getenv("PROPAGATION_STORE_FANOUT", "8"))
+_store_write_pool = ThreadPoolExecutor(max_workers=PROPAGATION_STORE_FANOUT, thread_name_prefix="store-write")
 
 # Barcodes that are Shopify defaults or placeholders — never sync these
 PLACEHOLDER_BARCODES = frozenset({'0', '00', '000', '0000', '00000', '000000', '0000000', '00000000', '000000000', '0000000000', '00000000000', '000000000000', '0000000000000'})
@@ -62,7 +72,7 @@ def cleanup_barcode_locks():
         for k in stale_keys:
             barcode_locks.pop(k, None)
         if stale_keys:
-            print(f"[CLEANUP] Removed {len(stale_keys)} unused barcode locks.")
+            logger.info("[CLEANUP] Removed %s unused barcode locks.", len(stale_keys))
 
 # --- Main Service Logic ---
 
@@ -89,7 +99,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
     new_available = payload.get("available")
 
     if new_available is None:
-        print(f"[SYNC-ERROR] Webhook is missing 'available' quantity for inventory_item_id {inventory_item_id}")
+        logger.error("[SYNC-ERROR] Webhook is missing 'available' quantity for inventory_item_id %s", inventory_item_id)
         audit_logger.log_error("inventory_sync_service.handle_webhook",
                                f"Missing 'available' quantity for inventory_item_id {inventory_item_id}")
         db.close()
@@ -108,13 +118,13 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
     ).first()
 
     if not barcode_row or not barcode_row.barcode:
-        print(f"[SYNC] Ignored: No variant or barcode found for inventory_item_id {inventory_item_id}")
+        logger.debug("[SYNC] Ignored: No variant or barcode found for inventory_item_id %s", inventory_item_id)
         db.close()
         return
 
     # Sanity: skip placeholder/default barcodes that shouldn't trigger sync
     if barcode_row.barcode.strip() in PLACEHOLDER_BARCODES or not barcode_row.barcode.strip():
-        print(f"[SYNC] Ignored: Placeholder/empty barcode '{barcode_row.barcode}' for inventory_item_id {inventory_item_id}")
+        logger.debug("[SYNC] Ignored: Placeholder/empty barcode '%s' for inventory_item_id %s", barcode_row.barcode, inventory_item_id)
         db.close()
         return
 
@@ -123,7 +133,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
     # In-process lock = cheap fast gate (serializes same-process threads for this barcode).
     lock = get_barcode_lock(barcode)
     if not lock.acquire(timeout=LOCK_TIMEOUT_SECONDS):
-        print(f"[SYNC-ERROR] Could not acquire lock for barcode {barcode}. Task timed out.")
+        logger.error("[SYNC-ERROR] Could not acquire lock for barcode %s. Task timed out.", barcode)
         db.close()
         return
 
@@ -131,7 +141,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
     # whole critical section on a dedicated connection; auto-released if this worker crashes.
     adv = dist_lock.acquire(f"barcode:{barcode}")
     if adv is None:
-        print(f"[SYNC] Skipped {barcode}@{store_id}: distributed lock busy/unavailable.")
+        logger.debug("[SYNC] Skipped %s@%s: distributed lock busy/unavailable.", barcode, store_id)
         audit_logger.log(category="STOCK", action="dist_lock_contention",
                          message=f"Skipped [{barcode}] — distributed lock busy/unavailable",
                          store_id=store_id, target=barcode, severity="WARN")
@@ -146,28 +156,28 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
         ).first()
 
         if not variant or not variant.barcode:
-            print(f"[SYNC] Ignored (inside lock): variant or barcode disappeared for inventory_item_id {inventory_item_id}")
+            logger.debug("[SYNC] Ignored (inside lock): variant or barcode disappeared for inventory_item_id %s", inventory_item_id)
             return
 
         if variant.barcode != barcode:
-            print(f"[SYNC-WARN] Barcode changed from {barcode} to {variant.barcode} between lock acquisition.")
+            logger.warning("[SYNC-WARN] Barcode changed from %s to %s between lock acquisition.", barcode, variant.barcode)
             barcode = variant.barcode
 
         # Skip variants belonging to soft-deleted products (deleted_at IS NOT NULL)
-        product = db.query(models.Product).filter(models.Product.id == variant.product_id).first()
+        product = db.query(models.Product.deleted_at).filter(models.Product.id == variant.product_id).first()
         if product and product.deleted_at is not None:
-            print(f"[SYNC] Ignored: Variant belongs to a soft-deleted product (barcode={barcode}, product_id={variant.product_id})")
+            logger.debug("[SYNC] Ignored: Variant belongs to a soft-deleted product (barcode=%s, product_id=%s)", barcode, variant.product_id)
             return
 
         # P0.5: idempotency by Shopify webhook id (stable across retries), with the legacy
         # value-hash as a fallback when the header is absent.
         try:
             if _is_duplicate_webhook(db, store_id, barcode, new_available, source_timestamp, webhook_id=webhook_id):
-                print(f"[SYNC] Ignored: Duplicate webhook for {barcode} at store {store_id} (id={webhook_id}).")
+                logger.debug("[SYNC] Ignored: Duplicate webhook for %s at store %s (id=%s).", barcode, store_id, webhook_id)
                 return
         except Exception as e:
             db.rollback()
-            print(f"[SYNC-WARN] Dedup check failed, proceeding anyway: {e}")
+            logger.warning("[SYNC-WARN] Dedup check failed, proceeding anyway: %s", e)
 
         # SOURCE-STORE GATE (2026-07-14): a disabled store must be inert as an observation SOURCE
         # too, not merely excluded as a write target — before this gate its webhooks still drove
@@ -185,7 +195,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
                     ORDER BY event_id DESC LIMIT 1"""),
                     {"b": barcode, "v": variant.id}).first()
                 if prev is not None and pool_engine.is_stale_for_source(prev[0], source_timestamp):
-                    print(f"[SYNC] Ignored: out-of-order disabled-store event for {barcode}@{store_id}.")
+                    logger.debug("[SYNC] Ignored: out-of-order disabled-store event for %s@%s.", barcode, store_id)
                     return
             except Exception:
                 db.rollback()
@@ -200,7 +210,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
                         kind="disabled_store_baseline")
             except Exception:
                 db.rollback()
-            print(f"[SYNC] Store {store_id} is disabled: mirrored {barcode} qty {new_available}, no propagation.")
+            logger.info("[SYNC] Store %s is disabled: mirrored %s qty %s, no propagation.", store_id, barcode, new_available)
             audit_logger.log(category="STOCK", action="disabled_store_ingest",
                              message=f"[{barcode}] observation from DISABLED store {store_id} mirrored only (qty {new_available})",
                              store_id=store_id, target=barcode, severity="INFO",
@@ -223,10 +233,11 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
             echo_op, residual = echo
             _resync_local_baseline(db, variant.id, payload.get("location_id"), new_available)
             if residual is None or residual == 0:
-                print(f"[SYNC] Suppressed echo (lineage op={echo_op}) for {barcode}@{store_id}.")
+                logger.debug("[SYNC] Suppressed echo (lineage op=%s) for %s@%s.", echo_op, barcode, store_id)
                 return
-            print(f"[SYNC] Authoritative echo for {barcode}@{store_id}: residual={residual} "
-                  f"(real change layered on our write op={echo_op}) — propagating residual.")
+            logger.info("[SYNC] Authoritative echo for %s@%s: residual=%s "
+                        "(real change layered on our write op=%s) — propagating residual.",
+                        barcode, store_id, residual, echo_op)
             delta = residual
             last_known = new_available - residual  # == authoritative_qty; keep baseline consistent
             authoritative_residual = True
@@ -258,7 +269,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
             # This happens when our own propagation write bounces back as a webhook — or when a
             # CONTINUE store moves below the floor (pool-irrelevant). Keep the raw mirror exact.
             if delta is not None and delta == 0:
-                print(f"[SYNC] Suppressed echo for {barcode} at store {store_id} (delta=0).")
+                logger.debug("[SYNC] Suppressed echo for %s at store %s (delta=0).", barcode, store_id)
                 if new_available != last_known:
                     _resync_local_baseline(db, variant.id, payload.get("location_id"), new_available)
                 return
@@ -267,7 +278,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
             # where the local delta baseline drifted). Matching by inventory_item_id + value is
             # precise and never suppresses a genuine different value (no oversell risk).
             if _is_echo(db, store_id, barcode, new_available, inventory_item_id=inventory_item_id):
-                print(f"[SYNC] Suppressed echo for {barcode} at store {store_id} (WriteIntent match).")
+                logger.debug("[SYNC] Suppressed echo for %s at store %s (WriteIntent match).", barcode, store_id)
                 # Keep the local baseline exact so future deltas compute correctly.
                 source_location_id = payload.get("location_id")
                 if source_location_id:
@@ -300,7 +311,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
                     source_timestamp=source_timestamp, webhook_id=webhook_id, raw_payload=payload)
                 return
         except Exception as _cw:
-            print(f"[CANARY-ERROR] canary_handle failed for {barcode}, rolling back to legacy: {_cw}")
+            logger.error("[CANARY-ERROR] canary_handle failed for %s, rolling back to legacy: %s", barcode, _cw)
             try:
                 pool_canary.trigger_rollback(db, barcode, "canary_exception", {"error": str(_cw)})
             except Exception:
@@ -329,12 +340,12 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
                     source_timestamp=source_timestamp, webhook_id=webhook_id,
                     legacy_quantity=new_available, caller_holds_lock=True)
             except Exception as _sh:
-                print(f"[SHADOW-WARN] pool shadow_observe failed (ignored): {_sh}")
+                logger.warning("[SHADOW-WARN] pool shadow_observe failed (ignored): %s", _sh)
 
         # --- VERSION CHECK ---
         is_authoritative = _is_new_authoritative_version(db, barcode, source_timestamp)
         if not is_authoritative:
-            print(f"[SYNC] Ignored: Stale event for {barcode} from store {store_id}.")
+            logger.debug("[SYNC] Ignored: Stale event for %s from store %s.", barcode, store_id)
             return
 
         # CATASTROPHIC-DROP VERIFICATION (2026-07-14): a big drop (e.g. 995 -> 0) must be confirmed
@@ -357,7 +368,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
                         f"gid://shopify/InventoryItem/{inventory_item_id}",
                         f"gid://shopify/Location/{source_store.sync_location_id}")
                 except Exception as e:
-                    print(f"[SYNC-WARN] Big-drop live verification read failed for {barcode}@{store_id}: {e}")
+                    logger.warning("[SYNC-WARN] Big-drop live verification read failed for %s@%s: %s", barcode, store_id, e)
             if live is None:
                 _trip_breaker(db, barcode, reason="drop_unverifiable",
                               details={"store_id": store_id, "last_known": last_known,
@@ -442,7 +453,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
         if sync_guards.use_sync_groups():
             raw_targets, blocked = _resolve_group_targets(db, variant)
             if blocked:
-                print(f"[SYNC] No propagation for {barcode}@{store_id}: {blocked}")
+                logger.info("[SYNC] No propagation for %s@%s: %s", barcode, store_id, blocked)
                 audit_logger.log(category="STOCK", action="propagation_group_blocked",
                                  message=f"[{barcode}] blocked: {blocked}", store_id=store_id,
                                  target=barcode, severity="INFO", details={"reason": blocked})
@@ -459,9 +470,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
             # Group by store for batched API calls
             store_map: Dict[int, List[models.ProductVariant]] = {}
             for pv in propagation_targets:
-                if pv.store_id not in store_map:
-                    store_map[pv.store_id] = []
-                store_map[pv.store_id].append(pv)
+                store_map.setdefault(pv.store_id, []).append(pv)
 
             target_store_ids = list(store_map.keys())
             target_stores = db.query(models.Store).filter(
@@ -490,7 +499,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
             sync_op = str(uuid.uuid4())
             total_variants = sum(len(vs) for vs in store_map.values())
             mode = "delta" if delta is not None else "absolute"
-            print(f"[SYNC] Propagating '{barcode}' {mode}={delta} (new_qty={new_available}) op={sync_op} to {total_variants} variants across {len(store_map)} stores.")
+            logger.info("[SYNC] Propagating '%s' %s=%s (new_qty=%s) op=%s to %s variants across %s stores.", barcode, mode, delta, new_available, sync_op, total_variants, len(store_map))
 
             # Audit log the propagation event (with lineage)
             audit_logger.log(
@@ -536,7 +545,7 @@ def handle_webhook(store_id: int, payload: Dict[str, Any], triggered_at_str: str
                                            f"Absolute propagation failed for barcode {barcode}",
                                            details={"barcode": barcode, "quantity": new_available}, exc=e)
         else:
-            print(f"[SYNC] No other variants to propagate to for barcode {barcode}.")
+            logger.info("[SYNC] No other variants to propagate to for barcode %s.", barcode)
 
     finally:
         dist_lock.release(adv)
@@ -581,12 +590,15 @@ def handle_catalog_webhook(store_id: int, topic: str, payload: Dict[str, Any]):
             crud_product.delete_inventory_item_from_webhook(db, payload)
 
     except Exception as e:
-        print(f"[SYNC-ERROR] Failed to process catalog webhook '{topic}': {e}")
+        logger.error("[SYNC-ERROR] Failed to process catalog webhook '%s': %s", topic, e)
         audit_logger.log_error("inventory_sync_service.handle_catalog_webhook",
                                f"Failed to process catalog webhook '{topic}' for store {store_id}",
                                details={"topic": topic}, exc=e)
     finally:
         db.close()
+        # After the writes above have committed (or partly committed before a failure), so the next
+        # summary request recomputes from the new rows instead of re-caching the old ones.
+        data_quality_cache.invalidate_summary_cache()
 
 
 def _auto_sync_product_barcodes(db: Session, store_id: int, payload: Dict[str, Any]):
@@ -611,7 +623,7 @@ def _auto_sync_product_barcodes(db: Session, store_id: int, payload: Dict[str, A
             _sync_variant_to_barcode_group(db, store_id, variant_id, barcode)
 
     except Exception as e:
-        print(f"[SYNC-AUTO] Error in auto-sync for store {store_id}: {e}")
+        logger.error("[SYNC-AUTO] Error in auto-sync for store %s: %s", store_id, e)
         audit_logger.log_error("inventory_sync_service._auto_sync_product_barcodes",
                                f"Auto-sync failed for store {store_id}",
                                exc=e)
@@ -726,13 +738,13 @@ def _sync_variant_to_barcode_group(db: Session, store_id: int, variant_id: int,
     # Serialize against the inventory_levels/update handler for this barcode.
     lock = get_barcode_lock(barcode)
     if not lock.acquire(timeout=LOCK_TIMEOUT_SECONDS):
-        print(f"[SYNC-AUTO] Could not acquire lock for barcode {barcode}; skipping auto-sync.")
+        logger.warning("[SYNC-AUTO] Could not acquire lock for barcode %s; skipping auto-sync.", barcode)
         return
 
     try:
         target_quantity = _get_group_authoritative_qty(db, barcode, exclude_variant_id=variant_id)
         if target_quantity is None:
-            print(f"[SYNC-AUTO] Cannot determine group stock for barcode {barcode}, skipping auto-sync")
+            logger.info("[SYNC-AUTO] Cannot determine group stock for barcode %s, skipping auto-sync", barcode)
             return
 
         version_obj = db.query(models.BarcodeVersion).filter(
@@ -749,7 +761,7 @@ def _sync_variant_to_barcode_group(db: Session, store_id: int, variant_id: int,
         except Exception:
             db.rollback()  # best-effort
 
-        location_gid = f"gid://shopify/Location/{store.sync_location_id}"
+        location_gid = store.sync_location_gid
         service = ShopifyService(store_url=store.shopify_url, token=store.api_token)
         variables = {
             "input": {
@@ -757,7 +769,7 @@ def _sync_variant_to_barcode_group(db: Session, store_id: int, variant_id: int,
                 "reason": "correction",
                 "ignoreCompareQuantity": True,
                 "quantities": [{
-                    "inventoryItemId": f"gid://shopify/InventoryItem/{new_variant.inventory_item_id}",
+                    "inventoryItemId": new_variant.inventory_item_gid,
                     "locationId": location_gid,
                     "quantity": target_quantity,
                 }],
@@ -766,7 +778,7 @@ def _sync_variant_to_barcode_group(db: Session, store_id: int, variant_id: int,
         result = service.execute_mutation("inventorySetQuantities", variables)
         user_errors = result.get("inventorySetQuantities", {}).get("userErrors", [])
         if user_errors:
-            print(f"[SYNC-AUTO] Shopify userErrors for barcode {barcode}: {user_errors}")
+            logger.error("[SYNC-AUTO] Shopify userErrors for barcode %s: %s", barcode, user_errors)
             return
 
         crud_product.update_inventory_levels_for_variants(
@@ -792,7 +804,7 @@ def _sync_variant_to_barcode_group(db: Session, store_id: int, variant_id: int,
         except Exception:
             db.rollback()   # best-effort — the align itself already succeeded
 
-        print(f"[SYNC-AUTO] Aligned barcode {barcode} on store '{store.name}' to qty {target_quantity} (force={force})")
+        logger.info("[SYNC-AUTO] Aligned barcode %s on store '%s' to qty %s (force=%s)", barcode, store.name, target_quantity, force)
         audit_logger.log_propagation(
             barcode=barcode,
             source_store="auto_sync",
@@ -801,7 +813,7 @@ def _sync_variant_to_barcode_group(db: Session, store_id: int, variant_id: int,
             details={"trigger": "barcode_group_join", "variant_id": variant_id, "force": force},
         )
     except Exception as e:
-        print(f"[SYNC-AUTO-ERROR] Failed to auto-sync barcode {barcode} on store '{store.name}': {e}")
+        logger.error("[SYNC-AUTO-ERROR] Failed to auto-sync barcode %s on store '%s': %s", barcode, store.name, e)
         audit_logger.log_error("inventory_sync_service._sync_variant_to_barcode_group",
                                f"Auto-sync failed for barcode {barcode} on store '{store.name}'",
                                details={"barcode": barcode, "variant_id": variant_id}, exc=e)
@@ -818,12 +830,16 @@ def _is_duplicate_webhook(db: Session, store_id: int, barcode: str, total: int,
         event_id = f"whid:{webhook_id}"
     else:
         event_id = hashlib.sha256(f"{store_id}-{barcode}-{total}-{timestamp.isoformat()}".encode()).hexdigest()
-    if db.query(models.ProcessedWebhook).filter(models.ProcessedWebhook.id == event_id).first():
-        return True
-    new_record = models.ProcessedWebhook(id=event_id, expires_at=datetime.now(timezone.utc) + timedelta(seconds=DUPLICATE_TTL_SECONDS))
-    db.add(new_record)
+    # Claim the marker in ONE statement: no SELECT round trip, and two concurrent deliveries of
+    # the same event can't both pass a check-then-insert (the loser gets no row back).
+    claimed = db.execute(
+        pg_insert(models.ProcessedWebhook)
+        .values(id=event_id, expires_at=datetime.now(timezone.utc) + timedelta(seconds=DUPLICATE_TTL_SECONDS))
+        .on_conflict_do_nothing(index_elements=["id"])
+        .returning(models.ProcessedWebhook.id)
+    ).first()
     db.commit()
-    return False
+    return claimed is None
 
 
 def _resync_local_baseline(db: Session, variant_id: int, location_id, new_available: int):
@@ -1038,7 +1054,7 @@ def _update_authoritative_version(db: Session, barcode: str, store_id: int, quan
         db.commit()
     except Exception as e:
         db.rollback()
-        print(f"[SYNC-ERROR] Failed to update authoritative version for {barcode}: {e}")
+        logger.error("[SYNC-ERROR] Failed to update authoritative version for %s: %s", barcode, e)
         raise
 
 def _resolve_group_targets(db: Session, variant: models.ProductVariant):
@@ -1049,16 +1065,21 @@ def _resolve_group_targets(db: Session, variant: models.ProductVariant):
       - blocked_reason: a string if this group/variant must NOT propagate (quarantine, excluded
         orphan, sync disabled, confirmed error), else None.
     """
-    member = db.query(models.SyncGroupMember).filter(
-        models.SyncGroupMember.variant_id == variant.id
-    ).first()
-    if member is None:
+    # Membership and its group in one round trip (runs on every inventory webhook). Not cached
+    # in-process: a stale entry would keep propagating a group that was just quarantined.
+    row = (
+        db.query(models.SyncGroupMember, models.SyncGroup)
+        .outerjoin(models.SyncGroup, models.SyncGroup.id == models.SyncGroupMember.sync_group_id)
+        .filter(models.SyncGroupMember.variant_id == variant.id)
+        .first()
+    )
+    if row is None:
         return None, None  # not group-mapped → caller falls back to barcode grouping
+    member, group = row
 
     if member.excluded:
         return [], "trigger is an excluded orphan (not a sync participant)"
 
-    group = db.query(models.SyncGroup).filter(models.SyncGroup.id == member.sync_group_id).first()
     if group is None:
         return None, None
     if not group.sync_enabled or group.classification in ("QUARANTINED", "CONFIRMED_ERROR"):
@@ -1153,15 +1174,36 @@ def _reject_floor_breach(db: Session, barcode: str, store: models.Store, current
                               "quarantine_seconds": sync_guards.FLOOR_BREACH_QUARANTINE_SECONDS})
 
 
+def _sync_location_levels(db: Session, target_stores: List[models.Store],
+                          store_variant_map: Dict[int, List[models.ProductVariant]]) -> Dict[int, Optional[int]]:
+    """variant_id -> mirrored `available` at its store's sync location, for every writable target
+    of a propagation, in ONE query (was one SELECT per target variant, twice: pre-scan + staging).
+    A variant with no level row is simply absent (callers treat it like available=None)."""
+    store_lookup = {s.id: s for s in target_stores}
+    pairs = [
+        (v.id, store_lookup[sid].sync_location_id)
+        for sid, variants in store_variant_map.items()
+        if sid in store_lookup and store_lookup[sid].sync_location_id
+        for v in variants if v.inventory_item_id
+    ]
+    if not pairs:
+        return {}
+    rows = (db.query(models.InventoryLevel.variant_id, models.InventoryLevel.available)
+              .filter(tuple_(models.InventoryLevel.variant_id, models.InventoryLevel.location_id).in_(pairs)))
+    return {vid: available for vid, available in rows}
+
+
 def _scan_floor_breach(db: Session, barcode: str, delta: int,
                        target_stores: List[models.Store],
                        store_variant_map: Dict[int, List[models.ProductVariant]],
-                       sync_op: str) -> bool:
+                       sync_op: str, levels: Optional[Dict[int, Optional[int]]] = None) -> bool:
     """Pre-scan EVERY target before anything is written: if the delta would breach the floor beyond
     tolerance on ANY target, reject the whole propagation (True = rejected). Runs before the first
     Shopify call so a corrupt delta writes to zero stores, not 'all stores before the bad one'."""
     if delta >= 0:
         return False
+    if levels is None:
+        levels = _sync_location_levels(db, target_stores, store_variant_map)
     store_lookup = {s.id: s for s in target_stores}
     for sid, variants_to_update in store_variant_map.items():
         store = store_lookup.get(sid)
@@ -1170,11 +1212,7 @@ def _scan_floor_breach(db: Session, barcode: str, delta: int,
         for v in variants_to_update:
             if not v.inventory_item_id:
                 continue
-            level = db.query(models.InventoryLevel).filter(
-                models.InventoryLevel.variant_id == v.id,
-                models.InventoryLevel.location_id == store.sync_location_id,
-            ).first()
-            current = level.available if (level and level.available is not None) else None
+            current = levels.get(v.id)
             reject, breach = sync_guards.floor_breach_rejects(current, delta)
             if reject:
                 _reject_floor_breach(db, barcode, store, current, delta, breach, sync_op)
@@ -1211,7 +1249,7 @@ def _propagate_delta_single_item(db: Session, barcode: str, delta: int, new_sour
                 return True
         # The absolute target we intend to land on this item.
         target = floor_value if clamped else ((current + delta) if current is not None else None)
-        item_gid = f"gid://shopify/InventoryItem/{v.inventory_item_id}"
+        item_gid = v.inventory_item_gid
 
         # Marker FIRST (authoritative_qty stamped only once the post-write value is known).
         marker = _create_echo_marker(db, barcode, store.id, v.inventory_item_id, target,
@@ -1221,7 +1259,7 @@ def _propagate_delta_single_item(db: Session, barcode: str, delta: int, new_sour
             db.commit()
         except Exception:
             db.rollback()
-            print(f"[SYNC-WARN] Could not stage single-item marker for {store.name}: {barcode}")
+            logger.warning("[SYNC-WARN] Could not stage single-item marker for %s: %s", store.name, barcode)
             continue
 
         authoritative = None
@@ -1318,7 +1356,7 @@ def _propagate_delta_single_item(db: Session, barcode: str, delta: int, new_sour
                          "sync_operation_uuid": sync_op, "origin_store_id": origin_store_id})
         except Exception as e:
             db.rollback()
-            print(f"[SYNC-ERROR] Failed single-item propagate to '{store.name}': {e}")
+            logger.error("[SYNC-ERROR] Failed single-item propagate to '%s': %s", store.name, e)
             audit_logger.log_error("inventory_sync_service._propagate_delta_single_item",
                                    f"Failed to propagate barcode {barcode} to store '{store.name}'",
                                    details={"barcode": barcode, "delta": delta}, exc=e)
@@ -1345,23 +1383,26 @@ def _execute_delta_propagation(
     still clamps that item to the floor, visibly.
     P0.2 lineage: each write records a value-independent echo marker carrying the sync op + origin.
     """
-    if _scan_floor_breach(db, barcode, delta, target_stores, store_variant_map, sync_op):
+    levels = _sync_location_levels(db, target_stores, store_variant_map)
+    if _scan_floor_breach(db, barcode, delta, target_stores, store_variant_map, sync_op, levels):
         return
     store_lookup = {s.id: s for s in target_stores}
     ref_uri = f"inventory-sync://op/{sync_op}"
+    single_item = sync_guards.echo_authoritative_for(barcode)
+    staged = []
 
     for sid, variants_to_update in store_variant_map.items():
         store = store_lookup.get(sid)
         if not store or not store.sync_location_id:
             if store:
-                print(f"[SYNC-ERROR] Cannot propagate to store '{store.name}': No sync location configured.")
+                logger.error("[SYNC-ERROR] Cannot propagate to store '%s': No sync location configured.", store.name)
             continue
 
-        location_gid = f"gid://shopify/Location/{store.sync_location_id}"
+        location_gid = store.sync_location_gid
 
         # SYNC_ECHO_AUTHORITATIVE: write each item via its own single-item mutation so the
         # Shopify-authoritative post-write quantity is attributable and stamped on the marker.
-        if sync_guards.echo_authoritative_for(barcode):
+        if single_item:
             if _propagate_delta_single_item(db, barcode, delta, new_source_qty, store, location_gid,
                                             variants_to_update, ref_uri, sync_op, origin_store_id,
                                             origin_item_id):
@@ -1376,11 +1417,7 @@ def _execute_delta_propagation(
             for v in variants_to_update:
                 if not v.inventory_item_id:
                     continue
-                level = db.query(models.InventoryLevel).filter(
-                    models.InventoryLevel.variant_id == v.id,
-                    models.InventoryLevel.location_id == store.sync_location_id,
-                ).first()
-                current = level.available if (level and level.available is not None) else None
+                current = levels.get(v.id)
                 op, value, clamped = sync_guards.apply_floor(current, delta)
                 if clamped:
                     # Defense-in-depth behind the pre-scan (the mirror could have moved since).
@@ -1394,7 +1431,7 @@ def _execute_delta_propagation(
                 _create_echo_marker(db, barcode, store.id, v.inventory_item_id, expected,
                                     sync_op, origin_store_id, origin_item_id, depth=1)
 
-                item_gid = f"gid://shopify/InventoryItem/{v.inventory_item_id}"
+                item_gid = v.inventory_item_gid
                 if clamped:
                     set_payload.append({"inventoryItemId": item_gid, "locationId": location_gid, "quantity": value})
                     set_ids.append(v.id)
@@ -1413,33 +1450,34 @@ def _execute_delta_propagation(
             db.commit()
         except Exception as e:
             db.rollback()
-            print(f"[SYNC-WARN] Could not stage propagation for store {store.name}: {e}")
+            logger.warning("[SYNC-WARN] Could not stage propagation for store %s: %s", store.name, e)
             continue
+        if adjust_payload or set_payload:
+            staged.append((store, adjust_payload, adjust_ids, set_payload, set_ids))
 
-        try:
-            service = ShopifyService(store_url=store.shopify_url, token=store.api_token)
+    # Every store's markers are staged (and a floor breach anywhere has already returned with zero
+    # writes), so the Shopify calls — independent hosts, independent cost buckets — go out
+    # concurrently. Workers get plain values only; mirror updates stay on this thread's session.
+    outcomes = _fan_out(_write_store_delta,
+                        [(store.shopify_url, store.api_token, adjust_payload, set_payload, ref_uri)
+                         for store, adjust_payload, _, set_payload, _ in staged])
 
-            if adjust_payload:
-                result = service.adjust_inventory_quantities(adjust_payload, reference_uri=ref_uri)
-                ue = result.get("inventoryAdjustQuantities", {}).get("userErrors", [])
-                if ue:
-                    raise Exception(str(ue))
+    for (store, adjust_payload, adjust_ids, set_payload, set_ids), (adjusted, error) in zip(staged, outcomes):
+        try:
+            if adjusted:
                 crud_product.adjust_inventory_levels_for_variants(
                     db, variant_ids=adjust_ids, location_id=store.sync_location_id, delta=delta
                 )
-
+            if error:
+                raise error
             if set_payload:
-                result = service.set_inventory_quantities(set_payload, reference_uri=ref_uri, ignore_compare=True)
-                ue = result.get("inventorySetQuantities", {}).get("userErrors", [])
-                if ue:
-                    raise Exception(str(ue))
-                # Each clamped item was set to the floor value.
-                for vid, item in zip(set_ids, set_payload):
-                    crud_product.update_inventory_levels_for_variants(
-                        db, variant_ids=[vid], location_id=store.sync_location_id, new_quantity=item["quantity"]
-                    )
+                # Every clamped item is set to the floor (apply_floor's only clamp value) — one upsert.
+                crud_product.update_inventory_levels_for_variants(
+                    db, variant_ids=set_ids, location_id=store.sync_location_id,
+                    new_quantity=set_payload[0]["quantity"]
+                )
 
-            print(f"[SYNC] Propagated {barcode} to '{store.name}' (adjust={len(adjust_payload)}, floor-set={len(set_payload)}).")
+            logger.info("[SYNC] Propagated %s to '%s' (adjust=%s, floor-set=%s).", barcode, store.name, len(adjust_payload), len(set_payload))
             audit_logger.log_propagation(
                 barcode=barcode, source_store="webhook", target_store=store.name,
                 quantity=new_source_qty,
@@ -1448,12 +1486,44 @@ def _execute_delta_propagation(
                          "sync_operation_uuid": sync_op, "origin_store_id": origin_store_id},
             )
         except Exception as e:
-            print(f"[SYNC-ERROR] Failed to propagate to store '{store.name}': {e}")
+            logger.error("[SYNC-ERROR] Failed to propagate to store '%s': %s", store.name, e)
             audit_logger.log_error("inventory_sync_service._execute_delta_propagation",
                                    f"Failed to propagate barcode {barcode} to store '{store.name}'",
                                    details={"barcode": barcode, "delta": delta}, exc=e)
 
 
+def _write_store_delta(shopify_url: str, api_token: str, adjust_payload: List[Dict[str, Any]],
+                       set_payload: List[Dict[str, Any]], ref_uri: str):
+    """One store's Shopify writes for a delta propagation. Returns (adjusted, error): whether the
+    relative adjust landed (so the caller mirrors it even if the floor-set then failed), and the
+    failure, if any. Never raises — it runs on a worker thread."""
+    adjusted = False
+    try:
+        service = ShopifyService(store_url=shopify_url, token=api_token)
+        if adjust_payload:
+            result = service.adjust_inventory_quantities(adjust_payload, reference_uri=ref_uri)
+            ue = result.get("inventoryAdjustQuantities", {}).get("userErrors", [])
+            if ue:
+                raise Exception(str(ue))
+            adjusted = True
+        if set_payload:
+            result = service.set_inventory_quantities(set_payload, reference_uri=ref_uri, ignore_compare=True)
+            ue = result.get("inventorySetQuantities", {}).get("userErrors", [])
+            if ue:
+                raise Exception(str(ue))
+        return adjusted, None
+    except Exception as e:
+        return adjusted, e
+
+
+def _fan_out(fn, jobs: List[tuple]) -> List[Any]:
+    """fn(*job) for every job, concurrently across PROPAGATION_STORE_FANOUT shared worker threads;
+    results in job order. A single job runs inline (the common one-other-store case pays no hop)."""
+    if len(jobs) <= 1:
+        return [fn(*job) for job in jobs]
+    return list(_store_write_pool.map(lambda job: fn(*job), jobs))
+
+
 def _execute_absolute_propagation(
     db: Session,
     barcode: str,
@@ -1491,10 +1561,10 @@ def _execute_absolute_propagation(
         store = store_lookup.get(sid)
         if not store or not store.sync_location_id:
             if store:
-                print(f"[SYNC-ERROR] Cannot propagate to store '{store.name}': No sync location configured.")
+                logger.error("[SYNC-ERROR] Cannot propagate to store '%s': No sync location configured.", store.name)
             continue
 
-        location_gid = f"gid://shopify/Location/{store.sync_location_id}"
+        location_gid = store.sync_location_gid
         quantities_payload, variant_ids = [], []
         try:
             # For an absolute SET the post-write `available` IS `value`, so it is itself the
@@ -1507,14 +1577,14 @@ def _execute_absolute_propagation(
                                     sync_op, origin_store_id, origin_item_id, depth=1,
                                     authoritative_qty=abs_auth)
                 quantities_payload.append({
-                    "inventoryItemId": f"gid://shopify/InventoryItem/{v.inventory_item_id}",
+                    "inventoryItemId": v.inventory_item_gid,
                     "locationId": location_gid, "quantity": value,
                 })
                 variant_ids.append(v.id)
             db.commit()
         except Exception as e:
             db.rollback()
-            print(f"[SYNC-WARN] Could not stage absolute propagation for store {store.name}: {e}")
+            logger.warning("[SYNC-WARN] Could not stage absolute propagation for store %s: %s", store.name, e)
             continue
 
         if not quantities_payload:
@@ -1526,7 +1596,7 @@ def _execute_absolute_propagation(
             if result.get("inventorySetQuantities", {}).get("userErrors"):
                 raise Exception(str(result["inventorySetQuantities"]["userErrors"]))
 
-            print(f"[SYNC] Set qty {value} for barcode {barcode} on store '{store.name}' ({len(quantities_payload)} variants).")
+            logger.info("[SYNC] Set qty %s for barcode %s on store '%s' (%s variants).", value, barcode, store.name, len(quantities_payload))
             audit_logger.log_propagation(
                 barcode=barcode, source_store="webhook", target_store=store.name, quantity=value,
                 details={"variant_count": len(quantities_payload), "mode": "absolute",
@@ -1536,7 +1606,7 @@ def _execute_absolute_propagation(
                 db, variant_ids=variant_ids, location_id=store.sync_location_id, new_quantity=value
             )
         except Exception as e:
-            print(f"[SYNC-ERROR] Failed to write to store '{store.name}': {e}")
+            logger.error("[SYNC-ERROR] Failed to write to store '%s': %s", store.name, e)
             audit_logger.log_error("inventory_sync_service._execute_absolute_propagation",
                                    f"Failed to write barcode {barcode} to store '{store.name}'",
                                    details={"barcode": barcode, "quantity": value}, exc=e)
@@ -1564,12 +1634,12 @@ def cleanup_expired_records():
         db.commit()
 
         if expired_webhooks > 0 or expired_intents > 0 or expired_breakers > 0:
-            print(f"[CLEANUP] Removed {expired_webhooks} webhooks, {expired_intents} intents, {expired_breakers} breakers.")
+            logger.info("[CLEANUP] Removed %s webhooks, %s intents, %s breakers.", expired_webhooks, expired_intents, expired_breakers)
 
         cleanup_barcode_locks()
 
     except Exception as e:
         db.rollback()
-        print(f"[CLEANUP-ERROR] Failed to clean up expired records: {e}")
+        logger.error("[CLEANUP-ERROR] Failed to clean up expired records: %s", e)
     finally:
         db.close()
\ No newline at end of file
@@ -21,6 +21,7 @@ from shopify_service import ShopifyService
 import models
 from . import sync_tracker
 from . import audit_logger
+from . import data_quality_cache
 
 
 def run_product_sync_for_store(store_id: int, task_id: Optional[str] = None):
@@ -175,6 +176,7 @@ def run_product_sync_for_store(store_id: int, task_id: Optional[str] = None):
         run.finished_at = datetime.now(timezone.utc)
         duration_ms = int((run.finished_at - run.started_at).total_seconds() * 1000) if run.started_at else None
         db.commit()
+        data_quality_cache.invalidate_summary_cache()
 
         audit_logger.log_sync(store_id, store.name if store else f"store_{store_id}",
                               "sync_completed",
@@ -141,8 +141,10 @@ def _apply_plan_locked(db: Session, plan: Dict[str, Any], barcode: str, target:
                          details={"raw_target": target, "floor": sync_guards.INVENTORY_FLOOR})
         target = sync_guards.INVENTORY_FLOOR
     applied = 0
+    stores = {s.id: s for s in
+              db.query(models.Store).filter(models.Store.id.in_({mv["store_id"] for mv in plan["moves"]}))}
     for mv in plan["moves"]:
-        store = db.query(models.Store).filter(models.Store.id == mv["store_id"]).first()
+        store = stores.get(mv["store_id"])
         if not store or not store.enabled or not store.sync_location_id:
             continue
         variants = (
@@ -156,12 +158,12 @@ def _apply_plan_locked(db: Session, plan: Dict[str, Any], barcode: str, target:
         )
         # canonical only (one per store) to mirror propagation semantics
         canon = sync_guards.select_canonical_targets(variants, origin_store_id=-1)
-        loc_gid = f"gid://shopify/Location/{store.sync_location_id}"
+        loc_gid = store.sync_location_gid
         payload = []
         for v in canon:
             iss._create_echo_marker(db, barcode, store.id, v.inventory_item_id, target,
                                     sync_op, origin_store_id=-1, origin_item_id=None, depth=1)
-            payload.append({"inventoryItemId": f"gid://shopify/InventoryItem/{v.inventory_item_id}",
+            payload.append({"inventoryItemId": v.inventory_item_gid,
                             "locationId": loc_gid, "quantity": target,
                             "compareQuantity": mv["current"]})
         if not payload:
@@ -16,11 +16,11 @@ BUG-03 FIX: Create WriteIntents before calling Shopify to prevent echo cascades.
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, literal_column, case
+from sqlalchemy import func, and_, literal_column, case, tuple_
 
 from database import SessionLocal
 import models
-from shopify_service import ShopifyService
+from shopify_service import ShopifyService, INVENTORY_ITEM_AVAILABLE_QUERY
 from . import sync_tracker
 from . import audit_logger
 import os
@@ -229,19 +229,10 @@ def _determine_authoritative_stock(db: Session, barcode: str) -> tuple:
                 # Read LIVE stock from Shopify for the authoritative store
                 try:
                     svc = ShopifyService(store_url=auth_store.shopify_url, token=auth_store.api_token)
-                    location_gid = f"gid://shopify/Location/{auth_store.sync_location_id}"
-                    inv_item_gid = f"gid://shopify/InventoryItem/{auth_variant.inventory_item_id}"
-                    
-                    query = """
-                    query GetInventoryLevel($inventoryItemId: ID!) {
-                      inventoryItem(id: $inventoryItemId) {
-                        inventoryLevels(first: 10) {
-                          nodes { location { id } quantities(names: ["available"]) { name quantity } }
-                        }
-                      }
-                    }
-                    """
-                    result = svc._execute_query(query, {"inventoryItemId": inv_item_gid})
+                    location_gid = auth_store.sync_location_gid
+                    inv_item_gid = auth_variant.inventory_item_gid
+
+                    result = svc._execute_query(INVENTORY_ITEM_AVAILABLE_QUERY, {"inventoryItemId": inv_item_gid})
                     # _execute_query already returns the GraphQL `data` object, so read
                     # inventoryItem directly. (Previously double-unwrapped via .get("data"),
                     # which always returned None and silently fell back to the stale cache.)
@@ -317,28 +308,24 @@ def _reconcile_single_barcode(db: Session, barcode: str, target_quantity: int) -
     # Group variants by store
     store_variants: Dict[int, List[models.ProductVariant]] = {}
     for v in variants:
-        if v.store_id not in store_variants:
-            store_variants[v.store_id] = []
-        store_variants[v.store_id].append(v)
-
-    # Pre-check: are all stores already at the target quantity?
-    all_aligned = True
-    for store_id_chk, vars_list in store_variants.items():
-        store_chk = db.query(models.Store).filter(models.Store.id == store_id_chk).first()
-        if not store_chk or not store_chk.enabled or not store_chk.sync_location_id:
-            continue
-        for v in vars_list:
-            if not v.inventory_item_id:
-                continue
-            level = db.query(models.InventoryLevel).filter(
-                models.InventoryLevel.variant_id == v.id,
-                models.InventoryLevel.location_id == store_chk.sync_location_id,
-            ).first()
-            if not level or level.available != target_quantity:
-                all_aligned = False
-                break
-        if not all_aligned:
-            break
+        store_variants.setdefault(v.store_id, []).append(v)
+
+    # One query for every store of the barcode (was one SELECT per store, twice: pre-check + write).
+    stores = {s.id: s for s in db.query(models.Store).filter(models.Store.id.in_(list(store_variants)))}
+
+    # Pre-check: are all stores already at the target quantity? One (variant, location) IN query
+    # over every writable variant (was one InventoryLevel SELECT per variant).
+    writable = {sid: s for sid, s in stores.items() if s.enabled and s.sync_location_id}
+    pairs = [
+        (v.id, writable[sid].sync_location_id)
+        for sid, vars_list in store_variants.items() if sid in writable
+        for v in vars_list if v.inventory_item_id
+    ]
+    levels = dict(
+        db.query(models.InventoryLevel.variant_id, models.InventoryLevel.available)
+          .filter(tuple_(models.InventoryLevel.variant_id, models.InventoryLevel.location_id).in_(pairs))
+    ) if pairs else {}
+    all_aligned = all(levels.get(vid) == target_quantity for vid, _ in pairs)
     
     if all_aligned:
         return (0, True)
@@ -350,18 +337,18 @@ def _reconcile_single_barcode(db: Session, barcode: str, target_quantity: int) -
     _create_reconciliation_write_intents(db, barcode, target_quantity, store_variants.keys())
 
     for store_id, vars_list in store_variants.items():
-        store = db.query(models.Store).filter(models.Store.id == store_id).first()
+        store = stores.get(store_id)
         if not store or not store.enabled or not store.sync_location_id:
             continue
 
-        location_gid = f"gid://shopify/Location/{store.sync_location_id}"
+        location_gid = store.sync_location_gid
         quantities_payload = []
         variant_ids_to_update = []
 
         for v in vars_list:
             if v.inventory_item_id:
                 quantities_payload.append({
-                    "inventoryItemId": f"gid://shopify/InventoryItem/{v.inventory_item_id}",
+                    "inventoryItemId": v.inventory_item_gid,
                     "locationId": location_gid,
                     "quantity": target_quantity
                 })
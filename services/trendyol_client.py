@@ -17,9 +17,12 @@ All methods return structured dicts and NEVER raise into callers ({"ok": False,
 """
 import os
 import base64
+import threading
 from typing import Dict, Any, List, Optional
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 
 BASE_URL = os.getenv("TRENDYOL_BASE_URL", "https://apigw.trendyol.com/integration").rstrip("/")
@@ -40,11 +43,36 @@ def configured() -> bool:
 STORE_FRONT_CODE = os.getenv("TRENDYOL_STORE_FRONT_CODE", "RO")
 
 
+_sessions: Dict[bool, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
 def _session(storefront: bool) -> requests.Session:
     """PRODUCT/INVENTORY endpoints REQUIRE the `storeFrontCode` HTTP HEADER for international
     sellers (without it they return 200 with zero elements — verified live). ORDER endpoints must
-    OMIT it (so all countries are returned) — mirrors the proven Scripturi client."""
+    OMIT it (so all countries are returned) — mirrors the proven Scripturi client.
+    One keep-alive session per header set, built once: a fresh Session per call paid a TCP + TLS
+    handshake on every order-poll page, product page and batch-status poll."""
+    s = _sessions.get(storefront)
+    if s is not None:
+        return s
+    with _sessions_lock:
+        if storefront not in _sessions:
+            _sessions[storefront] = _new_session(storefront)
+    return _sessions[storefront]
+
+
+def close_sessions() -> None:
+    """Release the pooled Trendyol connections (app shutdown)."""
+    with _sessions_lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
+
+
+def _new_session(storefront: bool) -> requests.Session:
     s = requests.Session()
+    s.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
     token = base64.b64encode(f"{API_KEY}:{API_SECRET}".encode()).decode()
     s.headers.update({
         "Authorization": f"Basic {token}",
@@ -61,17 +89,17 @@ def _get(path: str, params: Optional[Dict[str, Any]] = None, storefront: bool =
         r = _session(storefront).get(f"{BASE_URL}{path}", params=params or {}, timeout=TIMEOUT)
         if r.status_code != 200:
             return {"ok": False, "status": r.status_code, "error": r.text[:400]}
-        return {"ok": True, "data": r.json()}
+        return {"ok": True, "data": orjson.loads(r.content)}
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
 
 def _post(path: str, payload: Dict[str, Any], storefront: bool = True) -> Dict[str, Any]:
     try:
-        r = _session(storefront).post(f"{BASE_URL}{path}", json=payload, timeout=TIMEOUT)
+        r = _session(storefront).post(f"{BASE_URL}{path}", data=orjson.dumps(payload), timeout=TIMEOUT)
         if r.status_code not in (200, 202):
             return {"ok": False, "status": r.status_code, "error": r.text[:400]}
-        return {"ok": True, "data": r.json() if r.text else {}}
+        return {"ok": True, "data": orjson.loads(r.content) if r.content else {}}
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
@@ -338,7 +338,7 @@ def _inbound_fold(db, tb: str, ean: str, ty_now: int, acc: Optional[int], ts=Non
     lines = [dict(r) for r in db.execute(text("""
         SELECT id, quantity FROM trendyol_order_lines
         WHERE trendyol_barcode = :tb
-          AND COALESCE(applied, false) = false
+          AND NOT applied
           AND COALESCE(order_status, '') NOT IN ('Cancelled')
           AND order_date_ms >= (extract(epoch from now() - interval '14 days') * 1000)::bigint
         ORDER BY order_date_ms, id""" ), {"tb": tb}).mappings()]
@@ -20,15 +20,15 @@ from services import audit_logger
 import models
 
 
-# --- Required webhook topics (must match routes/config.py) ---
-ESSENTIAL_WEBHOOK_TOPICS = [
+# --- Required webhook topics (routes/config.py imports this; ordered for creation) ---
+ESSENTIAL_WEBHOOK_TOPICS = (
     "inventory_levels/update",
     "products/create",
     "products/update",
     "products/delete",
     "inventory_items/update",
     "inventory_items/delete",
-]
+)
 
 # The base URL for webhook callbacks. Set via env or auto-detected.
 # This should be the public HTTPS URL where the app is accessible.
@@ -1,10 +1,118 @@
 # shopify_service.py
+import os
 import time
+import threading
 import requests
 import random
+import orjson
 from typing import List, Optional, Dict, Any, Generator
 from datetime import datetime
 
+from requests.adapters import HTTPAdapter
+
+# Connections kept alive per store host. ShopifyService is constructed per call site (per write,
+# per read, per thread), so a per-instance session would still handshake every time; the pool is
+# shared process-wide instead, sized for the parallel store fan-out.
+SHOPIFY_POOL_SIZE = int(os.getenv("SHOPIFY_POOL_SIZE", "20"))
+SHOPIFY_HTTP_TIMEOUT = int(os.getenv("SHOPIFY_HTTP_TIMEOUT", "30"))
+# Variants per productVariantsBulkUpdate call (Shopify caps the list per mutation).
+VARIANTS_BULK_MAX = 100
+# changes/quantities per inventoryAdjustQuantities / inventorySetQuantities call.
+INVENTORY_BULK_MAX = 100
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _session_for(store_url: str) -> requests.Session:
+    """Process-wide keep-alive session for one store host (TCP + TLS set up once, then reused)."""
+    session = _sessions.get(store_url)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(store_url)
+            if session is None:
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=SHOPIFY_POOL_SIZE))
+                _sessions[store_url] = session
+    return session
+
+
+def close_sessions() -> None:
+    """Release every pooled store connection (app shutdown)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+class CostBucket:
+    """Client-side mirror of one store's GraphQL leaky bucket (cost points). Refreshed from the
+    `extensions.cost.throttleStatus` of EVERY response, so a request that would exceed the bucket
+    waits for the refill up front instead of spending a round trip on a THROTTLED error.
+    reserve() debits the expected cost immediately so concurrent threads queue behind each other."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.available: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.restore_rate: Optional[float] = None
+        self.updated = 0.0
+
+    def observe(self, throttle_status: Dict[str, Any]) -> None:
+        with self.lock:
+            self.available = float(throttle_status.get("currentlyAvailable", 0))
+            self.maximum = float(throttle_status.get("maximumAvailable") or self.available)
+            self.restore_rate = float(throttle_status.get("restoreRate") or 0) or None
+            self.updated = time.monotonic()
+
+    def reserve(self, cost: float) -> float:
+        """Debit `cost` points; returns seconds to wait before sending (0 = send now)."""
+        with self.lock:
+            if self.available is None or not self.restore_rate or cost <= 0:
+                return 0.0
+            now = time.monotonic()
+            projected = min(self.maximum, self.available + (now - self.updated) * self.restore_rate)
+            self.available, self.updated = projected - cost, now
+            return 0.0 if projected >= cost else (cost - projected) / self.restore_rate
+
+
+_buckets: Dict[str, CostBucket] = {}
+# Last requestedQueryCost seen per query text (the GraphQL documents are module constants).
+_query_costs: Dict[str, float] = {}
+
+
+def _bucket_for(store_url: str) -> CostBucket:
+    bucket = _buckets.get(store_url)
+    if bucket is None:
+        with _sessions_lock:
+            bucket = _buckets.setdefault(store_url, CostBucket())
+    return bucket
+
+
+def _is_throttled(errors: List[Dict[str, Any]]) -> bool:
+    """True if a GraphQL `errors` list is a THROTTLED rejection. Shopify sends it as the only
+    error, so the first entry decides; no per-attempt `.get(..., {})` chains."""
+    try:
+        return errors[0]["extensions"]["code"] == "THROTTLED"
+    except (KeyError, TypeError, IndexError):
+        return False
+
+
+# Longest server-requested pause honoured before a retry.
+RETRY_AFTER_MAX = 30.0
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Seconds a 429/503 response asked us to wait (Retry-After, delta-seconds form), capped at
+    RETRY_AFTER_MAX; None when the failure carries no such hint (network error, other status)."""
+    response = getattr(exc, "response", None)
+    if response is None or response.status_code not in (429, 503):
+        return None
+    try:
+        return min(max(float(response.headers.get("Retry-After")), 0.0), RETRY_AFTER_MAX)
+    except (TypeError, ValueError):
+        return None
+
+
 def gid_to_id(gid: Optional[Any]) -> Optional[int]:
     """Convert a Shopify GID or plain ID to an integer.
     
@@ -28,6 +136,12 @@ def gid_to_id(gid: Optional[Any]) -> Optional[int]:
     except (IndexError, ValueError):
         return None
 
+def _compact_document(doc: str) -> str:
+    """Collapse a GraphQL document's layout whitespace (done once, at import). Every request
+    re-sends the full text; the indentation alone was a third of the mutation bodies. Only
+    valid for documents without comments or whitespace inside string literals (all of ours)."""
+    return " ".join(doc.split())
+
 MONEY_FRAGMENT = "fragment MoneyFragment on MoneyV2 { amount currencyCode }"
 LOCATION_FRAGMENT = "fragment LocationFragment on Location { id legacyResourceId name }"
 INVENTORY_LEVEL_FRAGMENT = """
@@ -148,14 +262,6 @@ MUTATIONS = {
         }
       }
     """,
-    "updateVariantBarcode": """
-      mutation UpdateVariantBarcode($productId: ID!, $variants: [ProductVariantsBulkInput!]!) {
-        productVariantsBulkUpdate(productId: $productId, variants: $variants) {
-          productVariants { id barcode }
-          userErrors { field message }
-        }
-      }
-    """,
     "updateVariantCosts": """
       mutation UpdateVariantCosts($productId: ID!, $variants: [ProductVariantsBulkInput!]!) {
         productVariantsBulkUpdate(productId: $productId, variants: $variants) {
@@ -204,6 +310,21 @@ query FindCategories($q: String!) {
 }
 """
 
+INVENTORY_ITEM_AVAILABLE_QUERY = """
+query InventoryItemAvailable($inventoryItemId: ID!) {
+  inventoryItem(id: $inventoryItemId) {
+    inventoryLevels(first: 20) {
+      nodes { location { id } quantities(names: ["available"]) { name quantity } }
+    }
+  }
+}
+"""
+
+GET_ALL_PRODUCTS_QUERY = _compact_document(GET_ALL_PRODUCTS_QUERY)
+MUTATIONS = {name: _compact_document(doc) for name, doc in MUTATIONS.items()}
+FIND_CATEGORIES_QUERY = _compact_document(FIND_CATEGORIES_QUERY)
+INVENTORY_ITEM_AVAILABLE_QUERY = _compact_document(INVENTORY_ITEM_AVAILABLE_QUERY)
+
 class ShopifyService:
     def __init__(self, store_url: str, token: str, api_version: str = "2025-10"):
         if not all([store_url, token]):
@@ -212,27 +333,46 @@ class ShopifyService:
         self.graphql_endpoint = f"https://{store_url}/admin/api/{api_version}/graphql.json"
         self.rest_endpoint = f"https://{store_url}/admin/api/{api_version}"
         self.headers = {"Content-Type": "application/json", "X-Shopify-Access-Token": token}
+        self._session = _session_for(store_url)
+        self._bucket = _bucket_for(store_url)
 
     def _execute_query(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        payload = {"query": query, "variables": variables or {}}
+        body = orjson.dumps({"query": query, "variables": variables or {}})
         max_retries = 7
         base_delay = 1.0
         for attempt in range(max_retries):
+            # Pre-gate on the mirrored bucket: wait for the refill rather than get THROTTLED.
+            gate = self._bucket.reserve(_query_costs.get(query, 0))
+            if gate > 0:
+                time.sleep(gate)
             try:
-                response = requests.post(self.graphql_endpoint, headers=self.headers, json=payload, timeout=30)
+                # orjson both ways: product pages are hundreds of KB, stdlib json was a visible share
+                # of sync CPU. The Content-Type header is already set on self.headers.
+                response = self._session.post(self.graphql_endpoint, headers=self.headers, data=body,
+                                              timeout=SHOPIFY_HTTP_TIMEOUT)
                 response.raise_for_status()
-                json_response = response.json()
-                if "errors" in json_response and json_response.get("errors"):
-                    is_throttled = any(err.get("extensions", {}).get("code") == "THROTTLED" for err in json_response["errors"])
-                    if is_throttled and attempt < max_retries - 1:
-                        wait_time = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                        time.sleep(wait_time)
+                json_response = orjson.loads(response.content)
+                cost = (json_response.get("extensions") or {}).get("cost") or {}
+                if cost.get("throttleStatus"):
+                    self._bucket.observe(cost["throttleStatus"])
+                if cost.get("requestedQueryCost") is not None:
+                    _query_costs[query] = float(cost["requestedQueryCost"])
+                errors = json_response.get("errors")
+                if errors:
+                    if _is_throttled(errors) and attempt < max_retries - 1:
+                        # With throttleStatus observed, the gate above computes the exact refill
+                        # wait on the next pass; blind exponential backoff only without it.
+                        if not cost.get("throttleStatus") or query not in _query_costs:
+                            time.sleep(base_delay * (2 ** attempt) + random.uniform(0, 1))
                         continue
-                    raise ValueError(f"GraphQL API Error: {json_response['errors']}")
+                    raise ValueError(f"GraphQL API Error: {errors}")
                 return json_response.get("data", {})
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
                 if attempt < max_retries - 1:
-                    wait_time = base_delay * (2 ** attempt) + random.uniform(0, 1)
+                    # Shopify says how long on a REST-style 429/503; guess exponentially otherwise.
+                    wait_time = _retry_after(e)
+                    if wait_time is None:
+                        wait_time = base_delay * (2 ** attempt) + random.uniform(0, 1)
                     time.sleep(wait_time)
                 else:
                     raise e
@@ -274,6 +414,20 @@ class ShopifyService:
             raise ValueError(f"Mutation '{mutation_name}' not found.")
         return self._execute_query(mutation, variables)
 
+    def update_variants_bulk(self, mutation_name: str, product_id: str,
+                             variant_updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run a productVariantsBulkUpdate mutation for ALL of a product's variant updates: one call
+        per VARIANTS_BULK_MAX variants (not one per variant). Returns the same shape as a single
+        call, with productVariants/userErrors concatenated across chunks."""
+        merged: Dict[str, Any] = {"productVariants": [], "userErrors": []}
+        for i in range(0, len(variant_updates), VARIANTS_BULK_MAX):
+            chunk = variant_updates[i:i + VARIANTS_BULK_MAX]
+            result = self.execute_mutation(mutation_name, {"productId": product_id, "variants": chunk})
+            node = (result or {}).get("productVariantsBulkUpdate") or {}
+            merged["productVariants"].extend(node.get("productVariants") or [])
+            merged["userErrors"].extend(node.get("userErrors") or [])
+        return {"productVariantsBulkUpdate": merged}
+
     def find_categories(self, query: str) -> Dict[str, Any]:
         variables = {"q": query}
         return self._execute_query(FIND_CATEGORIES_QUERY, variables)
@@ -281,22 +435,42 @@ class ShopifyService:
     # --- WEBHOOK METHODS (using REST API) ---
     def get_webhooks(self) -> List[Dict[str, Any]]:
         """Retrieves all webhook subscriptions."""
-        response = requests.get(f"{self.rest_endpoint}/webhooks.json", headers=self.headers)
+        response = self._session.get(f"{self.rest_endpoint}/webhooks.json", headers=self.headers,
+                                     timeout=SHOPIFY_HTTP_TIMEOUT)
         response.raise_for_status()
-        return response.json().get("webhooks", [])
+        return orjson.loads(response.content).get("webhooks", [])
 
     def create_webhook(self, topic: str, address: str) -> Dict[str, Any]:
         """Creates a new webhook subscription."""
         payload = {"webhook": {"topic": topic, "address": address, "format": "json"}}
-        response = requests.post(f"{self.rest_endpoint}/webhooks.json", headers=self.headers, json=payload)
+        response = self._session.post(f"{self.rest_endpoint}/webhooks.json", headers=self.headers, json=payload,
+                                      timeout=SHOPIFY_HTTP_TIMEOUT)
         response.raise_for_status()
-        return response.json().get("webhook")
+        return orjson.loads(response.content).get("webhook")
 
     def delete_webhook(self, webhook_id: int) -> None:
         """Deletes a webhook subscription by its ID."""
-        response = requests.delete(f"{self.rest_endpoint}/webhooks/{webhook_id}.json", headers=self.headers)
+        response = self._session.delete(f"{self.rest_endpoint}/webhooks/{webhook_id}.json", headers=self.headers,
+                                        timeout=SHOPIFY_HTTP_TIMEOUT)
         response.raise_for_status()
 
+    def _inventory_mutation_chunked(self, mutation_name: str, inp: Dict[str, Any], list_key: str) -> Dict[str, Any]:
+        """Send inp[list_key] in INVENTORY_BULK_MAX slices (one call for the usual small batch).
+        Multi-chunk results are merged into the single-call shape: adjustment-group changes and
+        userErrors concatenated. Chunks are NOT atomic with each other — callers already treat
+        any userError as a failed write and leave the mirror to the next reconcile."""
+        items = inp[list_key]
+        if len(items) <= INVENTORY_BULK_MAX:
+            return self.execute_mutation(mutation_name, {"input": inp})
+        changes: List[Dict[str, Any]] = []
+        user_errors: List[Dict[str, Any]] = []
+        for i in range(0, len(items), INVENTORY_BULK_MAX):
+            result = self.execute_mutation(mutation_name, {"input": {**inp, list_key: items[i:i + INVENTORY_BULK_MAX]}})
+            node = (result or {}).get(mutation_name) or {}
+            changes.extend((node.get("inventoryAdjustmentGroup") or {}).get("changes") or [])
+            user_errors.extend(node.get("userErrors") or [])
+        return {mutation_name: {"inventoryAdjustmentGroup": {"changes": changes}, "userErrors": user_errors}}
+
     def set_inventory_quantities(self, quantities: List[Dict[str, Any]],
                                  reference_uri: Optional[str] = None,
                                  ignore_compare: bool = True) -> Dict[str, Any]:
@@ -317,7 +491,7 @@ class ShopifyService:
         }
         if reference_uri:
             inp["referenceDocumentUri"] = reference_uri
-        return self.execute_mutation("inventorySetQuantities", {"input": inp})
+        return self._inventory_mutation_chunked("inventorySetQuantities", inp, "quantities")
 
     def adjust_inventory_quantities(self, changes: List[Dict[str, Any]],
                                     reference_uri: Optional[str] = None) -> Dict[str, Any]:
@@ -336,7 +510,7 @@ class ShopifyService:
         }
         if reference_uri:
             inp["referenceDocumentUri"] = reference_uri
-        return self.execute_mutation("inventoryAdjustQuantities", {"input": inp})
+        return self._inventory_mutation_chunked("inventoryAdjustQuantities", inp, "changes")
 
     @staticmethod
     def _after_available(adjustment_group: Optional[Dict[str, Any]]) -> Optional[int]:
@@ -356,11 +530,9 @@ class ShopifyService:
         """SYNC_ECHO_AUTHORITATIVE: adjust ONE item by delta and return (raw_result, after_available),
         where after_available is the authoritative post-write `available` quantity (None if absent).
         Single-item so quantityAfterChange is unambiguously attributable to this inventory_item."""
-        inp = {"reason": "correction", "name": "available",
-               "changes": [{"inventoryItemId": inventory_item_gid, "locationId": location_gid, "delta": delta}]}
-        if reference_uri:
-            inp["referenceDocumentUri"] = reference_uri
-        result = self.execute_mutation("inventoryAdjustQuantities", {"input": inp})
+        result = self.adjust_inventory_quantities(
+            [{"inventoryItemId": inventory_item_gid, "locationId": location_gid, "delta": delta}],
+            reference_uri=reference_uri)
         after = self._after_available((result or {}).get("inventoryAdjustQuantities", {}).get("inventoryAdjustmentGroup"))
         return result, after
 
@@ -388,9 +560,7 @@ class ShopifyService:
     def get_available_single(self, inventory_item_gid: str, location_gid: str) -> Optional[int]:
         """Read the live `available` quantity for one inventory item at one location (or None).
         Used to re-anchor a compare-and-set after a COMPARE_QUANTITY_STALE (the local mirror drifted)."""
-        q = ("query($i: ID!){ inventoryItem(id:$i){ inventoryLevels(first:20){ nodes{ "
-             "location{id} quantities(names:[\"available\"]){ name quantity } } } } }")
-        r = self._execute_query(q, {"i": inventory_item_gid})
+        r = self._execute_query(INVENTORY_ITEM_AVAILABLE_QUERY, {"inventoryItemId": inventory_item_gid})
         ii = (r or {}).get("inventoryItem")
         if not ii:
             return None
@@ -403,6 +573,7 @@ class ShopifyService:
 
     def get_locations(self) -> List[Dict[str, Any]]:
         """Retrieves all inventory locations for a store using the REST API."""
-        response = requests.get(f"{self.rest_endpoint}/locations.json", headers=self.headers)
+        response = self._session.get(f"{self.rest_endpoint}/locations.json", headers=self.headers,
+                                     timeout=SHOPIFY_HTTP_TIMEOUT)
         response.raise_for_status()
-        return response.json().get("locations", [])
\ No newline at end of file
+        return orjson.loads(response.content).get("locations", [])
\ No newline at end of file
@@ -106,6 +106,44 @@ def test_origin_store_never_targeted_even_with_many_same_store_variants():
     assert sorted(t.store_id for t in targets) == [7, 8]
 
 
+# --- webhook body cap -----------------------------------------------------------------
+
+def test_oversized_webhook_body_is_rejected_while_streaming():
+    """A public webhook POST can't make the worker buffer an unbounded body: declared or not."""
+    import asyncio
+    from fastapi import HTTPException
+    from routes import webhooks
+
+    class _Req:
+        def __init__(self, chunks, declared=None):
+            self.headers = {"content-length": str(declared)} if declared is not None else {}
+            self._chunks = chunks
+            self.read = 0
+
+        async def stream(self):
+            for c in self._chunks:
+                self.read += 1
+                yield c
+
+    def _status(req):
+        try:
+            asyncio.run(webhooks._read_capped_body(req))
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+    orig = webhooks.WEBHOOK_MAX_BYTES
+    webhooks.WEBHOOK_MAX_BYTES = 10
+    try:
+        assert asyncio.run(webhooks._read_capped_body(_Req([b"{}", b"[]"]))) == b"{}[]"
+        lying = _Req([b"x" * 6] * 100, declared=5)
+        assert _status(lying) == 413 and lying.read == 2, "stops at the first chunk over the cap"
+        honest = _Req([b"x"], declared=11)
+        assert _status(honest) == 413 and honest.read == 0, "declared oversize never reads the body"
+    finally:
+        webhooks.WEBHOOK_MAX_BYTES = orig
+
+
 # --- runner ---------------------------------------------------------------------------
 
 if __name__ == "__main__":
@@ -0,0 +1,264 @@
+# tests/test_bulk_ingest.py
+"""
+Set-based sync ingest tests — hermetic (no DB). Run:
+    python tests/test_bulk_ingest.py
+
+Guards the COPY/merge ingest contract: COPY fields can never be confused with NULL, duplicate
+conflict keys collapse before the merge, Python-side column defaults survive the COPY path, and a
+bad bundle inside a bulk page is still isolated and dead-lettered on its own.
+"""
+import contextlib
+import os
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy.dialects import postgresql
+
+import models
+from crud import bulk
+from crud import product as crud_product
+
+
+class _FakeDB:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def _bundle(pid, vid):
+    return {"id": f"gid://shopify/Product/{pid}", "title": f"P{pid}",
+            "variants": [{"id": f"gid://shopify/ProductVariant/{vid}", "sku": f"S{vid}"}]}
+
+
+# --- COPY encoding ---------------------------------------------------------------------------------
+
+def test_copy_field_quotes_everything_but_null():
+    assert bulk._copy_field(None) == "\\N"
+    assert bulk._copy_field("") == '""', "empty string must stay a string, never NULL"
+    assert bulk._copy_field("\\N") == '"\\N"', "a literal \\N value is quoted, so it is not NULL"
+    assert bulk._copy_field('a"b') == '"a""b"'
+    assert bulk._copy_field(True) == '"t"'
+    assert bulk._copy_field(datetime(2026, 1, 2, tzinfo=timezone.utc)) == '"2026-01-02T00:00:00+00:00"'
+
+
+def test_dedupe_rows_last_wins():
+    rows = [{"id": 1, "v": "a"}, {"id": 2, "v": "b"}, {"id": 1, "v": "c"}]
+    assert bulk.dedupe_rows(rows, ["id"]) == [{"id": 1, "v": "c"}, {"id": 2, "v": "b"}]
+
+
+def test_copy_path_reapplies_python_defaults():
+    """COPY bypasses Column(default=...) — NOT NULL flags like `tracked` must still be filled."""
+    scalars, exprs = bulk._insert_defaults(models.ProductVariant.__table__, ["id", "sku"])
+    assert scalars["tracked"] is True
+    assert scalars["is_primary_variant"] is False and scalars["is_barcode_primary"] is False
+    assert "last_fetched_at" not in exprs, "server_default — INSERT ... SELECT applies it, no client value"
+    assert "sku" not in scalars and "id" not in exprs
+
+
+def test_bulk_upsert_writes_in_batch_size_chunks():
+    sizes = []
+    orig_values, orig_size = bulk._values_upsert, bulk.SYNC_BATCH_SIZE
+    bulk._values_upsert = lambda db, table, rows, c, u: sizes.append(len(rows))
+    bulk.SYNC_BATCH_SIZE = 3
+    try:
+        rows = [{"id": i, "name": "x", "shopify_gid": "g", "store_id": 1} for i in range(8)]
+        n = bulk.bulk_upsert(None, models.Location, rows, ["id"], ["name"])
+    finally:
+        bulk._values_upsert, bulk.SYNC_BATCH_SIZE = orig_values, orig_size
+    assert n == 8 and sizes == [3, 3, 2]
+
+
+def test_values_upsert_stays_under_bind_param_cap():
+    stmts = []
+    db = type("DB", (), {"execute": lambda self, stmt: stmts.append(stmt)})()
+    orig = bulk.VALUES_MAX_PARAMS
+    bulk.VALUES_MAX_PARAMS = 10
+    try:
+        rows = [{"id": i, "name": "x", "shopify_gid": "g", "store_id": 1} for i in range(5)]
+        bulk._values_upsert(db, models.Location.__table__, rows, ["id"], ["name"])
+    finally:
+        bulk.VALUES_MAX_PARAMS = orig
+    assert len(stmts) == 3, "4 columns x 2 rows per statement under a 10-parameter cap"
+
+
+def test_webhook_variants_are_one_upsert_not_per_row():
+    class _DB(_FakeDB):
+        def __init__(self):
+            super().__init__()
+            self.stmts = []
+
+        def begin_nested(self):
+            return contextlib.nullcontext()
+
+        def execute(self, stmt):
+            self.stmts.append(str(stmt.compile(dialect=postgresql.dialect())))
+
+    db = _DB()
+    variants = [{"id": f"gid://shopify/ProductVariant/{v}", "price": "9.99", "barcode": "B"} for v in (1, 2, 3)]
+    crud_product._update_variants_incrementally(db, 5, 1, variants)
+    assert len(db.stmts) == 1 and db.commits == 1
+    sql = db.stmts[0]
+    assert "ON CONFLICT (id) DO UPDATE" in sql
+    assert "price = excluded.price" in sql and "barcode = excluded.barcode" in sql
+    assert "sku = excluded.sku" not in sql, "absent fields are preserved, not overwritten"
+    assert "coalesce(product_variants.inventory_item_id, excluded.inventory_item_id)" in sql
+
+
+def test_webhook_variant_bad_value_falls_back_per_variant():
+    from sqlalchemy.exc import DataError
+
+    class _DB(_FakeDB):
+        def begin_nested(self):
+            return contextlib.nullcontext()
+
+        def execute(self, stmt):
+            raise DataError("INSERT", {}, Exception("invalid input syntax for type numeric"))
+
+    replayed = []
+    orig = crud_product._update_variants_one_by_one
+    crud_product._update_variants_one_by_one = lambda db, pid, sid, variants: replayed.append(len(variants))
+    try:
+        variants = [{"id": f"gid://shopify/ProductVariant/{v}", "price": p} for v, p in ((1, "9.99"), (2, "abc"))]
+        crud_product._update_variants_incrementally(_DB(), 5, 1, variants)
+    finally:
+        crud_product._update_variants_one_by_one = orig
+    assert replayed == [2], "a malformed value isolates to its own savepoint instead of dropping the product"
+
+
+def test_inventory_item_lookup_is_values_join_in_chunks():
+    from sqlalchemy.orm import Query
+
+    class _DB:
+        def __init__(self):
+            self.sql = []
+
+        def query(self, *cols):
+            db = self
+
+            class _Q(Query):
+                def __iter__(self):
+                    db.sql.append(str(self.statement.compile(dialect=postgresql.dialect())))
+                    return iter([])
+
+            return _Q(cols)
+
+    db = _DB()
+    orig = crud_product.VALUES_JOIN_MAX
+    crud_product.VALUES_JOIN_MAX = 2
+    try:
+        crud_product.fetch_variants_by_inventory_items(db, [5, 6, 5, None, 7])
+    finally:
+        crud_product.VALUES_JOIN_MAX = orig
+    assert len(db.sql) == 2, "3 distinct ids, 2 per statement"
+    assert "JOIN (VALUES" in db.sql[0] and " IN " not in db.sql[0]
+
+
+def test_levels_across_stores_are_one_upsert():
+    class _Q:
+        def filter(self, *_):
+            return self
+
+        def all(self):
+            return [(1, 11), (2, 12), (3, 13)]
+
+    class _DB(_FakeDB):
+        def __init__(self):
+            super().__init__()
+            self.stmts = []
+
+        def query(self, *_):
+            return _Q()
+
+        def execute(self, stmt):
+            self.stmts.append(stmt.compile(dialect=postgresql.dialect()))
+
+    db = _DB()
+    crud_product.set_inventory_levels(db, [(1, 9), (2, 9), (3, 10)], 4)
+    assert len(db.stmts) == 1 and db.commits == 1
+    assert "ON CONFLICT (variant_id, location_id) DO UPDATE" in str(db.stmts[0])
+    params = db.stmts[0].params
+    assert [params[f"location_id_m{i}"] for i in range(3)] == [9, 9, 10]
+    assert [params[f"inventory_item_id_m{i}"] for i in range(3)] == [11, 12, 13]
+
+
+def test_variant_column_update_is_one_update_from_values():
+    from decimal import Decimal
+
+    class _DB(_FakeDB):
+        def __init__(self):
+            super().__init__()
+            self.stmts = []
+
+        def execute(self, stmt):
+            self.stmts.append(str(stmt.compile(dialect=postgresql.dialect())))
+
+    db = _DB()
+    orig = crud_product.VALUES_JOIN_MAX
+    crud_product.VALUES_JOIN_MAX = 2
+    try:
+        crud_product.update_variant_column_by_gid(db, "price", {"a": Decimal("1"), "b": Decimal("2"), "c": Decimal("3")})
+    finally:
+        crud_product.VALUES_JOIN_MAX = orig
+    assert len(db.stmts) == 2, "3 variants, 2 per statement"
+    sql = db.stmts[0]
+    assert sql.startswith("UPDATE product_variants SET price=incoming.val FROM (VALUES")
+    assert "WHERE product_variants.shopify_gid = incoming.gid" in sql
+
+
+# --- page ingest -----------------------------------------------------------------------------------
+
+def test_bulk_page_is_one_write_and_one_commit():
+    calls = []
+    orig = crud_product._upsert_bundle_rows
+    crud_product._upsert_bundle_rows = lambda db, bundles: calls.append(len(bundles))
+    try:
+        db = _FakeDB()
+        now = datetime.now(timezone.utc)
+        crud_product.create_or_update_products(db, 1, 7, [_bundle(1, 10), _bundle(2, 20)], now)
+    finally:
+        crud_product._upsert_bundle_rows = orig
+    assert calls == [2]
+    assert db.commits == 1 and db.rollbacks == 0
+
+
+def test_failed_bulk_page_replays_and_isolates_bad_bundle():
+    dead = []
+    orig_upsert, orig_dead = crud_product._upsert_bundle_rows, crud_product.log_dead_letter
+
+    def _upsert(db, bundles):
+        if len(bundles) > 1 or bundles[0]["products"][0]["id"] == 2:
+            raise RuntimeError("boom")
+
+    crud_product._upsert_bundle_rows = _upsert
+    crud_product.log_dead_letter = lambda db, s, r, bundle, reason: dead.append(bundle["id"])
+    try:
+        db = _FakeDB()
+        now = datetime.now(timezone.utc)
+        crud_product.create_or_update_products(db, 1, 7, [_bundle(1, 10), _bundle(2, 20), _bundle(3, 30)], now)
+    finally:
+        crud_product._upsert_bundle_rows, crud_product.log_dead_letter = orig_upsert, orig_dead
+    assert dead == ["gid://shopify/Product/2"], "only the offending bundle is dead-lettered"
+    assert db.commits == 2
+
+
+if __name__ == "__main__":
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_") and callable(v)]
+    passed = 0
+    for fn in fns:
+        try:
+            fn(); print(f"PASS {fn.__name__}"); passed += 1
+        except AssertionError as e:
+            print(f"FAIL {fn.__name__}: {e}")
+        except Exception as e:
+            print(f"ERROR {fn.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{passed}/{len(fns)} bulk-ingest tests passed")
+    sys.exit(0 if passed == len(fns) else 1)
@@ -0,0 +1,81 @@
+# tests/test_data_quality_cache.py
+"""
+Data-quality endpoint tests — hermetic (no DB). Run:
+    python tests/test_data_quality_cache.py
+
+A page of issues and its summary cards come back in one statement, and the summary is cached per
+(store_id, normalised search): a cache hit drops the four aggregate scans from the statement, and
+invalidate_summary_cache() forces a recount.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from routes import data_quality
+from services import data_quality_cache
+
+
+def test_data_quality_page_and_summary_are_one_round_trip():
+    class _DB:
+        def __init__(self):
+            self.calls = []
+
+        def execute(self, stmt, params):
+            self.calls.append((str(stmt), params))
+            row = {"no_barcode_count": 3, "no_sku_count": 1, "sku_mismatch_count": 2,
+                   "barcode_mismatch_count": 0, "total_count": 4, "issues": [{"variant_id": 7}]}
+            return type("R", (), {"mappings": lambda _s: type("M", (), {"first": lambda _m: row})()})()
+
+    for kind in ("no_barcode", "no_sku", "sku_mismatch", "barcode_mismatch", None):
+        data_quality_cache.invalidate_summary_cache()
+        db = _DB()
+        out = data_quality.get_data_quality_issues(store_id=1, issue_type=kind, search="a b",
+                                                   skip=0, limit=50, db=db)
+        assert len(db.calls) == 1, f"{kind}: one statement expected, got {len(db.calls)}"
+        sql, params = db.calls[0]
+        assert "page AS (" in sql and "json_agg" in sql
+        assert params["issue_type"] == (kind or "no_barcode")
+        assert out["total_count"] == 4 and out["issues"] == [{"variant_id": 7}]
+        assert out["summary"] == {"no_barcode": 3, "no_sku": 1, "sku_mismatch": 2, "barcode_mismatch": 0}
+
+
+def test_data_quality_summary_is_cached_per_filter():
+    class _DB:
+        def __init__(self):
+            self.sql = []
+
+        def execute(self, stmt, params):
+            self.sql.append(str(stmt))
+            row = {"no_barcode_count": 3, "no_sku_count": 1, "sku_mismatch_count": 2,
+                   "barcode_mismatch_count": 0, "total_count": 1, "issues": []}
+            return type("R", (), {"mappings": lambda _s: type("M", (), {"first": lambda _m: row})()})()
+
+    data_quality_cache.invalidate_summary_cache()
+    db = _DB()
+    call = lambda **kw: data_quality.get_data_quality_issues(**{"store_id": 1, "issue_type": None, "search": "Ab",
+                                                                "skip": 0, "limit": 50, "db": db, **kw})
+    first = call()
+    second = call(search=" ab ", skip=50, issue_type="sku_mismatch")
+    assert "no_barcode AS (" in db.sql[0] and "no_barcode AS (" not in db.sql[1], "hit skips the summary scans"
+    assert "page AS (" in db.sql[1] and second["summary"] == first["summary"]
+    call(store_id=2)
+    assert "no_barcode AS (" in db.sql[2], "another store is another key"
+    data_quality_cache.invalidate_summary_cache()
+    call()
+    assert "no_barcode AS (" in db.sql[3], "invalidation forces a recount"
+
+
+if __name__ == "__main__":
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_") and callable(v)]
+    passed = 0
+    for fn in fns:
+        try:
+            fn(); print(f"PASS {fn.__name__}"); passed += 1
+        except AssertionError as e:
+            print(f"FAIL {fn.__name__}: {e}")
+        except Exception as e:
+            print(f"ERROR {fn.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{passed}/{len(fns)} data-quality-cache tests passed")
+    sys.exit(0 if passed == len(fns) else 1)
@@ -0,0 +1,65 @@
+# tests/test_http_cache.py
+"""
+HTTP caching tests — hermetic (in-memory SQLite, no Postgres, no Shopify). Run:
+    python tests/test_http_cache.py
+
+Store pickers go through routes/http_cache.etag_response: a strong ETag over the encoded body and
+a short private max-age. A matching If-None-Match (weak or in a list) gets a bodiless 304, and any
+change to a store row changes the tag.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import orjson
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+import models
+from database import Base
+from routes import config
+
+
+def _engine():
+    eng = create_engine("sqlite://")
+    Base.metadata.create_all(eng, tables=[Base.metadata.tables["stores"]])
+    with Session(eng) as db:
+        db.add(models.Store(id=1, name="s1", shopify_url="s1.myshopify.com", api_token="t"))
+        db.commit()
+    return eng
+
+
+def test_store_list_etag_and_304():
+    def _req(inm=None):
+        headers = [(b"if-none-match", inm.encode())] if inm else []
+        return Request({"type": "http", "method": "GET", "headers": headers})
+
+    eng = _engine()
+    with Session(eng) as db:
+        first = config.get_all_stores(request=_req(), db=db)
+        tag = first.headers["etag"]
+        assert first.status_code == 200 and orjson.loads(first.body)[0]["name"] == "s1"
+        assert first.headers["cache-control"] == "private, max-age=30"
+        again = config.get_all_stores(request=_req(f'W/"x", {tag}'), db=db)
+        assert again.status_code == 304 and again.body == b"" and again.headers["etag"] == tag
+        db.get(models.Store, 1).name = "renamed"
+        db.commit()
+        changed = config.get_all_stores(request=_req(tag), db=db)
+    assert changed.status_code == 200 and changed.headers["etag"] != tag
+
+
+if __name__ == "__main__":
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_") and callable(v)]
+    passed = 0
+    for fn in fns:
+        try:
+            fn(); print(f"PASS {fn.__name__}"); passed += 1
+        except AssertionError as e:
+            print(f"FAIL {fn.__name__}: {e}")
+        except Exception as e:
+            print(f"ERROR {fn.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{passed}/{len(fns)} http-cache tests passed")
+    sys.exit(0 if passed == len(fns) else 1)
@@ -0,0 +1,195 @@
+# tests/test_orm_loading.py
+"""
+ORM loading-strategy tests — hermetic (in-memory SQLite, no Postgres, no Shopify). Run:
+    python tests/test_orm_loading.py
+
+Every relationship is lazy="raise_on_sql" except Product.variants ("selectin") and
+InventoryLevel.location ("joined"): an accidental per-row lazy load raises instead of silently turning a list endpoint into N+1 queries.
+These tests pin the strategies AND that the real read paths serialize with a fixed query count.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+from database import Base
+from crud import product as crud_product
+
+# inventory_snapshots is omitted: its partitioned (id, date) PK with a SERIAL id is Postgres-only DDL.
+_TABLES = ("stores", "products", "product_variants", "locations", "inventory_levels", "webhooks")
+
+
+def _engine():
+    eng = create_engine("sqlite://")
+
+    @event.listens_for(eng, "connect")
+    def _pg_functions(conn, _):
+        conn.create_function("BTRIM", 1, lambda x: x.strip() if x is not None else None, deterministic=True)
+
+    Base.metadata.create_all(eng, tables=[Base.metadata.tables[t] for t in _TABLES])
+    with Session(eng) as db:
+        db.add(models.Store(id=1, name="s1", shopify_url="s1.myshopify.com", api_token="t"))
+        db.flush()
+        for loc in (9, 10):
+            db.add(models.Location(id=loc, store_id=1, name=f"L{loc}", shopify_gid=f"gid://shopify/Location/{loc}"))
+        for i in range(1, 6):
+            db.add(models.Product(id=i, shopify_gid=f"gid://shopify/Product/{i}", store_id=1, title=f"T{i}"))
+            db.flush()
+            db.add(models.ProductVariant(id=100 + i, shopify_gid=f"gid://shopify/ProductVariant/{100 + i}",
+                                         product_id=i, store_id=1, barcode="B", inventory_item_id=1000 + i))
+            db.flush()
+            for loc in (9, 10):
+                db.add(models.InventoryLevel(variant_id=100 + i, location_id=loc, available=i))
+        db.commit()
+    return eng
+
+
+def _count_queries(eng):
+    counter = {"n": 0}
+
+    @event.listens_for(eng, "before_cursor_execute")
+    def _count(*_a, **_k):
+        counter["n"] += 1
+
+    return counter
+
+
+_EAGER_DEFAULTS = {(models.Product, "variants"): "selectin", (models.InventoryLevel, "location"): "joined"}
+
+
+def test_no_relationship_lazy_loads_by_default():
+    for mapper in Base.registry.mappers:
+        cls = mapper.class_
+        for rel in mapper.relationships:
+            want = _EAGER_DEFAULTS.get((cls, rel.key), "raise_on_sql")
+            assert rel.lazy == want, f"{cls.__name__}.{rel.key} is {rel.lazy!r}, expected {want!r}"
+
+
+def test_one_declarative_base_one_mapper_per_table():
+    """All models share database.Base; a second Base/models module would register the same tables
+    twice (duplicate mappers, ambiguous string relationship resolution)."""
+    tables = [m.local_table.name for m in Base.registry.mappers]
+    assert len(tables) == len(set(tables)), f"tables mapped more than once: {sorted(tables)}"
+    assert set(tables) == set(Base.metadata.tables), "every table is mapped by exactly one class"
+
+
+def test_product_variants_load_selectin():
+    assert inspect(models.Product).relationships["variants"].lazy == "selectin"
+    eng = _engine()
+    counter = _count_queries(eng)
+    with Session(eng) as db:
+        products = db.query(models.Product).all()
+        assert all(len(p.variants) == 1 for p in products)
+    assert counter["n"] == 2, f"parents + one IN (...) query expected, got {counter['n']}"
+
+
+def test_products_list_serializes_without_lazy_loads():
+    eng = _engine()
+    counter = _count_queries(eng)
+    with Session(eng) as db:
+        products, total = crud_product.get_products(db)
+        out = schemas.ProductResponse(total_count=total, products=products)
+    assert total == 5 and len(out.products) == 5
+    assert out.products[0].variants[0].inventory_levels[0].location is not None
+    assert counter["n"] == 2, f"count + one eager query expected, got {counter['n']}"
+
+
+def _drain(resp):
+    import asyncio
+
+    async def _collect():
+        return b"".join([chunk async for chunk in resp.body_iterator])
+
+    return asyncio.run(_collect())
+
+
+def test_stock_by_barcode_reads_columns_in_one_query():
+    import orjson
+    from routes import stock
+    eng = _engine()
+    orig, stock.get_exchange_rates = stock.get_exchange_rates, lambda base: {"RON": 1.0}
+    try:
+        with Session(eng) as db:
+            counter = _count_queries(eng)
+            resp = stock.get_stock_grouped_by_barcode(search="t3", store_id=1, min_stock=None, max_stock=None,
+                                                      min_retail=None, max_retail=None, sort_field="title",
+                                                      sort_order="asc", db=db)
+            body = orjson.loads(_drain(resp))
+            assert counter["n"] == 1, f"one column SELECT expected, got {counter['n']}"
+            miss = stock.get_stock_grouped_by_barcode(search="zzz", store_id=None, min_stock=None, max_stock=None,
+                                                      min_retail=None, max_retail=None, sort_field="title",
+                                                      sort_order="asc", db=db)
+            assert orjson.loads(_drain(miss))["results"] == []
+    finally:
+        stock.get_exchange_rates = orig
+    (group,) = body["results"]
+    assert [v["stock"] for v in group["variants"]] == [2, 4, 6, 8, 10], "levels summed per variant in SQL"
+    assert len(group["variants"]) == 5, "a matching variant shows its whole barcode group"
+    assert group["total_stock"] == 2 and group["variants"][0]["store_name"] == "s1"
+
+
+def test_propagation_levels_are_one_query():
+    from services import inventory_sync_service as iss
+    eng = _engine()
+    with Session(eng) as db:
+        store = db.get(models.Store, 1)
+        store.sync_location_id = 9
+        db.commit()
+        variants = db.query(models.ProductVariant).all()
+        assert store.sync_location_id == 9  # refresh after commit, outside the counted window
+        counter = _count_queries(eng)
+        levels = iss._sync_location_levels(db, [store], {1: variants})
+    assert counter["n"] == 1, f"one (variant_id, location_id) IN query expected, got {counter['n']}"
+    assert levels == {100 + i: i for i in range(1, 6)}, "sync-location level per variant"
+
+
+def test_reconcile_precheck_is_fixed_query_count():
+    from services import stock_reconciliation as sr
+    eng = _engine()
+    with Session(eng) as db:
+        db.get(models.Store, 1).sync_location_id = 9
+        db.query(models.InventoryLevel).filter_by(location_id=9).update({"available": 3})
+        db.commit()
+        counter = _count_queries(eng)
+        assert sr._reconcile_single_barcode(db, "B", 3) == (0, True)
+    assert counter["n"] == 3, f"variants + stores + levels expected, got {counter['n']}"
+
+
+def test_create_all_installs_touch_triggers_on_postgres():
+    """last_fetched_at / last_updated_at have no Python onupdate: a fresh create_all schema must
+    get the BEFORE UPDATE triggers, or the timestamps silently stop moving."""
+    from sqlalchemy import create_mock_engine
+    ddl = []
+    eng = create_mock_engine("postgresql://", lambda sql, *a, **k: ddl.append(str(sql.compile(dialect=eng.dialect))))
+    Base.metadata.create_all(eng, checkfirst=False)
+    triggers = {t for t in ("products", "product_variants", "inventory_levels", "barcode_versions")
+                if any(f"CREATE TRIGGER trg_{t}_touch" in s for s in ddl)}
+    assert len(triggers) == 4, f"touch triggers emitted for {sorted(triggers)}"
+    assert any("fn_touch_last_updated_at()" in s and "FUNCTION" in s for s in ddl)
+
+
+def test_gid_properties():
+    assert models.ProductVariant(inventory_item_id=1001).inventory_item_gid == "gid://shopify/InventoryItem/1001"
+    assert models.ProductVariant().inventory_item_gid is None
+    assert models.Store(sync_location_id=9).sync_location_gid == "gid://shopify/Location/9"
+    assert models.Store().sync_location_gid is None
+
+
+if __name__ == "__main__":
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_") and callable(v)]
+    passed = 0
+    for fn in fns:
+        try:
+            fn(); print(f"PASS {fn.__name__}"); passed += 1
+        except AssertionError as e:
+            print(f"FAIL {fn.__name__}: {e}")
+        except Exception as e:
+            print(f"ERROR {fn.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{passed}/{len(fns)} orm-loading tests passed")
+    sys.exit(0 if passed == len(fns) else 1)
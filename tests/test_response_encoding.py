@@ -0,0 +1,72 @@
+# tests/test_response_encoding.py
+"""
+Response-encoding tests — hermetic (in-memory SQLite, no Postgres, no Shopify). Run:
+    python tests/test_response_encoding.py
+
+The hot list endpoints build their JSON body once, in pydantic-core or orjson, and return it as a
+finished Response instead of handing objects back for FastAPI to validate and jsonable_encode again.
+These tests pin the bodies those shortcuts produce: same fields, same values as the response_model.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import orjson
+from sqlalchemy.orm import Session, defer
+from starlette.requests import Request
+
+import models
+from routes import config, products
+from test_orm_loading import _engine
+
+
+def test_products_route_encodes_once():
+    eng = _engine()
+    with Session(eng) as db:
+        resp = products.get_products(db=db, skip=0, limit=100, store_id=None, search=None,
+                                   sort_field="title", sort_order="asc")
+    body = orjson.loads(resp.body)
+    assert resp.media_type == "application/json" and body["total_count"] == 5
+    assert body["products"][0]["variants"][0]["inventory_item_gid"] == "gid://shopify/InventoryItem/1001"
+
+
+def test_store_list_serializes_unloaded_columns():
+    eng = _engine()
+    with Session(eng) as db:
+        db.get(models.Store, 1).sync_location_id = 9
+        db.commit()
+        orig = config.crud_store.get_all_stores
+        config.crud_store.get_all_stores = \
+            lambda db: db.query(models.Store).options(defer(models.Store.sync_location_id)).all()
+        try:
+            resp = config.get_all_stores(request=Request({"type": "http", "method": "GET", "headers": []}), db=db)
+        finally:
+            config.crud_store.get_all_stores = orig
+    assert orjson.loads(resp.body)[0]["sync_location_id"] == 9, "a deferred column is loaded, not dropped"
+
+
+def test_store_webhooks_encode_once():
+    eng = _engine()
+    with Session(eng) as db:
+        db.add(models.Webhook(shopify_webhook_id=77, store_id=1, topic="products/update", address="https://x/1"))
+        db.commit()
+        resp = config.get_store_webhooks(store_id=1, db=db)
+    assert resp.media_type == "application/json"
+    assert [(w["shopify_webhook_id"], w["topic"]) for w in orjson.loads(resp.body)] == [(77, "products/update")]
+
+
+if __name__ == "__main__":
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_") and callable(v)]
+    passed = 0
+    for fn in fns:
+        try:
+            fn(); print(f"PASS {fn.__name__}"); passed += 1
+        except AssertionError as e:
+            print(f"FAIL {fn.__name__}: {e}")
+        except Exception as e:
+            print(f"ERROR {fn.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{passed}/{len(fns)} response-encoding tests passed")
+    sys.exit(0 if passed == len(fns) else 1)
@@ -0,0 +1,311 @@
+# tests/test_shopify_batching.py
+"""
+Shopify write-batching tests — hermetic (no network). Run:
+    python tests/test_shopify_batching.py
+
+Bulk Shopify mutations must go out as few calls as the API allows: a product's variant updates ride
+one productVariantsBulkUpdate per VARIANTS_BULK_MAX and inventory changes one mutation per
+INVENTORY_BULK_MAX, never one call per item — and the merged result keeps the single-call shape
+callers read userErrors from. The per-store cost bucket waits for the refill BEFORE sending a request
+the bucket can't cover, and GraphQL documents go out without their source indentation.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import shopify_service
+from shopify_service import ShopifyService
+
+
+def _svc(calls):
+    svc = ShopifyService(store_url="t.myshopify.com", token="x")
+
+    def _execute(name, variables):
+        calls.append((name, variables))
+        n = len(variables.get("variants") or variables.get("input", {}).get("changes") or [])
+        return {"productVariantsBulkUpdate": {"productVariants": [{"id": i} for i in range(n)],
+                                              "userErrors": []}}
+
+    svc.execute_mutation = _execute
+    return svc
+
+
+def test_variant_updates_chunk_by_bulk_cap():
+    calls = []
+    variants = [{"id": f"gid://shopify/ProductVariant/{i}", "price": "1.00"}
+                for i in range(shopify_service.VARIANTS_BULK_MAX * 2 + 5)]
+    result = _svc(calls).update_variants_bulk("updateVariantPrices", "gid://shopify/Product/1", variants)
+    assert [len(v["variants"]) for _, v in calls] == [100, 100, 5]
+    assert all(v["productId"] == "gid://shopify/Product/1" for _, v in calls)
+    assert len(result["productVariantsBulkUpdate"]["productVariants"]) == len(variants)
+    assert result["productVariantsBulkUpdate"]["userErrors"] == []
+
+
+def test_small_product_is_one_call():
+    calls = []
+    _svc(calls).update_variants_bulk("updateVariantBarcode", "gid://shopify/Product/1",
+                                     [{"id": "a", "barcode": "1"}, {"id": "b", "barcode": "2"}])
+    assert len(calls) == 1
+
+
+def test_inventory_adjust_chunks_and_merges_user_errors():
+    calls = []
+    svc = ShopifyService(store_url="t.myshopify.com", token="x")
+
+    def _execute(name, variables):
+        chunk = variables["input"]["changes"]
+        calls.append(len(chunk))
+        errs = [{"message": "bad"}] if len(calls) == 2 else []
+        return {name: {"inventoryAdjustmentGroup": {"changes": [{"name": "available"}] * len(chunk)},
+                       "userErrors": errs}}
+
+    svc.execute_mutation = _execute
+    changes = [{"inventoryItemId": str(i), "locationId": "L", "delta": 1}
+               for i in range(shopify_service.INVENTORY_BULK_MAX + 1)]
+    result = svc.adjust_inventory_quantities(changes, reference_uri="inventory-sync://op/x")
+    node = result["inventoryAdjustQuantities"]
+    assert calls == [100, 1]
+    assert len(node["inventoryAdjustmentGroup"]["changes"]) == 101
+    assert node["userErrors"] == [{"message": "bad"}], "a failed chunk must surface to the caller"
+
+
+def test_single_adjust_is_one_change_through_bulk_path():
+    seen = []
+    svc = ShopifyService(store_url="t.myshopify.com", token="x")
+    svc.execute_mutation = lambda name, v: seen.append(v["input"]) or {
+        name: {"inventoryAdjustmentGroup": {"changes": [{"name": "available", "quantityAfterChange": 7}]}}}
+    _, after = svc.adjust_inventory_quantities_single("I", "L", -1, reference_uri="r")
+    assert after == 7
+    assert seen[0]["changes"] == [{"inventoryItemId": "I", "locationId": "L", "delta": -1}]
+    assert seen[0]["referenceDocumentUri"] == "r"
+
+
+def test_cost_bucket_gates_before_sending():
+    b = shopify_service.CostBucket()
+    assert b.reserve(50) == 0.0, "unknown bucket never blocks"
+    b.observe({"currentlyAvailable": 100, "maximumAvailable": 2000, "restoreRate": 100})
+    assert b.reserve(80) == 0.0
+    wait = b.reserve(80)  # only ~20 left: must wait ~0.6s for the refill instead of being THROTTLED
+    assert 0.5 < wait <= 0.6
+    assert b.reserve(0) == 0.0
+
+
+def test_graphql_documents_are_compacted_once():
+    docs = [shopify_service.GET_ALL_PRODUCTS_QUERY, shopify_service.FIND_CATEGORIES_QUERY,
+            shopify_service.INVENTORY_ITEM_AVAILABLE_QUERY, *shopify_service.MUTATIONS.values()]
+    for doc in docs:
+        assert "\n" not in doc and "  " not in doc and doc == doc.strip()
+    assert shopify_service.MUTATIONS["inventorySetQuantities"].startswith("mutation SetAbsQty(")
+
+
+def test_throttle_predicate():
+    assert shopify_service._is_throttled([{"message": "Throttled", "extensions": {"code": "THROTTLED"}}])
+    assert not shopify_service._is_throttled([{"message": "boom"}])
+    assert not shopify_service._is_throttled("Not Found"), "REST-style string errors are not throttles"
+    assert not shopify_service._is_throttled([])
+
+
+def test_retry_after_is_honoured_and_capped():
+    import requests
+
+    def _err(status, retry_after=None):
+        resp = requests.Response()
+        resp.status_code = status
+        if retry_after is not None:
+            resp.headers["Retry-After"] = retry_after
+        return requests.exceptions.HTTPError(response=resp)
+
+    assert shopify_service._retry_after(_err(429, "2")) == 2.0
+    assert shopify_service._retry_after(_err(429, "600")) == shopify_service.RETRY_AFTER_MAX
+    assert shopify_service._retry_after(_err(429)) is None
+    assert shopify_service._retry_after(_err(500, "2")) is None
+    assert shopify_service._retry_after(requests.exceptions.ConnectionError()) is None
+
+
+def test_unchanged_variant_cells_never_reach_shopify():
+    from decimal import Decimal
+    from routes import mutations
+
+    class _Query:
+        def filter(self, *_):
+            return self
+
+        def all(self):
+            return [("a", Decimal("10.00")), ("b", Decimal("5.00"))]
+
+    class _DB:
+        def query(self, *_):
+            return _Query()
+
+    variants = [{"id": "a", "price": "10"}, {"id": "b", "price": "6.50"}, {"id": "c", "price": "1"}]
+    kept = mutations._drop_unchanged_variants(_DB(), "updateVariantPrices", variants)
+    assert [v["id"] for v in kept] == ["b", "c"], "equal price dropped; changed and unknown variants kept"
+
+
+def test_store_session_is_shared_until_shutdown():
+    a = ShopifyService(store_url="pool.myshopify.com", token="old")
+    b = ShopifyService(store_url="pool.myshopify.com", token="rotated")
+    assert a._session is b._session, "one keep-alive pool per store host, whatever the token"
+    assert b.headers["X-Shopify-Access-Token"] == "rotated"
+    shopify_service.close_sessions()
+    assert ShopifyService(store_url="pool.myshopify.com", token="x")._session is not a._session
+
+
+def test_store_quantity_set_reports_error_instead_of_raising():
+    from routes import stock
+
+    class _Svc:
+        def __init__(self, store_url, token):
+            self.url = store_url
+
+        def execute_mutation(self, name, variables):
+            if self.url == "boom":
+                raise RuntimeError("timeout")
+            errs = [{"message": "bad item"}] if self.url == "bad" else []
+            return {name: {"userErrors": errs}}
+
+    orig, stock.ShopifyService = stock.ShopifyService, _Svc
+    try:
+        assert stock._set_store_quantities("ok", "t", []) is None
+        assert stock._set_store_quantities("bad", "t", []) == "bad item"
+        assert stock._set_store_quantities("boom", "t", []) == "timeout", "a worker thread must never raise"
+    finally:
+        stock.ShopifyService = orig
+
+
+def test_by_barcode_stream_is_one_valid_document():
+    import orjson
+    from routes import stock
+
+    groups = [{"barcode": str(i), "total_stock": i, "total_retail_value": i * 1.5, "variants": []} for i in range(7)]
+    metrics = {"total_stock": 21}
+    orig, stock.STREAM_CHUNK_GROUPS = stock.STREAM_CHUNK_GROUPS, 3
+    try:
+        chunks = list(stock._stream_groups(metrics, groups))
+        empty = b"".join(stock._stream_groups(metrics, []))
+    finally:
+        stock.STREAM_CHUNK_GROUPS = orig
+    assert len(chunks) == 5, "head + 3 group chunks + tail"
+    assert orjson.loads(b"".join(chunks)) == {"metrics": metrics, "results": groups}
+    assert orjson.loads(empty) == {"metrics": metrics, "results": []}
+
+
+def test_propagation_store_writes_fan_out_in_order():
+    import threading
+    from services import inventory_sync_service as iss
+
+    barrier = threading.Barrier(3, timeout=5)  # only passable if all three stores are in flight at once
+
+    def _write(i):
+        barrier.wait()
+        return i * 10
+
+    assert iss._fan_out(_write, [(1,), (2,), (3,)]) == [10, 20, 30]
+    assert iss._fan_out(lambda i: threading.current_thread().name, [(1,)]) == [threading.current_thread().name]
+
+
+def test_store_delta_write_reports_partial_success():
+    from services import inventory_sync_service as iss
+
+    class _Svc:
+        def __init__(self, store_url, token):
+            pass
+
+        def adjust_inventory_quantities(self, payload, reference_uri):
+            return {"inventoryAdjustQuantities": {"userErrors": []}}
+
+        def set_inventory_quantities(self, payload, reference_uri, ignore_compare):
+            return {"inventorySetQuantities": {"userErrors": [{"message": "bad"}]}}
+
+    orig, iss.ShopifyService = iss.ShopifyService, _Svc
+    try:
+        adjusted, error = iss._write_store_delta("u", "t", [{"delta": 1}], [{"quantity": 0}], "r")
+        assert adjusted and error is not None, "adjust landed (mirror it), floor-set failed (report it)"
+        assert iss._write_store_delta("u", "t", [{"delta": 1}], [], "r") == (True, None)
+    finally:
+        iss.ShopifyService = orig
+
+
+def test_webhook_repair_runs_topics_concurrently_and_keeps_partial_results():
+    import threading
+    from routes import config
+
+    barrier = threading.Barrier(2, timeout=5)
+
+    class _Svc:
+        def __init__(self):
+            self.deleted = []
+
+        def delete_webhook(self, webhook_id):
+            self.deleted.append(webhook_id)
+
+        def create_webhook(self, topic, address):
+            barrier.wait()
+            if topic == "products/delete":
+                raise RuntimeError("422")
+            return {"id": 99, "topic": topic, "address": address}
+
+    svc = _Svc()
+    out = config._recreate_webhooks(svc, ["products/create", "products/delete"],
+                                    {"products/delete": {"id": 5, "address": "old"}}, "new")
+    assert out[0] == ("products/create", {"id": 99, "topic": "products/create", "address": "new"}, None, None)
+    topic, created, deleted_id, err = out[1]
+    assert created is None and deleted_id == 5 and isinstance(err, RuntimeError), \
+        "a deleted-then-failed topic still reports the deletion so its stale registration goes"
+
+
+def test_delete_all_webhooks_fans_out_and_drops_registrations_once():
+    import json
+    import threading
+    from types import SimpleNamespace
+    from routes import config
+
+    barrier = threading.Barrier(3, timeout=5)
+    hooks = {"a.myshopify.com": [{"id": 1}, {"id": 2}], "b.myshopify.com": [{"id": 3}], "c.myshopify.com": None}
+
+    class _Svc:
+        def __init__(self, store_url, token):
+            self.url = store_url
+
+        def get_webhooks(self):
+            if hooks[self.url] is None:
+                raise RuntimeError("401")
+            return hooks[self.url]
+
+        def delete_webhook(self, webhook_id):
+            barrier.wait()
+            if webhook_id == 2:
+                raise RuntimeError("404")
+
+    stores = [SimpleNamespace(id=i, name=u[0], shopify_url=u, api_token="t") for i, u in enumerate(hooks)]
+    dropped = []
+    patches = [(config, "ShopifyService", _Svc),
+               (config.crud_store, "get_all_stores", lambda db: stores),
+               (config.crud_webhook, "delete_webhook_registrations", lambda db, ids: dropped.append(sorted(ids))),
+               (config.audit_logger, "log_config_change", lambda *a, **k: None)]
+    orig = [getattr(mod, name) for mod, name, _ in patches]
+    try:
+        for mod, name, fake in patches:
+            setattr(mod, name, fake)
+        resp = config.delete_all_webhooks_for_all_stores(db=None)
+    finally:
+        for (mod, name, _), fn in zip(patches, orig):
+            setattr(mod, name, fn)
+    assert dropped == [[1, 3]], "every successful delete, one registration statement"
+    assert resp.status_code == 207 and len(json.loads(resp.body)["errors"]) == 2
+
+
+if __name__ == "__main__":
+    fns = [v for k, v in sorted(globals().items()) if k.startswith("test_") and callable(v)]
+    passed = 0
+    for fn in fns:
+        try:
+            fn(); print(f"PASS {fn.__name__}"); passed += 1
+        except AssertionError as e:
+            print(f"FAIL {fn.__name__}: {e}")
+        except Exception as e:
+            print(f"ERROR {fn.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{passed}/{len(fns)} shopify-batching tests passed")
+    sys.exit(0 if passed == len(fns) else 1)